@@ -9,27 +9,129 @@ class Config:
     os.environ["OPENAI_API_KEY"] = os.getenv('OPENAI_API_KEY')
 
     OPENAI_MODEL = 'gpt-4o'
+    CONDENSE_MODEL = os.getenv('CONDENSE_MODEL', 'gpt-4o-mini')  # model murah untuk menulis ulang pertanyaan lanjutan
     EMBEDDING_MODEL = 'text-embedding-3-large'
+    OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', 20))
+    OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 120))
     
     # ChromaDB Settings
     CHROMA_DB_PATH = os.getenv('CHROMA_DB_PATH', './data/vectorstore')
     COLLECTION_NAME = 'actuarial_documents'
+    PARTITION_SEPARATOR = '__s_'
+    VECTOR_REGISTRY_FILENAME = 'document_vectors.sqlite3'
     
     # Flask Settings
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     
+    # Production Server (gunicorn)
+    PORT = int(os.getenv('PORT', 5001))
+    # Harus 1 proses: job queue ingestion, segmen HNSW PersistentClient ChromaDB, answer cache,
+    # cache partisi dan index BM25 hidup di memori/disk satu proses dan tidak aman dipakai bersama.
+    # Concurrency diatur lewat WEB_THREADS; gunicorn menolak start jika WEB_WORKERS > 1. Lebih dari
+    # satu worker baru aman setelah vektor dan job pindah ke layanan bersama (mis. ChromaDB HttpClient).
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', 1))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 16))
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 300))
+    WEB_GRACEFUL_TIMEOUT = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+    
     # Document Processing
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
+    TEXT_SPLITTER = os.getenv('TEXT_SPLITTER', 'markdown').lower()  # markdown (satu lintasan) / langchain
+    DOC_TYPE_PREFIX_CHARS = 4096  # jenis dokumen ditentukan dari bagian awal file saja
+    PREPROCESS_WORKERS = int(os.getenv('PREPROCESS_WORKERS', min(4, os.cpu_count() or 1)))
+    
+    # Ingestion
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 100))
+    EMBEDDING_MAX_CONCURRENCY = int(os.getenv('EMBEDDING_MAX_CONCURRENCY', 4))
+    EMBEDDING_MAX_RETRIES = int(os.getenv('EMBEDDING_MAX_RETRIES', 5))
+    EMBEDDING_RETRY_BASE_DELAY = 1.0
+    EMBEDDING_RETRY_MAX_DELAY = 30.0
+    # Chunk di-embed dan di-upsert per batch ini selama upload mengalir (bukan setelah semua file di-split)
+    INDEX_FLUSH_CHUNKS = int(os.getenv('INDEX_FLUSH_CHUNKS', 1000))
+    INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', 2))
+    MAX_TRACKED_JOBS = int(os.getenv('MAX_TRACKED_JOBS', 200))
     
     # Chat Settings
-    MAX_CONTEXT_LENGTH = 4000
+    MAX_CONTEXT_LENGTH = int(os.getenv('MAX_CONTEXT_LENGTH', 4000))  # token chunk + riwayat per prompt
+    HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', 1000))
+    HISTORY_MAX_MESSAGES = 6
+    CONTEXT_MIN_CHUNK_TOKENS = 100  # chunk dipotong hanya jika sisa anggaran minimal sebesar ini
     SIMILARITY_THRESHOLD = 0.7
     TOP_K_RESULTS = 5
     
+    # Hybrid Retrieval (BM25 + vector)
+    HYBRID_SEARCH_ENABLED = os.getenv('HYBRID_SEARCH_ENABLED', 'True').lower() == 'true'
+    LEXICAL_INDEX_DIRNAME = 'lexical_index'
+    HYBRID_CANDIDATES = 20
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+    RRF_K = 60
+    LEXICAL_DECISIVE_RATIO = float(os.getenv('LEXICAL_DECISIVE_RATIO', 2.0))
+    
+    # Table Store (jawaban langsung dari tabel markdown)
+    TABLE_QA_ENABLED = os.getenv('TABLE_QA_ENABLED', 'True').lower() == 'true'
+    TABLE_STORE_DIRNAME = 'tables'
+    
+    # Calculation Engine (perhitungan aktuaria lokal tanpa LLM)
+    CALCULATION_ENGINE_ENABLED = os.getenv('CALCULATION_ENGINE_ENABLED', 'True').lower() == 'true'
+    
+    # Batch Questions (/ask/batch)
+    BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', 8))
+    BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', 500))
+    
+    # Observability (/metrics + OpenTelemetry opsional)
+    OTEL_ENABLED = os.getenv('OTEL_ENABLED', 'False').lower() == 'true'
+    OTEL_SERVICE_NAME = os.getenv('OTEL_SERVICE_NAME', 'actuarial-chatbot')
+    
+    # Answer Cache
+    ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv('ANSWER_CACHE_SIMILARITY_THRESHOLD', 0.95))
+    ANSWER_CACHE_TTL_SECONDS = int(os.getenv('ANSWER_CACHE_TTL_SECONDS', 86400))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 2000))
+    
+    # Session Memory
+    MEMORY_WINDOW_SIZE = 10
+    MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', 1000))
+    SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 3600))
+    CONDENSE_CACHE_SIZE = int(os.getenv('CONDENSE_CACHE_SIZE', 64))
+    
+    # Session Store (riwayat persisten, dibagi antar worker)
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite').lower()  # sqlite / redis / memory
+    SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+    SESSION_DB_FILENAME = 'sessions.sqlite3'
+    SESSION_STORE_TTL_SECONDS = int(os.getenv('SESSION_STORE_TTL_SECONDS', 7 * 86400))
+    SESSION_FLUSH_INTERVAL = float(os.getenv('SESSION_FLUSH_INTERVAL', 1.0))
+    SESSION_FLUSH_BATCH_SIZE = int(os.getenv('SESSION_FLUSH_BATCH_SIZE', 100))
+    # Versi backend dicek paling sering sekali per interval ini per session (konflik tetap ditangani saat flush)
+    SESSION_REFRESH_INTERVAL = float(os.getenv('SESSION_REFRESH_INTERVAL', 5.0))
+    
+    # Ringkasan percakapan (giliran lama diringkas di background dengan CONDENSE_MODEL)
+    SESSION_SUMMARY_ENABLED = os.getenv('SESSION_SUMMARY_ENABLED', 'True').lower() == 'true'
+    SUMMARY_KEEP_MESSAGES = int(os.getenv('SUMMARY_KEEP_MESSAGES', 4))  # pesan terakhir yang tetap verbatim
+    # Peringkasan baru dijalankan setelah sebanyak ini pesan lama menumpuk di atas SUMMARY_KEEP_MESSAGES,
+    # sehingga tidak ada panggilan LLM tambahan di setiap giliran
+    SUMMARY_BATCH_MESSAGES = int(os.getenv('SUMMARY_BATCH_MESSAGES', 4))
+    SUMMARY_MAX_TOKENS = int(os.getenv('SUMMARY_MAX_TOKENS', 300))
+    SUMMARY_WORKERS = int(os.getenv('SUMMARY_WORKERS', 2))
+    
+    # Embedding Cache
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'True').lower() == 'true'
+    EMBEDDING_CACHE_MEMORY_SIZE = int(os.getenv('EMBEDDING_CACHE_MEMORY_SIZE', 1024))
+    EMBEDDING_CACHE_DISK_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_DISK_MAX_ENTRIES', 50000))
+    EMBEDDING_CACHE_FILENAME = 'embedding_cache.sqlite3'
+    
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FILE = os.getenv('LOG_FILE', 'app.log')
+    # False: hanya console/stdout, rotasi diserahkan ke platform (default di bawah gunicorn)
+    LOG_TO_FILE = os.getenv('LOG_TO_FILE', 'True').lower() == 'true'
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()  # format console: text / json (file selalu JSON)
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 0.01))  # porsi record per-chunk yang ditulis
 
 config = Config()
 
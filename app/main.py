@@ -1,14 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+import json
 import os
 import logging
 from typing import List
+import time
 import traceback
 import uuid
 from app.config import config
-from app.services.document_processor import DocumentProcessor
-from app.services.chat_service import ActuarialChatService
-from app.models.embeddings import VectorStoreManager
-from app.utils.helpers import setup_logging, validate_files, validate_openai_key, create_response, get_file_size
+from app.services.container import get_container
+from app.utils.helpers import setup_logging, validate_files, validate_openai_key, create_response, format_sse
+from app.utils.metrics import metrics, setup_tracing, ANSWERS, HTTP_DURATION
 from flask_cors import CORS
 
 # __import__('pysqlite3')
@@ -22,11 +23,14 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object(config)
+CORS(app)
 
-# Initialize services
-document_processor = DocumentProcessor()
-chat_service = ActuarialChatService()
-vector_store_manager = VectorStoreManager()
+# Initialize services (satu Chroma client, satu HTTP client OpenAI per proses)
+services = get_container()
+chat_service = services.chat_service
+vector_store_manager = services.vector_store_manager
+table_store = services.table_store
+ingestion_jobs = services.ingestion_jobs
 
 def before_first_request():
     """Initialize app before first request"""
@@ -41,10 +45,43 @@ def before_first_request():
     os.makedirs('data/documents', exist_ok=True)
     os.makedirs('data/vectorstore', exist_ok=True)
     
+    # Export span OpenTelemetry jika OTEL_ENABLED
+    setup_tracing()
+    
     logger.info("App initialized successfully")
 
 before_first_request()
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        # Pakai pola route (bukan URL asli) agar label tetap sedikit, mis. /jobs/<job_id>
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_DURATION.observe(time.perf_counter() - start, endpoint=endpoint,
+                              method=request.method, status=response.status_code)
+    return response
+
+def count_answers(events):
+    """Hitung mode jawaban streaming dari event 'done' / 'error'"""
+    for event in events:
+        if event['event'] in ('done', 'error'):
+            data = event['data']
+            ANSWERS.inc(mode='cached' if data.get('cached') else data.get('mode'))
+        yield event
+
+def stream_events(events):
+    """Wrap chat service events as a Server-Sent Events response"""
+    return Response(
+        stream_with_context(format_sse(event['event'], event['data']) for event in count_answers(events)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -68,6 +105,11 @@ def health_check():
             data={'error': str(e)}
         )), 500
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of stage latencies, token counts and cache hits"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/input-docs', methods=['POST'])
 def input_documents():
     """Process and store markdown documents"""
@@ -79,7 +121,7 @@ def input_documents():
                 message="No files provided"
             )), 400
         
-        session_id = request.form.get('session_id')  # Dapatkan session_id dari form
+        session_id = request.form.get('session_id', 'default')  # Dapatkan session_id dari form
 
         files = request.files.getlist('files')
         if not validate_files(files):
@@ -88,10 +130,9 @@ def input_documents():
                 message="No files selected"
             )), 400
         
-        processed_files = []
-        total_chunks = 0
+        saved_files = []
         
-        # Process each file
+        # Simpan file saja; validasi, split dan embedding dikerjakan worker background
         for file in files:
             if file and file.filename.lower().endswith('.md'):
                 # Save file temporarily
@@ -101,52 +142,28 @@ def input_documents():
                 #temp_path = os.path.join('data/documents', filename)
                 file.save(temp_path)
                 
-                # Validate and process file
-                if document_processor.validate_file(temp_path):
-                    documents = document_processor.process_markdown_file(temp_path, session_id)  # Kirim session_id
-                    
-                    if documents:
-                        # Add to vector store
-                        success = vector_store_manager.add_documents(documents)
-                        
-                        if success:
-                            processed_files.append({
-                                'filename': filename,
-                                'chunks': len(documents),
-                                'size': get_file_size(temp_path),
-                                'session_id' : session_id,
-                                'status': 'success'
-                            })
-                            total_chunks += len(documents)
-                        else:
-                            processed_files.append({
-                                'filename': filename,
-                                'status': 'failed_to_store'
-                            })
-                    else:
-                        processed_files.append({
-                            'filename': filename,
-                            'status': 'failed_to_process'
-                        })
-                else:
-                    processed_files.append({
-                        'filename': filename,
-                        'status': 'invalid_file'
-                    })
+                saved_files.append({
+                    'filename': filename,
+                    'path': temp_path
+                })
             else:
-                processed_files.append({
+                saved_files.append({
                     'filename': file.filename if file else 'unknown',
                     'status': 'invalid_format'
                 })
         
+        job = ingestion_jobs.submit(session_id, saved_files)
+        
         return jsonify(create_response(
             success=True,
-            message=f"Processed {len(processed_files)} files with {total_chunks} total chunks",
+            message=f"Queued {len(saved_files)} files for processing",
             data={
-                'processed_files': processed_files,
-                'total_chunks': total_chunks
+                'job_id': job['job_id'],
+                'status': job['status'],
+                'status_url': f"/jobs/{job['job_id']}",
+                'files': job['files']
             }
-        ))
+        )), 202
         
     except Exception as e:
         logger.exception("Error occurred during ...")  # ini otomatis log traceback
@@ -156,6 +173,32 @@ def input_documents():
             data={'error': str(e)}
         )), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get status and per-file progress of an ingestion job"""
+    try:
+        job = ingestion_jobs.get_job(job_id)
+        
+        if job is None:
+            return jsonify(create_response(
+                success=False,
+                message="Job not found"
+            )), 404
+        
+        return jsonify(create_response(
+            success=True,
+            message=f"Job is {job['status']}",
+            data=job
+        ))
+        
+    except Exception as e:
+        logger.error(f"Error getting job status: {str(e)}")
+        return jsonify(create_response(
+            success=False,
+            message="Error getting job status",
+            data={'error': str(e)}
+        )), 500
+
 @app.route('/askproject', methods=['POST'])
 def ask_project():
     """Ask a question to the chatbot"""
@@ -177,8 +220,11 @@ def ask_project():
                 message="Question cannot be empty"
             )), 400
         
+        # Streaming token via SSE jika diminta
+        if data.get('stream'):
+            return stream_events(chat_service.stream_project(question, session_id))
+        
         # Process question
-        # DEBUG: Log input
         result = chat_service.ask_project(question, session_id)
         
         return jsonify(create_response(
@@ -221,7 +267,12 @@ def ask_question():
             )), 400
         
         # Process question
-        logger.info(f"Processing question for session {session_id}: {question[:100]}...")
+        logger.info("Processing question for session %s: %.100s...", session_id, question)
+        
+        # Streaming token via SSE jika diminta
+        if data.get('stream'):
+            return stream_events(chat_service.stream_question(question, session_id))
+        
         result = chat_service.ask_question(question, session_id)
         
         return jsonify(create_response(
@@ -239,6 +290,52 @@ def ask_question():
             data={'error': str(e)}
         )), 500
 
+@app.route('/ask/batch', methods=['POST'])
+def ask_batch():
+    """Answer many questions at once, streaming NDJSON lines as each one finishes"""
+    try:
+        data = request.get_json()
+        questions = data.get('questions') if isinstance(data, dict) else None
+
+        if not isinstance(questions, list) or not questions:
+            return jsonify(create_response(
+                success=False,
+                message="questions must be a non-empty list"
+            )), 400
+
+        if len(questions) > config.BATCH_MAX_QUESTIONS:
+            return jsonify(create_response(
+                success=False,
+                message=f"Maximum {config.BATCH_MAX_QUESTIONS} questions per batch"
+            )), 400
+
+        # Default mode & session untuk item yang tidak menyebutkannya
+        default_mode = data.get('mode', 'project')
+        default_session = data.get('session_id', 'default')
+        use_history = bool(data.get('use_history', False))
+        items = [
+            dict({'mode': default_mode, 'session_id': default_session, 'use_history': use_history},
+                 **(item if isinstance(item, dict) else {'question': item}))
+            for item in questions
+        ]
+
+        logger.info("Processing batch of %d questions", len(items))
+        lines = services.batch_runner.run(items)
+        return Response(
+            stream_with_context(json.dumps(line, ensure_ascii=False, default=str) + '\n' for line in lines),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    except Exception as e:
+        logger.error(f"Error processing batch: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify(create_response(
+            success=False,
+            message="Error processing batch",
+            data={'error': str(e)}
+        )), 500
+
 @app.route('/conversation/history', methods=['GET'])
 def get_conversation_history():
     """Get conversation history"""
@@ -326,6 +423,7 @@ def search_documents():
             )), 400
         
         query = data['query'].strip()
+        session_id = data.get('session_id', 'default')
         k = data.get('k', config.TOP_K_RESULTS)
         
         if not query:
@@ -335,7 +433,7 @@ def search_documents():
             )), 400
         
         # Search documents
-        results = vector_store_manager.similarity_search_with_score(query, k)
+        results = vector_store_manager.hybrid_search(query, session_id, k=k)
         
         # Format results
         formatted_results = []
@@ -369,6 +467,8 @@ def reset_documents():
     """Reset/clear all documents from vector store"""
     try:
         success = vector_store_manager.delete_collection()
+        if success:
+            table_store.clear()
         
         if success:
             return jsonify(create_response(
@@ -405,6 +505,5 @@ def internal_error(error):
     )), 500
 
 if __name__ == '__main__':
-    port = int(os.environ.get("PORT", 5001))
-    app.run(debug=config.FLASK_DEBUG, host='0.0.0.0', port=port)
-    CORS(app)
\ No newline at end of file
+    # Development server; untuk production gunakan: gunicorn -c gunicorn.conf.py app.wsgi:app
+    app.run(debug=config.FLASK_DEBUG, host='0.0.0.0', port=config.PORT)
\ No newline at end of file
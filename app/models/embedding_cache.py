@@ -0,0 +1,236 @@
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper dengan cache query dua tingkat (LRU in-process + SQLite di disk)"""
+
+    # last_access hanya dipakai untuk eviction: hit disk dikumpulkan dan ditulis paling lambat sekian detik
+    TOUCH_FLUSH_INTERVAL = 60.0
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache_path: str,
+                 max_memory_entries: int = 1024, max_disk_entries: int = 50000):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._memory_cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pending_touches = {}
+        self._last_touch_flush = time.monotonic()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0
+        }
+        self._initialize_disk_cache()
+
+    def _initialize_disk_cache(self):
+        """Initialize SQLite tier; cache tetap berjalan in-memory jika gagal"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(self.cache_path, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS query_embeddings ('
+                'key TEXT PRIMARY KEY, model TEXT NOT NULL, '
+                'vector BLOB NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_access '
+                'ON query_embeddings (last_access)'
+            )
+            self._connection.commit()
+            logger.info(f"Embedding cache initialized at {self.cache_path}")
+        except Exception as e:
+            logger.error(f"Error initializing embedding disk cache: {str(e)}")
+            self._connection = None
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalisasi teks pertanyaan (unicode, huruf kecil, spasi)"""
+        return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+    def _cache_key(self, text: str) -> str:
+        raw = f"{self.model_name}\x00{self.normalize_text(text)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embedding dokumen tidak di-cache di sini, langsung diteruskan"""
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query dengan memeriksa cache memory, lalu disk, lalu API"""
+        key = self._cache_key(text)
+
+        vector = self._get_from_memory(key)
+        if vector is not None:
+            record_cache('embedding', hit=True)
+            return vector
+
+        vector = self._get_from_disk(key)
+        if vector is not None:
+            self._put_in_memory(key, vector)
+            record_cache('embedding', hit=True)
+            return vector
+
+        with self._lock:
+            self._stats['misses'] += 1
+        record_cache('embedding', hit=False)
+
+        vector = self.embeddings.embed_query(text)
+        self._put_in_memory(key, vector)
+        self._put_on_disk(key, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries; cache misses go to the API in one batched call"""
+        keys = [self._cache_key(text) for text in texts]
+        vectors = {}
+        for key in dict.fromkeys(keys):
+            vector = self._get_from_memory(key)
+            if vector is None:
+                vector = self._get_from_disk(key)
+                if vector is not None:
+                    self._put_in_memory(key, vector)
+            if vector is not None:
+                vectors[key] = vector
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        record_cache('embedding', hit=True, count=len(vectors))
+        record_cache('embedding', hit=False, count=len(missing))
+
+        if missing:
+            with self._lock:
+                self._stats['misses'] += len(missing)
+            for key, vector in zip(missing.keys(), self.embeddings.embed_documents(list(missing.values()))):
+                self._put_in_memory(key, vector)
+                self._put_on_disk(key, vector)
+                vectors[key] = vector
+
+        return [vectors[key] for key in keys]
+
+    def _get_from_memory(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory_cache.get(key)
+            if vector is not None:
+                self._memory_cache.move_to_end(key)
+                self._stats['memory_hits'] += 1
+            return vector
+
+    def _put_in_memory(self, key: str, vector: List[float]):
+        with self._lock:
+            self._memory_cache[key] = vector
+            self._memory_cache.move_to_end(key)
+            while len(self._memory_cache) > self.max_memory_entries:
+                self._memory_cache.popitem(last=False)
+                self._stats['memory_evictions'] += 1
+
+    def _get_from_disk(self, key: str) -> Optional[List[float]]:
+        if self._connection is None:
+            return None
+
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    'SELECT vector FROM query_embeddings WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                self._pending_touches[key] = time.time()
+                if time.monotonic() - self._last_touch_flush >= self.TOUCH_FLUSH_INTERVAL:
+                    self._flush_touches()
+                    self._connection.commit()
+                self._stats['disk_hits'] += 1
+
+            return array('f', row[0]).tolist()
+        except Exception as e:
+            logger.error(f"Error reading embedding disk cache: {str(e)}")
+            return None
+
+    def _put_on_disk(self, key: str, vector: List[float]):
+        if self._connection is None:
+            return
+
+        try:
+            with self._lock:
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO query_embeddings (key, model, vector, last_access) '
+                    'VALUES (?, ?, ?, ?)',
+                    (key, self.model_name, array('f', vector).tobytes(), time.time())
+                )
+                # Sentuhan tertunda ditulis dulu agar eviction memakai urutan akses yang benar
+                self._flush_touches()
+                self._evict_disk_entries()
+                self._connection.commit()
+        except Exception as e:
+            logger.error(f"Error writing embedding disk cache: {str(e)}")
+
+    def _flush_touches(self):
+        """Tulis last_access yang tertunda dalam satu statement (lock dipegang pemanggil)"""
+        if self._pending_touches:
+            self._connection.executemany(
+                'UPDATE query_embeddings SET last_access = ? WHERE key = ?',
+                [(accessed, key) for key, accessed in self._pending_touches.items()]
+            )
+            self._pending_touches.clear()
+        self._last_touch_flush = time.monotonic()
+
+    def _evict_disk_entries(self):
+        """Hapus entri yang paling lama tidak diakses jika melebihi batas ukuran"""
+        count = self._connection.execute('SELECT COUNT(*) FROM query_embeddings').fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow <= 0:
+            return
+
+        # Buang 10% ekstra supaya eviction tidak terjadi di setiap insert
+        to_delete = overflow + self.max_disk_entries // 10
+        cursor = self._connection.execute(
+            'DELETE FROM query_embeddings WHERE key IN ('
+            'SELECT key FROM query_embeddings ORDER BY last_access ASC LIMIT ?)',
+            (to_delete,)
+        )
+        self._stats['disk_evictions'] += cursor.rowcount
+
+    def get_stats(self) -> dict:
+        """Get hit/miss counters and cache sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory_cache)
+
+        hits = stats['memory_hits'] + stats['disk_hits']
+        total = hits + stats['misses']
+        stats['hit_rate'] = round(hits / total, 3) if total else 0.0
+        stats['model'] = self.model_name
+
+        try:
+            if self._connection is not None:
+                with self._lock:
+                    stats['disk_entries'] = self._connection.execute(
+                        'SELECT COUNT(*) FROM query_embeddings'
+                    ).fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error reading embedding cache size: {str(e)}")
+
+        return stats
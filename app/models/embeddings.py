@@ -3,35 +3,74 @@ from chromadb.config import Settings
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
-from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from typing import List, Optional, Dict, Any, Callable, Iterable
+import hashlib
+import json
 import logging
 import os
+import threading
 
 from app.config import config
+from app.models.embedding_cache import CachedEmbeddings
+from app.models.lexical_index import LexicalIndex
+from app.models.vector_registry import DocumentVectorRegistry
+from app.utils.logging_utils import SAMPLED
+from app.utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 
 class VectorStoreManager:
-    def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
-            model=config.EMBEDDING_MODEL,
-            openai_api_key=config.OPENAI_API_KEY
-        )
-        self.chroma_client = None
+    def __init__(self, embeddings: Optional[Embeddings] = None, chroma_client=None):
+        self.embeddings = self._create_embeddings(embeddings)
+        self.chroma_client = chroma_client or self._create_chroma_client()
         self.vectorstore = None
+        self._change_listeners = []
+        
+        # Partisi ChromaDB per session: query session hanya menyentuh vektor session itu
+        self._session_collections = {}
+        self._partition_lock = threading.Lock()
+        self.vector_registry = DocumentVectorRegistry(
+            os.path.join(config.CHROMA_DB_PATH, config.VECTOR_REGISTRY_FILENAME),
+            model_name=config.EMBEDDING_MODEL
+        )
+        self.lexical_index = LexicalIndex(
+            os.path.join(config.CHROMA_DB_PATH, config.LEXICAL_INDEX_DIRNAME),
+            k1=config.BM25_K1,
+            b=config.BM25_B
+        )
         self._initialize_vectorstore()
     
+    def _create_embeddings(self, embeddings: Optional[Embeddings] = None):
+        """Create OpenAI embeddings, wrapped with the query cache when enabled"""
+        if embeddings is None:
+            embeddings = OpenAIEmbeddings(
+                model=config.EMBEDDING_MODEL,
+                openai_api_key=config.OPENAI_API_KEY
+            )
+        
+        if not config.EMBEDDING_CACHE_ENABLED:
+            return embeddings
+        
+        return CachedEmbeddings(
+            embeddings,
+            model_name=config.EMBEDDING_MODEL,
+            cache_path=os.path.join(config.CHROMA_DB_PATH, config.EMBEDDING_CACHE_FILENAME),
+            max_memory_entries=config.EMBEDDING_CACHE_MEMORY_SIZE,
+            max_disk_entries=config.EMBEDDING_CACHE_DISK_MAX_ENTRIES
+        )
+    
+    @staticmethod
+    def _create_chroma_client():
+        """Create a persistent ChromaDB client"""
+        # Ensure directory exists
+        os.makedirs(config.CHROMA_DB_PATH, exist_ok=True)
+        return chromadb.PersistentClient(path=config.CHROMA_DB_PATH)
+    
     def _initialize_vectorstore(self):
         """Initialize ChromaDB vector store"""
         try:
-            # Ensure directory exists
-            os.makedirs(config.CHROMA_DB_PATH, exist_ok=True)
-            
-            # Initialize ChromaDB client
-            self.chroma_client = chromadb.PersistentClient(
-                path=config.CHROMA_DB_PATH
-            )
-            
             # Initialize Langchain Chroma vectorstore
             self.vectorstore = Chroma(
                 client=self.chroma_client,
@@ -45,6 +84,233 @@ class VectorStoreManager:
             logger.error(f"Error initializing vector store: {str(e)}")
             raise
     
+    def add_change_listener(self, listener: Callable[[], None]):
+        """Register a callback invoked whenever stored documents change"""
+        self._change_listeners.append(listener)
+    
+    def _notify_change(self):
+        for listener in self._change_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Error notifying document change listener: {str(e)}")
+    
+    @property
+    def collection(self):
+        """Shared (legacy) ChromaDB collection used by the Langchain vectorstore"""
+        return self.vectorstore._collection
+    
+    @staticmethod
+    def partition_name(session_id: str) -> str:
+        """Nama collection partisi untuk sebuah session (aman untuk aturan nama ChromaDB)"""
+        digest = hashlib.sha256((session_id or '').encode('utf-8')).hexdigest()[:24]
+        return f"{config.COLLECTION_NAME}{config.PARTITION_SEPARATOR}{digest}"
+    
+    def get_session_collection(self, session_id: str, create: bool = False):
+        """Get the partition collection of a session; None if it does not exist yet"""
+        collection = self._session_collections.get(session_id)
+        if collection is not None:
+            return collection
+        
+        name = self.partition_name(session_id)
+        with self._partition_lock:
+            collection = self._session_collections.get(session_id)
+            if collection is not None:
+                return collection
+            
+            try:
+                collection = self.chroma_client.get_collection(name)
+            except Exception:
+                if not create:
+                    return None
+                try:
+                    collection = self.chroma_client.create_collection(
+                        name,
+                        metadata={'hnsw:space': 'cosine', 'session_id': session_id or ''}
+                    )
+                    logger.info(f"Created vector partition {name} for session {session_id}")
+                except Exception:
+                    # Worker lain membuat partisi yang sama lebih dulu
+                    collection = self.chroma_client.get_collection(name)
+            
+            self._session_collections[session_id] = collection
+            return collection
+    
+    @staticmethod
+    def _relevance_score_fn(collection) -> Callable[[float], float]:
+        """Konversi distance ChromaDB ke relevance score (makin besar makin mirip), sama seperti Langchain Chroma
+        
+        Partisi lama dibuat tanpa 'hnsw:space' sehingga masih memakai jarak L2.
+        """
+        space = (collection.metadata or {}).get('hnsw:space', 'l2')
+        if space == 'cosine':
+            return VectorStore._cosine_relevance_score_fn
+        if space == 'ip':
+            return VectorStore._max_inner_product_relevance_score_fn
+        return VectorStore._euclidean_relevance_score_fn
+    
+    @staticmethod
+    def compute_fingerprint(document: Document) -> str:
+        """Hash konten chunk beserta metadata header-nya"""
+        headers = sorted(
+            (key, value) for key, value in document.metadata.items()
+            if key.startswith('Header')
+        )
+        payload = json.dumps([document.page_content, headers], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _clean_metadata(metadata: dict) -> dict:
+        """ChromaDB hanya menerima nilai metadata str/int/float/bool"""
+        return {
+            key: value for key, value in metadata.items()
+            if isinstance(value, (str, int, float, bool))
+        }
+    
+    def _get_document_ids(self, collection, document_id: str) -> set:
+        """Record ids currently stored for a document in a partition"""
+        return set(collection.get(where={'document_id': document_id}, include=[])['ids'])
+    
+    @timed('index_documents')
+    def index_documents(self, documents: Iterable[Document],
+                        embed_documents: Optional[Callable[[List[str]], List[List[float]]]] = None) -> Dict[str, Any]:
+        """Store chunks incrementally; returns per-step counts
+        
+        Chunks carrying a 'document_id' are diffed against what is stored for that
+        document: unchanged chunks are reused, new ones added and stale ones deleted.
+        documents boleh berupa generator; chunk di-embed dan di-upsert per INDEX_FLUSH_CHUNKS
+        sehingga hanya record id per dokumen yang disimpan sampai akhir (untuk hapus chunk lama).
+        """
+        embed_documents = embed_documents or self.embeddings.embed_documents
+        stats = {
+            'total': 0, 'reused': 0, 'added': 0, 'deleted': 0,
+            'embedded': 0, 'vectors_reused': 0, 'skipped': 0, 'documents': {}
+        }
+        
+        # (session_id, document_id) -> record id yang sudah dilihat / yang tersimpan sebelum upload
+        seen, existing = {}, {}
+        pending = []
+        changed = False
+        for doc in documents:
+            stats['total'] += 1
+            session_id = doc.metadata.get('session_id') or 'default'
+            document_id = doc.metadata.get('document_id')
+            content_hash = self.compute_fingerprint(doc)
+            record_id = f"{document_id}:{content_hash}" if document_id else content_hash
+            
+            key = (session_id, document_id)
+            if key not in seen:
+                seen[key] = set()
+                if document_id:
+                    # Diff terhadap versi dokumen yang tersimpan, diambil sebelum upsert pertamanya
+                    collection = self.get_session_collection(session_id, create=True)
+                    existing[key] = self._get_document_ids(collection, document_id)
+                    stats['documents'][document_id] = {'reused': 0, 'added': 0, 'deleted': 0}
+            
+            if record_id in seen[key]:
+                stats['skipped'] += 1
+                continue
+            seen[key].add(record_id)
+            pending.append((session_id, document_id, record_id, content_hash, doc))
+            
+            if len(pending) >= config.INDEX_FLUSH_CHUNKS:
+                changed |= self._flush_records(pending, existing, stats, embed_documents)
+                pending = []
+        
+        if pending:
+            changed |= self._flush_records(pending, existing, stats, embed_documents)
+        
+        # Chunk lama baru bisa dihapus setelah semua chunk dokumennya terlihat
+        removed = {}
+        for (session_id, document_id), stored_ids in existing.items():
+            stale_ids = sorted(stored_ids - seen[(session_id, document_id)])
+            if not stale_ids:
+                continue
+            self.get_session_collection(session_id, create=True).delete(ids=stale_ids)
+            removed.setdefault(session_id, []).extend(stale_ids)
+            stats['deleted'] += len(stale_ids)
+            stats['documents'][document_id]['deleted'] = len(stale_ids)
+        
+        for session_id, stale_ids in removed.items():
+            self.lexical_index.update(session_id, removed_ids=stale_ids)
+        
+        if changed or removed:
+            self._notify_change()
+        return stats
+    
+    def _flush_records(self, records: List[tuple], existing: Dict[tuple, set], stats: Dict[str, Any],
+                       embed_documents: Callable[[List[str]], List[List[float]]]) -> bool:
+        """Embed dan upsert satu batch (session_id, document_id, record_id, content_hash, doc)
+
+        Returns True jika ada record baru yang ditulis.
+        """
+        by_session = {}
+        for record in records:
+            by_session.setdefault(record[0], []).append(record)
+        
+        pending = []
+        for session_id, session_records in by_session.items():
+            collection = self.get_session_collection(session_id, create=True)
+            loose_ids = [record_id for _, document_id, record_id, _, _ in session_records if not document_id]
+            loose_existing = set(collection.get(ids=loose_ids, include=[])['ids']) if loose_ids else set()
+            
+            lexical_records = {}
+            for _, document_id, record_id, content_hash, doc in session_records:
+                # Index BM25 ikut diperbarui (termasuk chunk lama yang belum ter-index)
+                lexical_records[record_id] = doc.page_content
+                stored = existing[(session_id, document_id)] if document_id else loose_existing
+                outcome = 'reused' if record_id in stored else 'added'
+                stats[outcome] += 1
+                if document_id:
+                    stats['documents'][document_id][outcome] += 1
+                if outcome == 'added':
+                    pending.append((collection, record_id, content_hash, doc))
+            
+            # Satu kali tulis index BM25 per session untuk setiap batch
+            self.lexical_index.update(session_id, lexical_records)
+        
+        if not pending:
+            return False
+        
+        # Pakai ulang vektor yang pernah di-embed (session lain), embed hanya konten baru
+        vectors = self.vector_registry.get_many(sorted({h for _, _, h, _ in pending}))
+        vectors_reused = sum(1 for _, _, h, _ in pending if h in vectors)
+        stats['vectors_reused'] += vectors_reused
+        
+        new_contents = {}
+        for _, _, content_hash, doc in pending:
+            if content_hash not in vectors:
+                new_contents.setdefault(content_hash, doc.page_content)
+        
+        if new_contents:
+            new_vectors = dict(zip(new_contents.keys(), embed_documents(list(new_contents.values()))))
+            self.vector_registry.put_many(new_vectors)
+            vectors.update(new_vectors)
+            stats['embedded'] += len(pending) - vectors_reused
+        
+        # Bulk upsert per partisi, dipecah sesuai batas batch ChromaDB
+        max_batch = getattr(self.chroma_client, 'max_batch_size', 5000)
+        by_collection = {}
+        for collection, record_id, content_hash, doc in pending:
+            metadata = self._clean_metadata(doc.metadata)
+            metadata['content_hash'] = content_hash
+            batch = by_collection.setdefault(collection.name, (collection, [], [], [], []))
+            batch[1].append(record_id)
+            batch[2].append(vectors[content_hash])
+            batch[3].append(metadata)
+            batch[4].append(doc.page_content)
+        
+        for collection, ids, embeddings, metadatas, contents in by_collection.values():
+            for start in range(0, len(ids), max_batch):
+                end = start + max_batch
+                collection.upsert(
+                    ids=ids[start:end],
+                    embeddings=embeddings[start:end],
+                    metadatas=metadatas[start:end],
+                    documents=contents[start:end]
+                )
+        return True
+    
     def add_documents(self, documents: List[Document]) -> bool:
         """Add documents to vector store"""
         try:
@@ -52,13 +318,16 @@ class VectorStoreManager:
                 logger.warning("No documents to add")
                 return False
             
-            # Log metadata dari setiap dokumen untuk debugging
-            for i, doc in enumerate(documents):
-                logger.info(f"Document {i} metadata: {doc.metadata}")
+            # Metadata per chunk hanya di level DEBUG dan di-sample
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, doc in enumerate(documents):
+                    logger.debug("Document %d metadata: %s", i, doc.metadata, extra=SAMPLED)
         
-            # Add documents to vector store
-            self.vectorstore.add_documents(documents)
-            logger.info(f"Added {len(documents)} documents to vector store")
+            # Add documents to vector store (dedup berdasarkan content hash)
+            stats = self.index_documents(documents)
+            logger.info(f"Added {stats['total']} documents to vector store "
+                        f"(added={stats['added']}, reused={stats['reused']}, deleted={stats['deleted']}, "
+                        f"embedded={stats['embedded']})")
             return True
             
         except Exception as e:
@@ -74,110 +343,312 @@ class VectorStoreManager:
                 query=query,
                 k=k,
             )
-            logger.info(f"Found {len(results)} similar documents for query")
+            logger.info("Found %d similar documents for query", len(results))
             return results
             
         except Exception as e:
             logger.error(f"Error searching documents: {str(e)}")
             return []
     
+    @timed('embed_query')
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query once so the vector can be reused by every search step"""
+        return self.embeddings.embed_query(query)
+    
+    @timed('embed_queries')
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries in one batched API call (cache-aware when enabled)"""
+        if not queries:
+            return []
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.embed_queries(queries)
+        return self.embeddings.embed_documents(queries)
+    
     def similarity_search_with_score(self, query: str, session_id: str, k: int = None) -> List[tuple]:
         """Search for similar documents with similarity scores"""
         try:
-            k = k or config.TOP_K_RESULTS
+            query_embedding = self.embed_query(query)
+            return self.similarity_search_by_vector_with_score(query_embedding, session_id, k=k)
             
-            # DIAGNOSA: Test apakah filter ChromaDB bekerja
-            #logger.info(f"Testing ChromaDB filter for session_id: '{session_id}'")
-            
-            # Test 1: Dengan filter
-            metadata_filter = {"session_id": session_id}
-            results_filtered = self.vectorstore.similarity_search_with_score(
-                query=query,
-                k=k,
-                filter=metadata_filter
-            )
+        except Exception as e:
+            logger.error(f"Error searching documents with score: {str(e)}")
+            logger.error(f"Exception type: {type(e).__name__}")
+            return []
+    
+    def similarity_search_by_vector_with_score(self, query_embedding: List[float], session_id: str, k: int = None) -> List[tuple]:
+        """Search session documents with a precomputed query embedding (satu query ChromaDB)"""
+        try:
+            k = k or config.TOP_K_RESULTS
+            return [(doc, score) for _, doc, score in self._search_session(query_embedding, session_id, k)]
             
-            # Test 2: Tanpa filter (untuk comparison)
-            results_no_filter = self.vectorstore.similarity_search_with_score(
-                query=query,
-                k=k * 3  # Ambil lebih banyak untuk manual filter
+        except Exception as e:
+            # Handle partisi bisa basi jika collection direset oleh worker lain
+            self._session_collections.pop(session_id, None)
+            logger.error(f"Error searching documents by vector: {str(e)}")
+            logger.error(f"Exception type: {type(e).__name__}")
+            return []
+    
+    def _search_session(self, query_embedding: List[float], session_id: str, k: int) -> List[tuple]:
+        """Vector search returning (record key, document, relevance score) above the threshold"""
+        return self._search_session_many([query_embedding], session_id, k)[0]
+    
+    @timed('vector_search')
+    def _search_session_many(self, query_embeddings: List[List[float]], session_id: str, k: int) -> List[List[tuple]]:
+        """Satu query ChromaDB untuk banyak embedding dalam session yang sama"""
+        collection = self.get_session_collection(session_id)
+        if collection is not None and collection.count() > 0:
+            # Query hanya ke partisi session, biaya sebanding dengan korpus session
+            result = collection.query(
+                query_embeddings=query_embeddings,
+                n_results=min(k, collection.count()),
+                include=['documents', 'metadatas', 'distances']
             )
-            
-            #logger.info(f"Results with ChromaDB filter: {len(results_filtered)}")
-            #logger.info(f"Results without filter: {len(results_no_filter)}")
-            
-            # Cek apakah filter benar-benar bekerja
-            filter_working = True
-            if len(results_filtered) > 0:
-                # Cek apakah ada hasil yang tidak sesuai session_id
-                for doc, score in results_filtered:
-                    if doc.metadata.get('session_id') != session_id:
-                        filter_working = False
-                        logger.warning("ChromaDB filter NOT working - found non-matching session_id")
-                        break
-            
-            # Jika filter tidak bekerja, gunakan manual filtering
-            if not filter_working or len(results_filtered) == 0:
-                logger.info("Using manual filtering approach")
-                
-                # Manual filter dari hasil tanpa filter
-                manual_filtered = [
-                    (doc, score) for doc, score in results_no_filter
-                    if doc.metadata.get('session_id') == session_id
+            relevance = self._relevance_score_fn(collection)
+            batches = [
+                [
+                    (record_id, Document(page_content=content, metadata=metadata or {}), relevance(distance))
+                    for record_id, content, metadata, distance in zip(ids, contents, metadatas, distances)
                 ]
-                
-                # Sort by score dan ambil top k
-                manual_filtered.sort(key=lambda x: x[1])  # Sort by score (ascending = better)
-                results = manual_filtered[:k]
-                
-                logger.info(f"Manual filtering found {len(results)} matching documents")
-            else:
-                logger.info("ChromaDB filter working correctly")
-                results = results_filtered
-            
-            # Debug log hasil final
-            logger.info(f"Final results count: {len(results)}")
-            for i, (doc, score) in enumerate(results):
-                doc_session_id = doc.metadata.get('session_id')
-                filename = doc.metadata.get('filename', 'N/A')
-                logger.info(f"Final Result {i}: filename={filename}, session_id='{doc_session_id}', score={score}")
-            
-            # Apply similarity threshold
-            filtered_results = [
-                (doc, score) for doc, score in results
-                if score >= config.SIMILARITY_THRESHOLD
+                for ids, contents, metadatas, distances in zip(
+                    result['ids'], result['documents'], result['metadatas'], result['distances']
+                )
             ]
-            
-            logger.info(f"Found {len(filtered_results)} documents above threshold ({config.SIMILARITY_THRESHOLD})")
+        elif self.collection.count() > 0:
+            # Data lama (sebelum partisi) masih ada di collection bersama
+            batches = [
+                [
+                    (doc.metadata.get('content_hash') or doc.page_content, doc, score)
+                    for doc, score in self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+                        embedding=query_embedding,
+                        k=k,
+                        filter={"session_id": session_id}
+                    )
+                ]
+                for query_embedding in query_embeddings
+            ]
+        else:
+            batches = [[] for _ in query_embeddings]
         
-            #logger.info(filtered_results)
-            return filtered_results
-            
+        # Apply similarity threshold
+        filtered_batches = [
+            [(key, doc, score) for key, doc, score in results if score >= config.SIMILARITY_THRESHOLD]
+            for results in batches
+        ]
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Vector search for session '%s': %d queries, %d results above threshold (%s)",
+                         session_id, len(query_embeddings), sum(len(results) for results in filtered_batches),
+                         config.SIMILARITY_THRESHOLD)
+        return filtered_batches
+    
+    def lexical_search(self, query: str, session_id: str, k: int = None) -> List[tuple]:
+        """BM25 candidates for hybrid search: (record_id, score, coverage)"""
+        candidates = max(k or config.TOP_K_RESULTS, config.HYBRID_CANDIDATES)
+        try:
+            with timed('lexical_search'):
+                return self.lexical_index.search(session_id, query, candidates)
         except Exception as e:
-            logger.error(f"Error searching documents with score: {str(e)}")
-            logger.error(f"Exception type: {type(e).__name__}")
+            logger.error(f"Error in lexical search: {str(e)}")
             return []
     
+    def needs_query_embedding(self, query: str, session_id: str, lexical_hits: Optional[List[tuple]] = None) -> bool:
+        """False when hybrid search can answer from the lexical index alone
+        
+        lexical_hits: hasil lexical_search yang sudah dihitung, agar BM25 tidak dijalankan dua kali
+        """
+        if not config.HYBRID_SEARCH_ENABLED:
+            return True
+        if lexical_hits is None:
+            lexical_hits = self.lexical_search(query, session_id)
+        return not self._is_decisive_lexical_match(lexical_hits)
+    
+    def hybrid_search(self, query: str, session_id: str, k: int = None,
+                      query_embedding: Optional[List[float]] = None) -> List[tuple]:
+        """BM25 + vector search fused with reciprocal rank fusion
+        
+        Scores are fused RRF scores normalized to 0-1. A decisive lexical match
+        is answered from the BM25 index alone, without embedding the query.
+        """
+        query_embeddings = {query: query_embedding} if query_embedding is not None else None
+        return self.hybrid_search_many([(query, session_id)], k=k, query_embeddings=query_embeddings)[0]
+    
+    @timed('hybrid_search')
+    def hybrid_search_many(self, queries: List[tuple], k: int = None,
+                           query_embeddings: Optional[Dict[str, List[float]]] = None,
+                           lexical_hits: Optional[List[List[tuple]]] = None) -> List[List[tuple]]:
+        """Hybrid search for many (query, session_id) pairs
+        
+        Query yang belum punya embedding di-embed dalam satu panggilan batch,
+        dan pencarian vektor dijalankan satu query ChromaDB per session.
+        lexical_hits: hasil lexical_search per query (urutan sama dengan queries), jika sudah dihitung.
+        """
+        k = k or config.TOP_K_RESULTS
+        query_embeddings = dict(query_embeddings or {})
+        
+        if not config.HYBRID_SEARCH_ENABLED:
+            missing = list(dict.fromkeys(query for query, _ in queries if query not in query_embeddings))
+            try:
+                query_embeddings.update(zip(missing, self.embed_queries(missing)))
+            except Exception as e:
+                logger.error(f"Error embedding queries: {str(e)}")
+                return [[] for _ in queries]
+            return [
+                self.similarity_search_by_vector_with_score(query_embeddings[query], session_id, k=k)
+                for query, session_id in queries
+            ]
+        
+        candidates = max(k, config.HYBRID_CANDIDATES)
+        results = [[] for _ in queries]
+        lexical = {}
+        vector_requests = {}
+        
+        for index, (query, session_id) in enumerate(queries):
+            if lexical_hits is not None:
+                hits = lexical_hits[index]
+            else:
+                hits = self.lexical_search(query, session_id, candidates)
+            lexical[index] = hits
+            
+            if self._is_decisive_lexical_match(hits):
+                logger.debug("Decisive lexical match for session '%s', skipping query embedding", session_id)
+                # Hanya hit yang sebanding dengan hit teratas; ekor hasil BM25 yang lemah dibuang
+                top_score = hits[0][1]
+                decisive_ranking = [
+                    record_id for record_id, score, _ in hits
+                    if score * config.LEXICAL_DECISIVE_RATIO >= top_score
+                ]
+                results[index] = self._fuse_results(session_id, [decisive_ranking], [], k)
+            else:
+                vector_requests.setdefault(session_id, []).append(index)
+        
+        missing = list(dict.fromkeys(
+            queries[index][0] for indices in vector_requests.values() for index in indices
+            if queries[index][0] not in query_embeddings
+        ))
+        if missing:
+            try:
+                query_embeddings.update(zip(missing, self.embed_queries(missing)))
+            except Exception as e:
+                logger.error(f"Error embedding queries, falling back to lexical results: {str(e)}")
+        
+        for session_id, indices in vector_requests.items():
+            try:
+                if any(queries[index][0] not in query_embeddings for index in indices):
+                    for index in indices:
+                        lexical_ranking = [record_id for record_id, _, _ in lexical[index]]
+                        results[index] = self._fuse_results(session_id, [lexical_ranking], [], k)
+                    continue
+                
+                vector_batches = self._search_session_many(
+                    [query_embeddings[queries[index][0]] for index in indices], session_id, candidates
+                )
+                for index, vector_hits in zip(indices, vector_batches):
+                    lexical_ranking = [record_id for record_id, _, _ in lexical[index]]
+                    results[index] = self._fuse_results(
+                        session_id, [lexical_ranking, [key for key, _, _ in vector_hits]], vector_hits, k
+                    )
+                    logger.debug("Hybrid search for session '%s': %d lexical, %d vector, %d fused",
+                                 session_id, len(lexical[index]), len(vector_hits), len(results[index]))
+            except Exception as e:
+                self._session_collections.pop(session_id, None)
+                logger.error(f"Error in hybrid search: {str(e)}")
+                logger.error(f"Exception type: {type(e).__name__}")
+        
+        return results
+    
+    def _fuse_results(self, session_id: str, rankings: List[List[str]], vector_hits: List[tuple], k: int) -> List[tuple]:
+        documents = {key: doc for key, doc, _ in vector_hits}
+        fused = self._reciprocal_rank_fusion(rankings)[:k]
+        
+        # Chunk yang hanya ditemukan BM25 diambil dari partisi tanpa embedding
+        missing = [record_id for record_id, _ in fused if record_id not in documents]
+        documents.update(self._get_session_documents(session_id, missing))
+        return [(documents[key], score) for key, score in fused if key in documents]
+    
+    @staticmethod
+    def _is_decisive_lexical_match(lexical_hits: List[tuple]) -> bool:
+        """Hasil teratas memuat semua istilah query dan jauh mengungguli hasil kedua"""
+        if not lexical_hits:
+            return False
+        
+        _, top_score, top_coverage = lexical_hits[0]
+        if top_coverage < 1.0:
+            return False
+        if len(lexical_hits) == 1:
+            return True
+        return top_score >= config.LEXICAL_DECISIVE_RATIO * lexical_hits[1][1]
+    
+    @staticmethod
+    def _reciprocal_rank_fusion(rankings: List[List[str]]) -> List[tuple]:
+        """Fuse ranked key lists; score 1.0 means ranked first in every list"""
+        scores = {}
+        for ranking in rankings:
+            for rank, key in enumerate(ranking, start=1):
+                scores[key] = scores.get(key, 0.0) + 1.0 / (config.RRF_K + rank)
+        
+        max_score = len(rankings) / (config.RRF_K + 1)
+        return sorted(
+            ((key, round(score / max_score, 4)) for key, score in scores.items()),
+            key=lambda item: item[1],
+            reverse=True
+        )
+    
+    @timed('fetch_documents')
+    def _get_session_documents(self, session_id: str, record_ids: List[str]) -> Dict[str, Document]:
+        """Fetch stored chunks of a session partition by record id"""
+        collection = self.get_session_collection(session_id)
+        if collection is None or not record_ids:
+            return {}
+        
+        result = collection.get(ids=record_ids, include=['documents', 'metadatas'])
+        return {
+            record_id: Document(page_content=content, metadata=metadata or {})
+            for record_id, content, metadata in zip(result['ids'], result['documents'], result['metadatas'])
+        }
+    
+    def get_cache_stats(self) -> dict:
+        """Get query embedding cache statistics"""
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.get_stats()
+        return {'enabled': False}
+    
+    def _list_partitions(self) -> list:
+        prefix = f"{config.COLLECTION_NAME}{config.PARTITION_SEPARATOR}"
+        return [
+            collection for collection in self.chroma_client.list_collections()
+            if collection.name.startswith(prefix)
+        ]
+    
     def get_collection_info(self) -> dict:
         """Get information about the current collection"""
         try:
             collection = self.chroma_client.get_collection(config.COLLECTION_NAME)
+            partitions = self._list_partitions()
             return {
                 'name': collection.name,
-                'count': collection.count(),
-                'metadata': collection.metadata
+                'count': collection.count() + sum(partition.count() for partition in partitions),
+                'metadata': collection.metadata,
+                'session_partitions': len(partitions)
             }
         except Exception as e:
             logger.error(f"Error getting collection info: {str(e)}")
             return {}
     
     def delete_collection(self) -> bool:
-        """Delete the entire collection"""
+        """Delete the entire collection, including every session partition"""
         try:
+            with self._partition_lock:
+                for partition in self._list_partitions():
+                    self.chroma_client.delete_collection(partition.name)
+                self._session_collections.clear()
+            
             self.chroma_client.delete_collection(config.COLLECTION_NAME)
+            self.vector_registry.clear()
+            self.lexical_index.clear()
             self._initialize_vectorstore()
+            self._notify_change()
             logger.info("Collection deleted and reinitialized")
             return True
         except Exception as e:
             logger.error(f"Error deleting collection: {str(e)}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,222 @@
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Optional, Iterable
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: tanpa file lock, aman selama hanya satu proses yang menulis
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Kata umum pertanyaan yang tidak membantu pencocokan istilah
+STOPWORDS = {
+    'apa', 'yang', 'dan', 'di', 'ke', 'dari', 'untuk', 'adalah', 'itu', 'ini', 'dengan',
+    'pada', 'dalam', 'atau', 'bagaimana', 'berapa', 'jelaskan', 'sebutkan', 'tentang',
+    'oleh', 'sebagai', 'juga', 'akan', 'tidak', 'bisa', 'dapat', 'ada', 'saja', 'mana',
+    'the', 'of', 'and', 'to', 'in', 'is', 'what', 'how', 'a', 'an', 'for'
+}
+
+TOKEN_PATTERN = re.compile(r'\w+(?:[./-]\w+)*')
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; nomor pasal/rumus seperti '3.2' atau 'pp-45' tetap utuh"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class SessionLexicalIndex:
+    """Inverted index BM25 untuk chunk satu session"""
+
+    def __init__(self, documents: Dict[str, Dict[str, int]] = None):
+        self.documents = {}
+        self.lengths = {}
+        self.postings = {}
+        self.total_length = 0
+        for record_id, term_counts in (documents or {}).items():
+            self.add(record_id, term_counts)
+
+    def copy(self) -> 'SessionLexicalIndex':
+        """Salinan yang bisa diubah tanpa mengganggu search yang sedang memakai index ini"""
+        index = SessionLexicalIndex()
+        index.documents = dict(self.documents)
+        index.lengths = dict(self.lengths)
+        index.postings = {term: dict(postings) for term, postings in self.postings.items()}
+        index.total_length = self.total_length
+        return index
+
+    def add(self, record_id: str, term_counts: Dict[str, int]):
+        if record_id in self.documents:
+            self.remove(record_id)
+
+        self.documents[record_id] = term_counts
+        self.lengths[record_id] = sum(term_counts.values())
+        self.total_length += self.lengths[record_id]
+        for term, count in term_counts.items():
+            self.postings.setdefault(term, {})[record_id] = count
+
+    def remove(self, record_id: str):
+        term_counts = self.documents.pop(record_id, None)
+        if term_counts is None:
+            return
+
+        self.total_length -= self.lengths.pop(record_id)
+        for term in term_counts:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(record_id, None)
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, query_terms: List[str], k: int, k1: float, b: float) -> List[Tuple[str, float, float]]:
+        """Return (record_id, bm25_score, query term coverage) sorted by score"""
+        if not self.documents or not query_terms:
+            return []
+
+        unique_terms = set(query_terms)
+        total_documents = len(self.documents)
+        average_length = self.total_length / total_documents or 1.0
+
+        scores = {}
+        matched_terms = {}
+        for term in unique_terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            idf = math.log(1 + (total_documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for record_id, count in postings.items():
+                denominator = count + k1 * (1 - b + b * self.lengths[record_id] / average_length)
+                scores[record_id] = scores.get(record_id, 0.0) + idf * count * (k1 + 1) / denominator
+                matched_terms[record_id] = matched_terms.get(record_id, 0) + 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            (record_id, score, matched_terms[record_id] / len(unique_terms))
+            for record_id, score in ranked
+        ]
+
+class LexicalIndex:
+    """Index BM25 per session, disimpan sebagai JSON di samping ChromaDB
+
+    Index yang sudah dimuat tidak pernah diubah di tempat: penulisan membuat salinan lalu
+    menukarnya, sehingga search cukup mengambil snapshot dan menghitung skor tanpa lock.
+    Penulisan dikunci per session (thread) dan dengan flock pada file lock (antar proses).
+    """
+
+    def __init__(self, index_dir: str, k1: float = 1.5, b: float = 0.75):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self._sessions = {}
+        self._session_locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        digest = hashlib.sha256((session_id or '').encode('utf-8')).hexdigest()[:24]
+        return os.path.join(self.index_dir, f"{digest}.json")
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            return self._session_locks.setdefault(session_id, threading.Lock())
+
+    @contextmanager
+    def _file_lock(self, session_id: str):
+        """Kunci eksklusif antar proses untuk load -> ubah -> replace file index session"""
+        if fcntl is None:
+            yield
+            return
+
+        with open(f"{self._path(session_id)}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _snapshot(self, session_id: str) -> SessionLexicalIndex:
+        """Index session saat ini; dimuat ulang hanya jika proses lain menulis ulang file-nya"""
+        mtime = self._mtime(self._path(session_id))
+        cached = self._sessions.get(session_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with self._session_lock(session_id):
+            return self._load(session_id)
+
+    def _load(self, session_id: str) -> SessionLexicalIndex:
+        """Load the session index from disk if it changed (dipanggil dengan lock session)"""
+        path = self._path(session_id)
+        mtime = self._mtime(path)
+        cached = self._sessions.get(session_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        index = SessionLexicalIndex()
+        if mtime is not None:
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    index = SessionLexicalIndex(json.load(file))
+            except Exception as e:
+                logger.error(f"Error loading lexical index for session {session_id}: {str(e)}")
+
+        self._sessions[session_id] = (mtime, index)
+        return index
+
+    def _save(self, session_id: str, index: SessionLexicalIndex):
+        path = self._path(session_id)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(index.documents, file, ensure_ascii=False)
+        os.replace(temp_path, path)
+        self._sessions[session_id] = (self._mtime(path), index)
+
+    def update(self, session_id: str, records: Dict[str, str] = None, removed_ids: Iterable[str] = None):
+        """Index chunk contents keyed by record id and drop deleted records, with one save"""
+        removed_ids = list(removed_ids or [])
+        if not records and not removed_ids:
+            return
+
+        # Tokenisasi di luar lock
+        term_counts = {record_id: dict(Counter(tokenize(content))) for record_id, content in (records or {}).items()}
+
+        with self._session_lock(session_id), self._file_lock(session_id):
+            index = self._load(session_id).copy()
+            for record_id in removed_ids:
+                index.remove(record_id)
+            for record_id, counts in term_counts.items():
+                index.add(record_id, counts)
+            self._save(session_id, index)
+
+    def add(self, session_id: str, records: Dict[str, str]):
+        """Index chunk contents keyed by their vector store record id"""
+        self.update(session_id, records=records)
+
+    def remove(self, session_id: str, record_ids: List[str]):
+        """Drop records deleted from the vector store"""
+        self.update(session_id, removed_ids=record_ids)
+
+    def search(self, session_id: str, query: str, k: int) -> List[Tuple[str, float, float]]:
+        """BM25 search within a session; returns (record_id, score, coverage)"""
+        return self._snapshot(session_id).search(tokenize(query), k, self.k1, self.b)
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.index_dir, ignore_errors=True)
+            os.makedirs(self.index_dir, exist_ok=True)
+            self._sessions.clear()
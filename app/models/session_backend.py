@@ -0,0 +1,188 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+class SessionBackend(ABC):
+    """Penyimpanan persisten riwayat session (blob terkompresi + nomor versi)
+
+    Penulisan memakai compare-and-set: record hanya ditulis jika versi tersimpan masih sama
+    dengan versi yang dibaca worker, sehingga dua worker tidak saling menimpa giliran percakapan.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        """(versi, data) tersimpan; None jika tidak ada atau sudah kedaluwarsa"""
+
+    @abstractmethod
+    def version(self, session_id: str) -> int:
+        """Versi tersimpan (0 jika tidak ada); dipakai worker lain untuk mendeteksi perubahan"""
+
+    @abstractmethod
+    def save_many(self, records: Dict[str, Tuple[int, bytes]]) -> Dict[str, int]:
+        """Tulis {session_id: (versi yang dibaca, data)}; hasilnya {session_id: versi baru}
+
+        Session yang tidak ada di hasil mengalami konflik (sudah diubah worker lain) dan tidak ditulis.
+        """
+
+class SQLiteSessionBackend(SessionBackend):
+    """Backend default: satu file SQLite (WAL) yang bisa dipakai bersama oleh worker di host yang sama"""
+
+    name = 'sqlite'
+
+    def __init__(self, db_path: str, ttl_seconds: int = None):
+        self.db_path = db_path
+        self.ttl_seconds = config.SESSION_STORE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, '
+            'data BLOB NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)')
+        self._connection.commit()
+        logger.info(f"Session store initialized at {self.db_path}")
+
+    def _expired_before(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds else 0.0
+
+    def load(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT version, data FROM sessions WHERE session_id = ? AND updated_at >= ?',
+                (session_id, self._expired_before())
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def version(self, session_id: str) -> int:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT version FROM sessions WHERE session_id = ? AND updated_at >= ?',
+                (session_id, self._expired_before())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def save_many(self, records: Dict[str, Tuple[int, bytes]]) -> Dict[str, int]:
+        now = time.time()
+        expired_before = self._expired_before()
+        saved = {}
+        with self._lock:
+            with self._connection:
+                for session_id, (version, data) in records.items():
+                    if version:
+                        cursor = self._connection.execute(
+                            'UPDATE sessions SET version = ?, data = ?, updated_at = ? '
+                            'WHERE session_id = ? AND version = ? AND updated_at >= ?',
+                            (version + 1, data, now, session_id, version, expired_before)
+                        )
+                    else:
+                        # Session baru, atau menimpa baris kedaluwarsa (versinya tetap naik)
+                        cursor = self._connection.execute(
+                            'INSERT INTO sessions (session_id, version, data, updated_at) VALUES (?, 1, ?, ?) '
+                            'ON CONFLICT (session_id) DO UPDATE SET version = sessions.version + 1, '
+                            'data = excluded.data, updated_at = excluded.updated_at '
+                            'WHERE sessions.updated_at < ? RETURNING version',
+                            (session_id, data, now, expired_before)
+                        )
+                        row = cursor.fetchone()
+                        if row:
+                            saved[session_id] = row[0]
+                        continue
+                    if cursor.rowcount:
+                        saved[session_id] = version + 1
+
+                if self.ttl_seconds:
+                    self._connection.execute('DELETE FROM sessions WHERE updated_at < ?', (expired_before,))
+        return saved
+
+# KEYS: key session; ARGV: ttl, lalu pasangan (versi yang dibaca, data) per key
+REDIS_SAVE_SCRIPT = """
+local saved = {}
+for i, key in ipairs(KEYS) do
+    local expected = tonumber(ARGV[i * 2])
+    local current = tonumber(redis.call('HGET', key, 'version') or '0')
+    if current == expected then
+        redis.call('HSET', key, 'version', expected + 1, 'data', ARGV[i * 2 + 1])
+        if tonumber(ARGV[1]) > 0 then
+            redis.call('EXPIRE', key, ARGV[1])
+        end
+        saved[i] = 1
+    else
+        saved[i] = 0
+    end
+end
+return saved
+"""
+
+class RedisSessionBackend(SessionBackend):
+    """Backend Redis (atau server kompatibel) untuk worker di beberapa host"""
+
+    name = 'redis'
+
+    def __init__(self, url: str, ttl_seconds: int = None, prefix: str = 'chatbot:session:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = config.SESSION_STORE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.prefix = prefix
+        self._save_script = self.client.register_script(REDIS_SAVE_SCRIPT)
+        self.client.ping()
+        logger.info("Session store connected to Redis")
+
+    def load(self, session_id: str) -> Optional[Tuple[int, bytes]]:
+        version, data = self.client.hmget(self.prefix + session_id, 'version', 'data')
+        if data is None:
+            return None
+        return int(version or 0), data
+
+    def version(self, session_id: str) -> int:
+        version = self.client.hget(self.prefix + session_id, 'version')
+        return int(version) if version is not None else 0
+
+    def save_many(self, records: Dict[str, Tuple[int, bytes]]) -> Dict[str, int]:
+        if not records:
+            return {}
+
+        session_ids = list(records)
+        arguments = [self.ttl_seconds or 0]
+        for session_id in session_ids:
+            arguments.extend(records[session_id])
+        # Satu script Lua: compare-and-set seluruh batch secara atomik dalam satu round trip
+        flags = self._save_script(keys=[self.prefix + session_id for session_id in session_ids], args=arguments)
+        return {
+            session_id: records[session_id][0] + 1
+            for session_id, flag in zip(session_ids, flags) if int(flag)
+        }
+
+def create_session_backend() -> Optional[SessionBackend]:
+    """Backend sesuai SESSION_BACKEND (sqlite / redis / memory); None berarti hanya in-process"""
+    backend = config.SESSION_BACKEND
+    if backend == 'memory':
+        return None
+
+    if backend == 'redis':
+        try:
+            return RedisSessionBackend(config.SESSION_REDIS_URL)
+        except ImportError:
+            logger.warning("redis package not installed, falling back to SQLite session store")
+        except Exception as e:
+            logger.error(f"Error connecting to Redis session store, falling back to SQLite: {str(e)}")
+
+    try:
+        return SQLiteSessionBackend(os.path.join(config.CHROMA_DB_PATH, config.SESSION_DB_FILENAME))
+    except Exception as e:
+        logger.error(f"Error initializing session store, sessions stay in memory only: {str(e)}")
+        return None
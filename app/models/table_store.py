@@ -0,0 +1,200 @@
+from typing import List, Dict, Any, Optional
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NUMBER_PATTERN = re.compile(r'^-?\d[\d.,]*$')
+QX_HEADER = re.compile(r'\bq[\s_]?x\b', re.IGNORECASE)
+
+def parse_number(cell: str) -> Optional[float]:
+    """Parse angka sel tabel: '5.000.000.000', '97,500', '0.001234', '15,2%', '(800)', 'Rp 1.000'"""
+    text = cell.replace('*', '').replace('Rp', '').replace('%', '').replace(' ', '').strip()
+    negative = text.startswith('(') and text.endswith(')')
+    if negative:
+        text = text[1:-1]
+    if not NUMBER_PATTERN.match(text):
+        return None
+
+    if '.' in text and ',' in text:
+        # Pemisah yang muncul terakhir adalah pemisah desimal
+        decimal = '.' if text.rfind('.') > text.rfind(',') else ','
+        thousands = ',' if decimal == '.' else '.'
+        text = text.replace(thousands, '').replace(decimal, '.')
+    else:
+        separator = '.' if '.' in text else ',' if ',' in text else None
+        if separator:
+            integer_part, _, fraction = text.rpartition(separator)
+            # '1.250' / '97,500' = ribuan; '0.001234' / '28.5' / '1,5' = desimal
+            if text.count(separator) > 1 or (len(fraction) == 3 and integer_part.lstrip('-') not in ('', '0')):
+                text = text.replace(separator, '')
+            else:
+                text = text.replace(separator, '.')
+
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+class TableStore:
+    """Penyimpanan kolumnar tabel markdown per session dan nama file
+
+    Kolom numerik disimpan sebagai array float64 (.npz), kolom teks dan
+    metadata tabel sebagai JSON.
+    """
+
+    NUMERIC_RATIO = 0.8
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self._sessions = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    @staticmethod
+    def _digest(value: str, length: int) -> str:
+        return hashlib.sha256((value or '').encode('utf-8')).hexdigest()[:length]
+
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.store_dir, self._digest(session_id, 24))
+
+    def _build_table(self, table: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert extracted header/row dicts into typed columns"""
+        headers = table['headers']
+        rows = table['rows']
+
+        labels = [[row.get(header, '') for header in headers] for row in rows]
+        columns = []
+        for index, header in enumerate(headers):
+            cells = [row[index] for row in labels]
+            values = [parse_number(cell) for cell in cells]
+            filled = [cell for cell in cells if cell.strip()]
+            parsed = [value for value in values if value is not None]
+
+            if filled and len(parsed) >= self.NUMERIC_RATIO * len(filled):
+                columns.append({
+                    'header': header,
+                    'kind': 'number',
+                    'unit': '%' if '%' in header or any('%' in cell for cell in cells) else '',
+                    'values': np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+                })
+            else:
+                columns.append({
+                    'header': header,
+                    'kind': 'text',
+                    'unit': '',
+                    'values': [cell.replace('*', '').strip() for cell in cells]
+                })
+
+        return {
+            'headers': headers,
+            'section': table.get('section', ''),
+            'columns': columns,
+            # Baris tebal / 'Total ...' adalah baris ringkasan, bukan data
+            'summary_rows': [
+                row[0].startswith('**') or row[0].replace('*', '').strip().lower().startswith('total')
+                for row in labels
+            ]
+        }
+
+    def index_document(self, session_id: str, filename: str, tables: List[Dict[str, Any]]) -> int:
+        """Replace the stored tables of one document; returns the number stored"""
+        built = [self._build_table(table) for table in tables if table.get('rows')]
+        session_dir = self._session_dir(session_id)
+        base = os.path.join(session_dir, self._digest(filename, 16))
+
+        with self._lock:
+            os.makedirs(session_dir, exist_ok=True)
+            if not built:
+                for extension in ('.json', '.npz'):
+                    if os.path.exists(base + extension):
+                        os.remove(base + extension)
+                self._sessions.pop(session_id, None)
+                return 0
+
+            arrays = {}
+            manifest = {'filename': filename, 'tables': []}
+            for table_index, table in enumerate(built):
+                columns = []
+                for column_index, column in enumerate(table['columns']):
+                    entry = {key: column[key] for key in ('header', 'kind', 'unit')}
+                    if column['kind'] == 'number':
+                        entry['array'] = f"t{table_index}_c{column_index}"
+                        arrays[entry['array']] = column['values']
+                    else:
+                        entry['values'] = column['values']
+                    columns.append(entry)
+                manifest['tables'].append({
+                    'headers': table['headers'],
+                    'section': table['section'],
+                    'summary_rows': table['summary_rows'],
+                    'columns': columns
+                })
+
+            # Tulis npz dulu lalu manifest, keduanya atomik lewat rename
+            with open(f"{base}.npz.tmp", 'wb') as file:
+                np.savez(file, **arrays)
+            os.replace(f"{base}.npz.tmp", f"{base}.npz")
+            with open(f"{base}.json.tmp", 'w', encoding='utf-8') as file:
+                json.dump(manifest, file, ensure_ascii=False)
+            os.replace(f"{base}.json.tmp", f"{base}.json")
+            self._sessions.pop(session_id, None)
+
+        logger.info(f"Indexed {len(built)} tables from {filename} for session {session_id}")
+        return len(built)
+
+    def get_tables(self, session_id: str) -> List[Dict[str, Any]]:
+        """All tables of a session, loaded once and reloaded when files change"""
+        session_dir = self._session_dir(session_id)
+        try:
+            version = os.stat(session_dir).st_mtime_ns
+        except OSError:
+            return []
+
+        with self._lock:
+            cached = self._sessions.get(session_id)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            tables = []
+            for name in sorted(os.listdir(session_dir)):
+                if not name.endswith('.json'):
+                    continue
+                base = os.path.join(session_dir, name[:-len('.json')])
+                try:
+                    with open(f"{base}.json", 'r', encoding='utf-8') as file:
+                        manifest = json.load(file)
+                    with np.load(f"{base}.npz") as arrays:
+                        for table in manifest['tables']:
+                            for column in table['columns']:
+                                if column['kind'] == 'number':
+                                    column['values'] = arrays[column.pop('array')]
+                            table['filename'] = manifest['filename']
+                            tables.append(table)
+                except Exception as e:
+                    logger.error(f"Error loading table store {base}: {str(e)}")
+
+            self._sessions[session_id] = (version, tables)
+            return tables
+
+    def has_mortality_table(self, session_id: str) -> bool:
+        """True jika dokumen session memuat tabel mortalitas (kolom qx)"""
+        return any(
+            QX_HEADER.search(column['header'])
+            for table in self.get_tables(session_id) for column in table['columns']
+            if column['kind'] == 'number'
+        )
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.store_dir, ignore_errors=True)
+            os.makedirs(self.store_dir, exist_ok=True)
+            self._sessions.clear()
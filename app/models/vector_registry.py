@@ -0,0 +1,82 @@
+from array import array
+from typing import List, Dict
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+class DocumentVectorRegistry:
+    """Vektor chunk per content hash, dipakai ulang lintas partisi session"""
+
+    def __init__(self, registry_path: str, model_name: str):
+        self.registry_path = registry_path
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._connection = None
+        self._initialize()
+
+    def _initialize(self):
+        try:
+            os.makedirs(os.path.dirname(self.registry_path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(self.registry_path, check_same_thread=False, timeout=30)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS document_vectors ('
+                'content_hash TEXT NOT NULL, model TEXT NOT NULL, vector BLOB NOT NULL, '
+                'PRIMARY KEY (content_hash, model))'
+            )
+            self._connection.commit()
+        except Exception as e:
+            logger.error(f"Error initializing document vector registry: {str(e)}")
+            self._connection = None
+
+    def get_many(self, content_hashes: List[str]) -> Dict[str, List[float]]:
+        """Get stored vectors for the given content hashes"""
+        if self._connection is None or not content_hashes:
+            return {}
+
+        vectors = {}
+        batch_size = 500
+        try:
+            with self._lock:
+                for start in range(0, len(content_hashes), batch_size):
+                    batch = content_hashes[start:start + batch_size]
+                    placeholders = ','.join('?' * len(batch))
+                    rows = self._connection.execute(
+                        f'SELECT content_hash, vector FROM document_vectors '
+                        f'WHERE model = ? AND content_hash IN ({placeholders})',
+                        [self.model_name, *batch]
+                    ).fetchall()
+                    for content_hash, blob in rows:
+                        vectors[content_hash] = array('f', blob).tolist()
+        except Exception as e:
+            logger.error(f"Error reading document vector registry: {str(e)}")
+        return vectors
+
+    def put_many(self, vectors: Dict[str, List[float]]):
+        """Store vectors keyed by content hash"""
+        if self._connection is None or not vectors:
+            return
+
+        try:
+            with self._lock:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO document_vectors (content_hash, model, vector) VALUES (?, ?, ?)',
+                    [
+                        (content_hash, self.model_name, array('f', vector).tobytes())
+                        for content_hash, vector in vectors.items()
+                    ]
+                )
+                self._connection.commit()
+        except Exception as e:
+            logger.error(f"Error writing document vector registry: {str(e)}")
+
+    def clear(self):
+        if self._connection is None:
+            return
+
+        with self._lock:
+            self._connection.execute('DELETE FROM document_vectors')
+            self._connection.commit()
@@ -0,0 +1,436 @@
+from typing import Dict, Any, Optional
+import logging
+import re
+
+import numpy as np
+
+from app.models.table_store import parse_number
+from app.utils.helpers import format_number
+
+logger = logging.getLogger(__name__)
+
+NUMBER = r'(\d[\d.,]*)'
+PERCENT = NUMBER + r'\s*(?:%|persen)'
+MONEY_UNITS = {'ribu': 1e3, 'rb': 1e3, 'juta': 1e6, 'jt': 1e6, 'miliar': 1e9, 'milyar': 1e9, 'triliun': 1e12}
+
+# 'bunga nominal 6%' / 'j(12)': bunga tahunan dibagi rata per periode, bukan dikonversi sebagai bunga efektif
+NOMINAL_CUES = re.compile(r'\bnominal\b|\bj\s*\(\s*12\s*\)|i\s*\(\s*12\s*\)', re.IGNORECASE)
+
+CALCULATION_CUES = re.compile(r'\b(hitung|hitunglah|berapa|calculate|compute|estimasi|proyeksi|proyeksikan)\b', re.IGNORECASE)
+
+class ActuarialEngine:
+    """Perhitungan aktuaria tervektorisasi (NumPy) untuk pertanyaan kalkulasi
+
+    Semua fungsi menerima skalar atau array, sehingga ribuan karyawan
+    dihitung dalam satu operasi array.
+    """
+
+    # Jenis perhitungan yang memakai asumsi mortalitas
+    MORTALITY_TYPES = {'life_annuity', 'pension_fund'}
+
+    # Asumsi mortalitas bawaan (hukum Makeham) jika tabel mortalitas tidak diberikan
+    MAKEHAM_A = 0.0002
+    MAKEHAM_B = 0.00003
+    MAKEHAM_C = 1.1
+    MAX_AGE = 110
+
+    def __init__(self):
+        self._commutation_cache = {}
+
+    def annuity_present_value(self, payment, rate, years, payments_per_year: int = 1, due: bool = False,
+                              nominal: bool = False) -> np.ndarray:
+        """Present value of an annuity-certain
+
+        rate adalah bunga efektif tahunan, j = (1 + i)^(1/m) - 1; dengan nominal=True rate adalah
+        bunga nominal i(m) yang dikonversi m kali setahun, j = i(m) / m.
+        """
+        payment, rate, years = np.broadcast_arrays(
+            np.asarray(payment, dtype=np.float64),
+            np.asarray(rate, dtype=np.float64),
+            np.asarray(years, dtype=np.float64)
+        )
+        if nominal:
+            period_rate = rate / payments_per_year
+        else:
+            period_rate = (1 + rate) ** (1 / payments_per_year) - 1
+        periods = years * payments_per_year
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = np.where(period_rate == 0, periods, (1 - (1 + period_rate) ** -periods) / period_rate)
+        if due:
+            factor = factor * (1 + period_rate)
+        return payment * factor
+
+    def future_value(self, present_value, rate, years) -> np.ndarray:
+        """Nilai Masa Depan = Nilai Saat Ini × (1 + r)ⁿ"""
+        return np.asarray(present_value, dtype=np.float64) * (1 + np.asarray(rate, dtype=np.float64)) ** np.asarray(years, dtype=np.float64)
+
+    def default_qx(self, ages: np.ndarray) -> np.ndarray:
+        """One-year death probabilities under the Makeham assumption"""
+        log_c = np.log(self.MAKEHAM_C)
+        survival = np.exp(-self.MAKEHAM_A - self.MAKEHAM_B * self.MAKEHAM_C ** ages * (self.MAKEHAM_C - 1) / log_c)
+        qx = 1 - survival
+        qx[ages >= self.MAX_AGE] = 1.0
+        return qx
+
+    def commutation_functions(self, rate: float, ages: np.ndarray = None, qx: np.ndarray = None,
+                              radix: float = 100000.0) -> Dict[str, np.ndarray]:
+        """lx, dx, Dx, Nx, Cx, Mx from a mortality table (default: Makeham)"""
+        use_default = ages is None or qx is None
+        cache_key = (round(float(rate), 10), radix)
+        if use_default and cache_key in self._commutation_cache:
+            return self._commutation_cache[cache_key]
+
+        if use_default:
+            ages = np.arange(0, self.MAX_AGE + 1, dtype=np.float64)
+            qx = self.default_qx(ages)
+        ages = np.asarray(ages, dtype=np.float64)
+        qx = np.asarray(qx, dtype=np.float64)
+
+        lx = radix * np.concatenate(([1.0], np.cumprod(1 - qx[:-1])))
+        dx = lx * qx
+        v = 1 / (1 + rate)
+        Dx = v ** ages * lx
+        Cx = v ** (ages + 1) * dx
+        # Nx = Σ D(x+t), Mx = Σ C(x+t): jumlah kumulatif dari belakang
+        Nx = np.cumsum(Dx[::-1])[::-1]
+        Mx = np.cumsum(Cx[::-1])[::-1]
+
+        functions = {'ages': ages, 'qx': qx, 'lx': lx, 'dx': dx, 'Dx': Dx, 'Nx': Nx, 'Cx': Cx, 'Mx': Mx}
+        if use_default:
+            self._commutation_cache[cache_key] = functions
+        return functions
+
+    def _age_index(self, functions: Dict[str, np.ndarray], ages) -> np.ndarray:
+        return np.clip(np.asarray(ages, dtype=np.int64) - int(functions['ages'][0]), 0, len(functions['ages']) - 1)
+
+    def life_annuity_due(self, ages, rate: float, payments_per_year: int = 1, deferred_to=None,
+                         functions: Dict[str, np.ndarray] = None) -> np.ndarray:
+        """äx (atau ä ditunda ke usia R, dilihat dari usia x), pendekatan Woolhouse untuk m kali setahun"""
+        functions = functions or self.commutation_functions(rate)
+        x = self._age_index(functions, ages)
+        start = x if deferred_to is None else self._age_index(functions, deferred_to)
+
+        D_x = functions['Dx'][x]
+        annuity = functions['Nx'][start] / D_x
+        if payments_per_year > 1:
+            annuity = annuity - (payments_per_year - 1) / (2 * payments_per_year) * functions['Dx'][start] / D_x
+        return annuity
+
+    def whole_life_insurance(self, ages, rate: float, functions: Dict[str, np.ndarray] = None) -> np.ndarray:
+        """Ax = Mx / Dx"""
+        functions = functions or self.commutation_functions(rate)
+        x = self._age_index(functions, ages)
+        return functions['Mx'][x] / functions['Dx'][x]
+
+    def project_salaries(self, annual_salaries, salary_growth, years: int) -> np.ndarray:
+        """Salary matrix (employees × years) with compound salary-scale growth"""
+        salaries = np.atleast_1d(np.asarray(annual_salaries, dtype=np.float64))
+        growth = np.atleast_1d(np.asarray(salary_growth, dtype=np.float64))
+        return salaries[:, None] * (1 + growth[:, None]) ** np.arange(int(years))[None, :]
+
+    def project_contributions(self, annual_salaries, contribution_rate, salary_growth, years: int,
+                              rate: float) -> Dict[str, Any]:
+        """Yearly contribution totals for all employees and their present value"""
+        salary_matrix = self.project_salaries(annual_salaries, salary_growth, years)
+        contributions = salary_matrix * np.atleast_1d(np.asarray(contribution_rate, dtype=np.float64))[:, None]
+        yearly = contributions.sum(axis=0)
+        discount = (1 + rate) ** -np.arange(int(years))
+        return {
+            'yearly': yearly,
+            'total': float(yearly.sum()),
+            'present_value': float(yearly @ discount)
+        }
+
+    def pension_liability(self, ages, monthly_salaries, retirement_age, rate: float, accrual_rate,
+                          functions: Dict[str, np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Dana pensiun per karyawan: manfaat bulanan × 12 × ä_R(12) × D_R / D_x
+
+        D_R / D_x = vⁿ × ₙpₓ mendiskonto ke usia sekarang dengan bunga dan peluang hidup sampai pensiun.
+        """
+        functions = functions or self.commutation_functions(rate)
+        ages = np.asarray(ages, dtype=np.float64)
+        monthly_salaries = np.asarray(monthly_salaries, dtype=np.float64)
+        retirement_age = np.asarray(retirement_age, dtype=np.float64)
+
+        years_to_retirement = np.maximum(retirement_age - ages, 0)
+        monthly_benefit = np.asarray(accrual_rate, dtype=np.float64) * years_to_retirement * monthly_salaries
+        annuity = self.life_annuity_due(retirement_age, rate, payments_per_year=12, functions=functions)
+        # Anuitas ditunda ke usia R dilihat dari usia x: ä_R(12) × D_R / D_x
+        deferred_annuity = self.life_annuity_due(ages, rate, payments_per_year=12, deferred_to=retirement_age,
+                                                 functions=functions)
+        return {
+            'years_to_retirement': years_to_retirement,
+            'monthly_benefit': monthly_benefit,
+            'annuity_factor': annuity,
+            'deferral_factor': deferred_annuity / annuity,
+            'present_value': monthly_benefit * 12 * deferred_annuity
+        }
+
+    @staticmethod
+    def _number(text: Optional[str]) -> Optional[float]:
+        return parse_number(text) if text else None
+
+    def _find(self, pattern: str, question: str) -> Optional[float]:
+        match = re.search(pattern, question, re.IGNORECASE)
+        return self._number(match.group(1)) if match else None
+
+    def _find_rate(self, keywords: str, question: str) -> Optional[float]:
+        value = self._find(rf'(?:{keywords})[^%\d]{{0,25}}{PERCENT}', question)
+        return value / 100 if value is not None else None
+
+    def _find_money(self, question: str) -> Optional[tuple]:
+        """First money amount in the question: (value, payments per year)"""
+        pattern = rf'(?:Rp\.?\s*{NUMBER}\s*({"|".join(MONEY_UNITS)})?|{NUMBER}\s*({"|".join(MONEY_UNITS)})\b)'
+        match = re.search(pattern, question, re.IGNORECASE)
+        if not match:
+            return None
+
+        value = self._number(match.group(1) or match.group(3))
+        unit = (match.group(2) or match.group(4) or '').lower()
+        if value is None:
+            return None
+        value *= MONEY_UNITS.get(unit, 1)
+
+        tail = question[match.end():match.end() + 20].lower()
+        per_year = 12 if re.match(r'\s*(?:/|per\s*)\s*bulan|\s*sebulan|\s*tiap bulan|\s*setiap bulan', tail) else 1
+        return value, per_year
+
+    def _find_current_age(self, question: str, retirement_match) -> Optional[float]:
+        """Usia sekarang: sebutan usia pertama yang bukan bagian dari frasa usia pensiun"""
+        for match in re.finditer(rf'(?:usia|umur|age)(?!\s*pensiun)\s*(?:rata-rata\s*)?(?:masuk\s*)?{NUMBER}',
+                                 question, re.IGNORECASE):
+            if retirement_match and match.start() < retirement_match.end() and retirement_match.start() < match.end():
+                continue
+            return self._number(match.group(1))
+        return None
+
+    def parse_question(self, question: str) -> Optional[Dict[str, Any]]:
+        """Detect a calculation intent and its parameters; None if not a complete calculation request"""
+        if not CALCULATION_CUES.search(question):
+            return None
+        text = question.lower()
+
+        rate = self._find_rate(r'bunga|diskonto|discount|interest|imbal hasil', question)
+        growth = self._find_rate(r'kenaikan gaji|pertumbuhan gaji|kenaikan|pertumbuhan|salary growth|growth', question)
+        years = self._find(rf'(?:selama|jangka|periode|dalam|for)\s*{NUMBER}\s*(?:tahun|years?)', question)
+        employees = self._find(rf'{NUMBER}\s*(?:orang\s*)?(?:karyawan|pegawai|peserta|employees)', question)
+        retirement_match = re.search(rf'(?:usia pensiun|pensiun pada usia|pensiun usia|retirement age)\s*{NUMBER}',
+                                     question, re.IGNORECASE)
+        retirement_age = self._number(retirement_match.group(1)) if retirement_match else None
+        age = self._find_current_age(question, retirement_match)
+        money = self._find_money(question)
+
+        if 'dana pensiun' in text or 'liabilitas pensiun' in text or 'pension' in text:
+            accrual = self._find_rate(r'manfaat|accrual', question)
+            if None in (money, age, retirement_age, rate, accrual):
+                return None
+            if age >= retirement_age:
+                # Sudah/lewat usia pensiun: bukan kasus akumulasi, serahkan ke retrieval/LLM
+                return None
+            return {
+                'type': 'pension_fund',
+                'employees': int(employees or 1),
+                'monthly_salary': money[0] if money[1] == 12 else money[0] / 12,
+                'age': age,
+                'retirement_age': retirement_age,
+                'rate': rate,
+                'accrual_rate': accrual
+            }
+
+        if ('iuran' in text or 'kontribusi' in text) and ('proyeksi' in text or 'total' in text):
+            contribution_rate = self._find_rate(r'iuran|kontribusi|contribution', question)
+            if None in (money, contribution_rate, years):
+                return None
+            return {
+                'type': 'contribution_projection',
+                'employees': int(employees or 1),
+                'annual_salary': money[0] * money[1],
+                'contribution_rate': contribution_rate,
+                'salary_growth': growth or 0.0,
+                'years': int(years),
+                'rate': rate or 0.0
+            }
+
+        if 'gaji' in text and ('proyeksi' in text or growth is not None):
+            if None in (money, growth, years):
+                return None
+            return {
+                'type': 'salary_projection',
+                'employees': int(employees or 1),
+                'salary': money[0],
+                'per_year': money[1],
+                'salary_growth': growth,
+                'years': int(years)
+            }
+
+        if 'anuitas seumur hidup' in text or 'life annuity' in text:
+            if None in (age, rate):
+                return None
+            return {
+                'type': 'life_annuity',
+                'age': age,
+                'rate': rate,
+                'payment': money[0] if money else None,
+                'payments_per_year': money[1] if money else 1
+            }
+
+        if 'anuitas' in text or 'annuity' in text or 'nilai sekarang' in text or 'present value' in text:
+            if None in (money, rate, years):
+                return None
+            return {
+                'type': 'annuity_pv',
+                'payment': money[0],
+                'payments_per_year': money[1],
+                'rate': rate,
+                'years': years,
+                'due': bool(re.search(r'awal (?:periode|bulan|tahun)|anuitas awal|annuity.due', text)),
+                'nominal': money[1] > 1 and NOMINAL_CUES.search(question) is not None
+            }
+
+        if 'nilai masa depan' in text or 'future value' in text:
+            if None in (money, rate or growth, years):
+                return None
+            return {'type': 'future_value', 'present_value': money[0], 'rate': rate or growth, 'years': years}
+
+        return None
+
+    @staticmethod
+    def _rupiah(value: float) -> str:
+        return f"Rp {format_number(value, 0)}"
+
+    @staticmethod
+    def _percent(rate: float, decimals: int = 2) -> str:
+        return f"{format_number(rate * 100, decimals).rstrip('0').rstrip(',')}%"
+
+    def answer(self, question: str, parameters: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """Compute the answer for a calculation question, or None if it is not one
+
+        parameters: hasil parse_question yang sudah dihitung pemanggil
+        """
+        parameters = parameters or self.parse_question(question)
+        if parameters is None:
+            return None
+
+        kind = parameters['type']
+        if kind == 'annuity_pv':
+            value = float(self.annuity_present_value(
+                parameters['payment'], parameters['rate'], parameters['years'],
+                payments_per_year=parameters['payments_per_year'], due=parameters['due'],
+                nominal=parameters['nominal']
+            ))
+            period = 'bulan' if parameters['payments_per_year'] == 12 else 'tahun'
+            answer = (
+                f"Nilai sekarang anuitas: **{self._rupiah(value)}**\n\n"
+                f"- Pembayaran {self._rupiah(parameters['payment'])} per {period} selama "
+                f"{format_number(parameters['years'], 0)} tahun ({'awal' if parameters['due'] else 'akhir'} periode)\n"
+            )
+            if parameters['payments_per_year'] == 1:
+                answer += f"- Tingkat bunga {self._percent(parameters['rate'])} per tahun\n"
+            elif parameters['nominal']:
+                period_rate = parameters['rate'] / parameters['payments_per_year']
+                answer += (
+                    f"- Tingkat bunga nominal {self._percent(parameters['rate'])} per tahun, dibagi rata: "
+                    f"j = {self._percent(parameters['rate'])} / {parameters['payments_per_year']} = "
+                    f"{self._percent(period_rate, 4)} per {period}\n"
+                )
+            else:
+                period_rate = (1 + parameters['rate']) ** (1 / parameters['payments_per_year']) - 1
+                answer += (
+                    f"- Tingkat bunga {self._percent(parameters['rate'])} per tahun dianggap bunga efektif: "
+                    f"j = (1 + i)^(1/{parameters['payments_per_year']}) - 1 = {self._percent(period_rate, 4)} per {period} "
+                    f"(sebut \"bunga nominal\" jika yang dimaksud i/{parameters['payments_per_year']})\n"
+                )
+            answer += f"- Rumus: PV = P × (1 - (1 + j)⁻ⁿ) / j, dengan j bunga per {period}"
+        elif kind == 'future_value':
+            value = float(self.future_value(parameters['present_value'], parameters['rate'], parameters['years']))
+            answer = (
+                f"Nilai masa depan: **{self._rupiah(value)}**\n\n"
+                f"- Nilai saat ini {self._rupiah(parameters['present_value'])}, pertumbuhan "
+                f"{self._percent(parameters['rate'])} per tahun selama {format_number(parameters['years'], 0)} tahun\n"
+                f"- Rumus: Nilai Masa Depan = Nilai Saat Ini × (1 + r)ⁿ"
+            )
+        elif kind == 'life_annuity':
+            factor = float(self.life_annuity_due(parameters['age'], parameters['rate'],
+                                                 payments_per_year=parameters['payments_per_year']))
+            payments_per_year = parameters['payments_per_year']
+            value = factor
+            answer = (
+                f"Faktor anuitas seumur hidup ä{format_number(parameters['age'], 0)}"
+                f"{'(12)' if payments_per_year == 12 else ''}: **{format_number(factor, 4)}**\n\n"
+            )
+            if parameters['payment']:
+                # Faktor ä(12) berlaku untuk total pembayaran setahun
+                value = factor * parameters['payment'] * payments_per_year
+                answer += (
+                    f"- Nilai sekarang pembayaran {self._rupiah(parameters['payment'])} per "
+                    f"{'bulan' if payments_per_year == 12 else 'tahun'}: {self._rupiah(value)}\n"
+                )
+            answer += (
+                f"- Tingkat bunga {self._percent(parameters['rate'])}, äx = Nx / Dx\n"
+                f"- Asumsi mortalitas: hukum Makeham (pendekatan, bukan TMI)"
+            )
+        elif kind == 'salary_projection':
+            annual = parameters['salary'] * parameters['per_year']
+            projection = self.project_salaries(
+                np.full(parameters['employees'], annual), parameters['salary_growth'], parameters['years'] + 1
+            )
+            final_salary = float(projection[0, -1]) / parameters['per_year']
+            total_payroll = float(projection[:, -1].sum())
+            value = final_salary
+            answer = (
+                f"Proyeksi gaji setelah {parameters['years']} tahun: **{self._rupiah(final_salary)}** per "
+                f"{'bulan' if parameters['per_year'] == 12 else 'tahun'} per karyawan\n\n"
+                f"- Gaji awal {self._rupiah(parameters['salary'])}, kenaikan "
+                f"{self._percent(parameters['salary_growth'])} per tahun\n"
+                f"- Total gaji tahunan {parameters['employees']} karyawan di tahun ke-{parameters['years']}: "
+                f"{self._rupiah(total_payroll)}\n"
+                f"- Rumus: S(t) = S(0) × (1 + g)ᵗ"
+            )
+        elif kind == 'contribution_projection':
+            result = self.project_contributions(
+                np.full(parameters['employees'], parameters['annual_salary']),
+                parameters['contribution_rate'], parameters['salary_growth'], parameters['years'], parameters['rate']
+            )
+            value = result['total']
+            answer = (
+                f"Total iuran {parameters['employees']} karyawan selama {parameters['years']} tahun: "
+                f"**{self._rupiah(result['total'])}**\n\n"
+                f"- Iuran tahun pertama {self._rupiah(float(result['yearly'][0]))}, tahun terakhir "
+                f"{self._rupiah(float(result['yearly'][-1]))}\n"
+                f"- Iuran {self._percent(parameters['contribution_rate'])} dari gaji tahunan "
+                f"{self._rupiah(parameters['annual_salary'])}, kenaikan gaji {self._percent(parameters['salary_growth'])}\n"
+                + (f"- Nilai sekarang iuran (bunga {self._percent(parameters['rate'])}): "
+                   f"{self._rupiah(result['present_value'])}" if parameters['rate'] else '')
+            ).rstrip()
+        else:
+            employees = parameters['employees']
+            result = self.pension_liability(
+                np.full(employees, parameters['age']), np.full(employees, parameters['monthly_salary']),
+                np.full(employees, parameters['retirement_age']), parameters['rate'], parameters['accrual_rate']
+            )
+            per_employee = float(result['present_value'][0])
+            value = float(result['present_value'].sum())
+            years_to_retirement = float(result['years_to_retirement'][0])
+            answer = (
+                f"Estimasi dana pensiun untuk {employees} karyawan: **{self._rupiah(value)}**\n\n"
+                f"- Masa kerja tersisa = {format_number(parameters['retirement_age'], 0)} - "
+                f"{format_number(parameters['age'], 0)} = {format_number(years_to_retirement, 0)} tahun\n"
+                f"- Manfaat per bulan = ({self._percent(parameters['accrual_rate'])} × "
+                f"{format_number(years_to_retirement, 0)} tahun) × {self._rupiah(parameters['monthly_salary'])} = "
+                f"{self._rupiah(float(result['monthly_benefit'][0]))}\n"
+                f"- ä{format_number(parameters['retirement_age'], 0)}(12) = "
+                f"{format_number(float(result['annuity_factor'][0]), 4)} (bunga {self._percent(parameters['rate'])}, "
+                f"mortalitas hukum Makeham)\n"
+                f"- D{format_number(parameters['retirement_age'], 0)} / D{format_number(parameters['age'], 0)} = "
+                f"{format_number(float(result['deferral_factor'][0]), 4)} (diskonto bunga × peluang hidup sampai pensiun)\n"
+                f"- Dana per karyawan = manfaat × 12 × ä(12) × D_R / D_x = {self._rupiah(per_employee)}"
+            )
+
+        logger.info("Answered calculation question locally (%s)", kind)
+        return {
+            'answer': answer,
+            'value': value,
+            'type': kind,
+            'parameters': parameters
+        }
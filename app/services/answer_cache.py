@@ -0,0 +1,130 @@
+from typing import List, Dict, Any, Optional
+import copy
+import logging
+import threading
+import time
+
+import numpy as np
+
+from app.config import config
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+class SemanticAnswerCache:
+    """Cache jawaban berdasarkan kemiripan cosine embedding pertanyaan"""
+
+    def __init__(self, similarity_threshold: float = None, ttl_seconds: int = None, max_entries: int = None):
+        self.similarity_threshold = similarity_threshold or config.ANSWER_CACHE_SIMILARITY_THRESHOLD
+        self.ttl_seconds = ttl_seconds or config.ANSWER_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or config.ANSWER_CACHE_MAX_ENTRIES
+
+        self._lock = threading.Lock()
+        # Ring buffer berkapasitas max_entries: matriks vektor dialokasikan sekali saat store pertama
+        # (dimensi baru diketahui), entri terlama ada di slot _start dan slotnya dipakai ulang saat penuh
+        self._vectors = None
+        self._entries = [None] * self.max_entries
+        self._occupied = np.zeros(self.max_entries, dtype=bool)
+        self._start = 0
+        self._count = 0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'evictions': 0
+        }
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response for the most similar question, if close enough"""
+        query = self._normalize(embedding)
+
+        with self._lock:
+            self._evict_expired(time.time())
+
+            if not self._count or self._vectors.shape[1] != query.shape[0]:
+                self._stats['misses'] += 1
+                record_cache('answer', hit=False)
+                return None
+
+            similarities = self._vectors @ query
+            similarities[~self._occupied] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self._stats['misses'] += 1
+                record_cache('answer', hit=False)
+                return None
+
+            self._stats['hits'] += 1
+            record_cache('answer', hit=True)
+            entry = self._entries[best]
+            logger.info("Answer cache hit (similarity=%.3f) for: %.80s", similarities[best], entry['question'])
+            return copy.deepcopy(entry['response'])
+
+    def store(self, embedding: List[float], question: str, response: Dict[str, Any]):
+        """Cache a response under the question embedding"""
+        vector = self._normalize(embedding)
+
+        with self._lock:
+            if self._vectors is not None and self._vectors.shape[1] != vector.shape[0]:
+                # Dimensi embedding berubah (model diganti): mulai dari awal
+                self._clear()
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            if self._count == self.max_entries:
+                # Penuh: timpa slot entri terlama
+                slot = self._start
+                self._start = (self._start + 1) % self.max_entries
+                self._stats['evictions'] += 1
+            else:
+                slot = (self._start + self._count) % self.max_entries
+                self._count += 1
+
+            self._vectors[slot] = vector
+            self._occupied[slot] = True
+            self._entries[slot] = {
+                'question': question,
+                'response': copy.deepcopy(response),
+                'created_at': time.time()
+            }
+
+    def invalidate(self):
+        """Drop all cached answers (dipanggil saat dokumen berubah)"""
+        with self._lock:
+            if self._count:
+                logger.info(f"Invalidating {self._count} cached answers")
+            self._clear()
+            self._stats['invalidations'] += 1
+
+    def _clear(self):
+        self._vectors = None
+        self._entries = [None] * self.max_entries
+        self._occupied[:] = False
+        self._start = 0
+        self._count = 0
+
+    def _evict_expired(self, now: float):
+        # Entri disimpan berurutan waktu mulai dari _start, jadi yang kedaluwarsa ada di depan
+        while self._count and now - self._entries[self._start]['created_at'] >= self.ttl_seconds:
+            self._entries[self._start] = None
+            self._occupied[self._start] = False
+            self._start = (self._start + 1) % self.max_entries
+            self._count -= 1
+            self._stats['evictions'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = self._count
+
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / total, 3) if total else 0.0
+        stats['similarity_threshold'] = self.similarity_threshold
+        return stats
@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator
+import logging
+import queue
+import time
+import traceback
+import uuid
+
+from app.config import config
+from app.services.chat_service import ActuarialChatService
+
+logger = logging.getLogger(__name__)
+
+class BatchQuestionRunner:
+    """Jalankan banyak pertanyaan sekaligus: embedding satu batch, pencarian per session, LLM paralel
+
+    Pertanyaan dalam satu session dijawab berurutan sesuai input agar riwayatnya deterministik;
+    session berbeda berjalan paralel. Riwayat batch disimpan di session sementara kecuali item
+    meminta 'use_history', sehingga batch evaluasi tidak menulis ke riwayat pengguna.
+    """
+
+    MODES = ('project', 'general')
+
+    def __init__(self, chat_service: ActuarialChatService, max_concurrency: int = None):
+        self.chat_service = chat_service
+        self.vector_store_manager = chat_service.vector_store_manager
+        self.max_concurrency = max_concurrency or config.BATCH_MAX_CONCURRENCY
+
+    def run(self, items: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield one result per question in completion order, then a summary record
+
+        Each item needs 'question'; 'session_id', 'mode' ('project' or 'general'),
+        'use_history' and a client-side 'id' are optional.
+        """
+        start_time = time.perf_counter()
+        workers = max(1, self.max_concurrency)
+        batch_id = uuid.uuid4().hex[:12]
+
+        questions = []
+        for index, item in enumerate(items):
+            question = str(item.get('question') or '').strip()
+            mode = item.get('mode', 'project')
+            entry = {
+                'index': index,
+                'id': item.get('id'),
+                'question': question,
+                'session_id': item.get('session_id') or 'default',
+                'mode': mode
+            }
+            if not item.get('use_history'):
+                entry['history_session_id'] = f"batch-{batch_id}:{entry['session_id']}"
+            if not question or mode not in self.MODES:
+                yield dict(entry, success=False, error='Question cannot be empty' if not question else f"Unknown mode '{mode}'")
+                continue
+            questions.append(entry)
+
+        prefetched = self._prefetch(questions)
+
+        # Satu antrean kerja per riwayat: berurutan di dalam session, paralel antar session
+        groups = {}
+        for entry in questions:
+            groups.setdefault(entry.get('history_session_id') or entry['session_id'], []).append(entry)
+
+        completed = queue.Queue()
+        failed = 0
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-ask') as pool:
+                for entries in groups.values():
+                    pool.submit(self._answer_group, entries, prefetched, completed)
+                for _ in questions:
+                    record = completed.get()
+                    failed += 0 if record['success'] else 1
+                    yield record
+        finally:
+            for entry in questions:
+                if 'history_session_id' in entry:
+                    self.chat_service.session_store.discard(entry['history_session_id'])
+
+        elapsed = time.perf_counter() - start_time
+        logger.info("Batch of %d questions finished in %.2fs (%d sessions, %d workers)",
+                    len(items), elapsed, len(groups), workers)
+        yield {
+            'summary': True,
+            'total': len(items),
+            'failed': failed + len(items) - len(questions),
+            'elapsed_seconds': round(elapsed, 3)
+        }
+
+    def _prefetch(self, questions: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """Embed semua query dalam satu panggilan dan jalankan pencarian project sekaligus"""
+        prefetched = {}
+        if not questions:
+            return prefetched
+
+        project = [entry for entry in questions if entry['mode'] == 'project']
+        general = [entry for entry in questions if entry['mode'] == 'general']
+
+        # BM25 sekali per pertanyaan; hasilnya dipakai lagi oleh hybrid_search_many
+        lexical_hits = None
+        if config.HYBRID_SEARCH_ENABLED:
+            lexical_hits = [
+                self.vector_store_manager.lexical_search(entry['question'], entry['session_id'], config.TOP_K_RESULTS)
+                for entry in project
+            ]
+        texts = [
+            entry['question'] for position, entry in enumerate(project)
+            if self.vector_store_manager.needs_query_embedding(
+                entry['question'], entry['session_id'], lexical_hits[position] if lexical_hits else None
+            )
+        ]
+        if self.chat_service.answer_cache is not None:
+            texts += [entry['question'] for entry in general]
+        texts = list(dict.fromkeys(texts))
+
+        embeddings = {}
+        try:
+            embeddings = dict(zip(texts, self.vector_store_manager.embed_queries(texts)))
+        except Exception as e:
+            logger.error(f"Error batch embedding questions: {str(e)}")
+
+        if project:
+            results = self.vector_store_manager.hybrid_search_many(
+                [(entry['question'], entry['session_id']) for entry in project],
+                k=config.TOP_K_RESULTS,
+                query_embeddings=embeddings,
+                lexical_hits=lexical_hits
+            )
+            for entry, retrieved in zip(project, results):
+                prefetched[entry['index']] = {'retrieved': retrieved}
+
+        for entry in general:
+            if entry['question'] in embeddings:
+                prefetched[entry['index']] = {'query_embedding': embeddings[entry['question']]}
+
+        logger.info("Prefetched %d query embeddings and %d searches for batch", len(texts), len(project))
+        return prefetched
+
+    def _answer_group(self, entries: List[Dict[str, Any]], prefetched: Dict[int, Dict[str, Any]],
+                      completed: queue.Queue):
+        for entry in entries:
+            completed.put(self._answer(entry, prefetched.get(entry['index'])))
+
+    def _answer(self, entry: Dict[str, Any], prefetched: Dict[str, Any] = None) -> Dict[str, Any]:
+        prefetched = prefetched or {}
+        start_time = time.perf_counter()
+        try:
+            if entry['mode'] == 'project':
+                result = self.chat_service.ask_project(
+                    entry['question'], entry['session_id'], retrieved=prefetched.get('retrieved'),
+                    history_session_id=entry.get('history_session_id')
+                )
+            else:
+                result = self.chat_service.ask_question(
+                    entry['question'], entry['session_id'], query_embedding=prefetched.get('query_embedding'),
+                    history_session_id=entry.get('history_session_id')
+                )
+            success = result.get('mode') != 'error'
+        except Exception as e:
+            logger.error(f"Error answering batch question {entry['index']}: {str(e)}")
+            logger.error(traceback.format_exc())
+            result, success = {'error': str(e)}, False
+
+        entry = {key: value for key, value in entry.items() if key != 'history_session_id'}
+        return dict(entry, success=success, elapsed_seconds=round(time.perf_counter() - start_time, 3), data=result)
@@ -1,40 +1,87 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
 from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
+from langchain.memory.chat_memory import BaseChatMemory
 import traceback
-from langchain.chains import ConversationalRetrievalChain, LLMChain
+from langchain.chains import LLMChain, StuffDocumentsChain
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
 from langchain.prompts import PromptTemplate
 from langchain.schema import Document
+from langchain_core.prompts import format_document
 import logging
 import json
+import re
+import time
 
 from app.config import config
 from app.models.embeddings import VectorStoreManager
+from app.models.table_store import TableStore
+from app.models.session_backend import create_session_backend
+from app.services.session_memory import SessionMemoryStore
+from app.services.conversation_summarizer import ConversationSummarizer
+from app.services.actuarial_engine import ActuarialEngine
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.table_qa import TableQuestionAnswerer
+from app.services.context_builder import ContextBuilder
+from app.utils.metrics import timed, record_cache, ANSWERS, CONTEXT_TOKENS, FIRST_TOKEN_LATENCY, TokenUsageCallbackHandler
 
 logger = logging.getLogger(__name__)
 
+# Penanda pertanyaan lanjutan; dicocokkan per kata agar 'menghitung' atau 'terjadi' tidak ikut terdeteksi
+CONVERSATIONAL_PATTERN = re.compile(r'\b(?:' + '|'.join([
+    'itu', 'tersebut', 'yang tadi', 'sebelumnya', 'lalu bagaimana',
+    'kemudian', 'selanjutnya', 'jadi', 'berarti', 'maksudnya',
+    'contohnya', 'misalnya', 'bagaimana dengan', 'lalu', 'terus'
+]) + r')\b')
+
 class ActuarialChatService:
-    def __init__(self):
-        self.llm = ChatOpenAI(
+    def __init__(self, vector_store_manager: Optional[VectorStoreManager] = None, llm: Optional[ChatOpenAI] = None,
+                 table_store: Optional[TableStore] = None, condense_llm: Optional[ChatOpenAI] = None):
+        self.llm = llm or ChatOpenAI(
             model=config.OPENAI_MODEL,
             temperature=0.1,
-            api_key=config.OPENAI_API_KEY
+            api_key=config.OPENAI_API_KEY,
+            stream_usage=True,
+            callbacks=[TokenUsageCallbackHandler()]
         )
         
-        self.vector_store_manager = VectorStoreManager()
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True,
-            output_key="answer"
+        # Model yang lebih murah/cepat khusus untuk menulis ulang pertanyaan lanjutan
+        self.condense_llm = condense_llm or ChatOpenAI(
+            model=config.CONDENSE_MODEL,
+            temperature=0,
+            api_key=config.OPENAI_API_KEY,
+            callbacks=[TokenUsageCallbackHandler()]
         )
         
+        self.vector_store_manager = vector_store_manager or VectorStoreManager()
+        
+        # Konteks prompt (chunk + riwayat) dibatasi MAX_CONTEXT_LENGTH token
+        self.context_builder = ContextBuilder()
+        
+        # Memory per session, disimpan ke SESSION_BACKEND agar bertahan saat restart dan antar worker;
+        # giliran lama diringkas di background agar prompt tidak terus membesar
+        summarizer = ConversationSummarizer(self.condense_llm) if config.SESSION_SUMMARY_ENABLED else None
+        self.session_store = SessionMemoryStore(summarizer=summarizer, backend=create_session_backend())
+        
+        # Cache jawaban umum; dikosongkan setiap kali dokumen berubah
+        self.answer_cache = SemanticAnswerCache() if config.ANSWER_CACHE_ENABLED else None
+        if self.answer_cache:
+            self.vector_store_manager.add_change_listener(self.answer_cache.invalidate)
+        
+        # Pertanyaan berbentuk tabel dijawab langsung dari table store tanpa LLM
+        self.table_store = table_store
+        self.table_qa = TableQuestionAnswerer(table_store) if table_store and config.TABLE_QA_ENABLED else None
+        
+        # Pertanyaan perhitungan dihitung lokal dengan NumPy, bukan oleh LLM
+        self.actuarial_engine = ActuarialEngine() if config.CALCULATION_ENGINE_ENABLED else None
+        
         self.qa_chain = None
+        self.question_generator = None
         self.external_qa_chain = None
         self._setup_qa_chain()
         self._setup_external_qa_chain()
     
     def _setup_qa_chain(self):
-        """Setup the conversational retrieval chain"""
+        """Setup the document QA chain (retrieval dilakukan sekali di ask_project)"""
         try:
             # Custom prompt for actuarial chatbot
             custom_prompt = PromptTemplate(
@@ -42,15 +89,17 @@ class ActuarialChatService:
                 template=self._get_custom_prompt_template()
             )
             
-            # Create retrieval chain
-            self.qa_chain = ConversationalRetrievalChain.from_llm(
-                llm=self.llm,
-                retriever=self.vector_store_manager.vectorstore.as_retriever(
-                    search_kwargs={"k": config.TOP_K_RESULTS}
-                ),
-                memory=self.memory,
-                return_source_documents=True,
-                combine_docs_chain_kwargs={"prompt": custom_prompt}
+            # Chain "stuff" menerima dokumen hasil retrieval secara langsung,
+            # sehingga tidak ada retriever kedua yang meng-embed ulang pertanyaan
+            self.qa_chain = StuffDocumentsChain(
+                llm_chain=LLMChain(llm=self.llm, prompt=custom_prompt),
+                document_variable_name="context"
+            )
+            
+            # Chain untuk mengubah pertanyaan lanjutan menjadi pertanyaan mandiri
+            self.question_generator = LLMChain(
+                llm=self.condense_llm,
+                prompt=CONDENSE_QUESTION_PROMPT
             )
             
             logger.info("QA Chain setup successfully")
@@ -69,10 +118,11 @@ class ActuarialChatService:
             )
             
             # Buat LLMChain sederhana untuk menangani pertanyaan eksternal
+            # verbose=False: prompt lengkap tidak dicetak ke stdout di thread request
             self.external_qa_chain = LLMChain(
                 llm=self.llm,
                 prompt=external_prompt,
-                verbose=True
+                verbose=False
             )
             
             logger.info("External QA Chain setup successfully")
@@ -138,35 +188,28 @@ class ActuarialChatService:
 
             JAWABAN:"""
     
-    def _handle_external_question(self, question: str, session_id: str) -> Dict[str, Any]:
+    def _handle_external_question(self, question: str, session_id: str, memory: BaseChatMemory) -> Dict[str, Any]:
         """Fungsi khusus untuk menangani pertanyaan aktuaria tanpa dokumen dengan memory/history"""
         try:
-            logger.info(f"Handling external actuarial question for session {session_id}")
+            logger.info("Handling external actuarial question for session %s", session_id)
             
             # Format chat history untuk prompt
-            chat_history_formatted = self._format_chat_history()
+            chat_history_formatted = self._format_chat_history(memory)
             
             # Gunakan external_qa_chain
-            result = self.external_qa_chain.run(
-                question=question,
-                chat_history=chat_history_formatted
-            )
+            with timed('llm_answer', chain='external'):
+                result = self.external_qa_chain.run(
+                    question=question,
+                    chat_history=chat_history_formatted
+                )
             
             # Simpan ke memory untuk konsistensi
-            self.memory.save_context(
+            memory.save_context(
                 {"input": question},
                 {"output": result}
             )
             
-            return {
-                'answer': result,
-                'sources': [],
-                'confidence': 0.7,
-                'session_id': session_id,
-                'relevant_chunks': 0,
-                'mode': 'actuarial_chat',
-                'note': 'Jawaban berdasarkan pengetahuan aktuaria umum dengan mempertimbangkan konteks percakapan.'
-            }
+            return self._build_external_response(result, session_id)
             
         except Exception as e:
             logger.error(f"Error handling external question: {str(e)}")
@@ -180,104 +223,91 @@ class ActuarialChatService:
                 'mode': 'error'
             }
 
-    def _format_chat_history(self) -> str:
+    def _build_external_response(self, answer: str, session_id: str) -> Dict[str, Any]:
+        """Response untuk jawaban berbasis pengetahuan aktuaria umum"""
+        return {
+            'answer': answer,
+            'sources': [],
+            'confidence': 0.7,
+            'session_id': session_id,
+            'relevant_chunks': 0,
+            'mode': 'actuarial_chat',
+            'note': 'Jawaban berdasarkan pengetahuan aktuaria umum dengan mempertimbangkan konteks percakapan.'
+        }
+
+    def _format_chat_history(self, memory: BaseChatMemory) -> str:
         """Format chat history untuk prompt"""
         try:
-            messages = self.memory.chat_memory.messages
-            if not messages:
-                return "Tidak ada riwayat percakapan sebelumnya."
-            
-            formatted_history = []
-            for i in range(len(messages)):
-                if messages[i].type == "human":
-                    formatted_history.append(f"Pengguna: {messages[i].content}")
-                elif messages[i].type == "ai":
-                    formatted_history.append(f"Asisten: {messages[i].content}")
-            
-            return "\n".join(formatted_history[-6:])  # Ambil 6 pesan terakhir
+            # Ringkasan giliran lama + pesan terbaru yang muat dalam HISTORY_TOKEN_BUDGET
+            formatted_history, _ = self._history_for_prompt(memory)
+            return formatted_history or "Tidak ada riwayat percakapan sebelumnya."
             
         except Exception as e:
             logger.error(f"Error formatting chat history: {str(e)}")
             return "Tidak dapat memformat riwayat percakapan."
 
-    def _ensure_session_memory(self, session_id: str):
-        """Pastikan memory untuk session sudah diinisialisasi"""
-        try:
-            # Jika menggunakan session-based memory management
-            if not hasattr(self, 'session_memories'):
-                self.session_memories = {}
-            
-            if session_id not in self.session_memories:
-                # Buat memory baru untuk session ini jika belum ada
-                from langchain.memory import ConversationBufferWindowMemory
-                self.session_memories[session_id] = ConversationBufferWindowMemory(
-                    k=getattr(config, 'MEMORY_WINDOW_SIZE', 10),
-                    return_messages=True
-                )
-                logger.info(f"Created new memory for session {session_id}")
-            
-            # Set memory aktif ke session ini
-            self.memory = self.session_memories[session_id]
-            
-        except Exception as e:
-            logger.error(f"Error ensuring session memory: {str(e)}")
-            # Fallback ke memory default jika gagal
-            pass
-    
+    def _history_for_prompt(self, memory: BaseChatMemory) -> tuple:
+        """Ringkasan giliran lama + pesan yang belum diringkas, dalam HISTORY_TOKEN_BUDGET"""
+        return self.context_builder.format_history(
+            getattr(memory, 'recent_messages', memory.chat_memory.messages),
+            summary=getattr(memory, 'summary', '')
+        )
+
     def _is_conversational_question(self, question: str) -> bool:
         """Deteksi apakah pertanyaan bersifat conversational/follow-up"""
-        conversational_indicators = [
-            'itu', 'tersebut', 'yang tadi', 'sebelumnya', 'lalu bagaimana',
-            'kemudian', 'selanjutnya', 'jadi', 'berarti', 'maksudnya',
-            'contohnya', 'misalnya', 'bagaimana dengan', 'lalu', 'terus'
-        ]
-        
-        question_lower = question.lower()
-        return any(indicator in question_lower for indicator in conversational_indicators)
+        return CONVERSATIONAL_PATTERN.search(question.lower()) is not None
+
+    def _condense_question(self, question: str, session_id: str, memory: BaseChatMemory) -> str:
+        """Ubah pertanyaan lanjutan menjadi pertanyaan mandiri untuk retrieval
 
-    def ask_project(self, question: str, session_id: str) -> Dict[str, Any]:
-        """Process a question and return answer with sources"""
+        Pertanyaan pertama dan pertanyaan mandiri dipakai apa adanya (tanpa panggilan LLM);
+        hasil penulisan ulang di-cache per session untuk pasangan pertanyaan + riwayat yang sama.
+        """
+        if not memory.chat_memory.messages or not self._is_conversational_question(question):
+            return question
+        
+        chat_history = self._format_chat_history(memory)
+        cache_key = (question.strip(), chat_history)
+        rewrite = self.session_store.get_rewrite(session_id, cache_key)
+        record_cache('condense', rewrite is not None)
+        if rewrite is not None:
+            return rewrite
+        
         try:
-            # Ensure session memory is set up
-            self._ensure_session_memory(session_id)
-            
-            # Get relevant documents first for context
-            relevant_docs = self.vector_store_manager.similarity_search_with_score(
-                question, 
-                session_id,
-                k=config.TOP_K_RESULTS
-            )
-            
-            if not relevant_docs:
-                logger.info(f"No relevant documents found for session {session_id}")
-                return self._handle_external_question(question, session_id)
-            else:
-                # Process question through QA chain
-                result = self.qa_chain({
-                    "question": question,
-                    "chat_history": self.memory.chat_memory.messages
-                })
-                
-                # Extract source information
-                sources = self._extract_source_info(result.get('source_documents', []), session_id)
-                
-                # Calculate confidence based on similarity scores
-                confidence = self._calculate_confidence(relevant_docs)
-                
-                response = {
-                    'answer': result['answer'],
-                    'sources': sources,
-                    'confidence': confidence,
-                    'session_id': session_id,
-                    'relevant_chunks': len(relevant_docs),
-                    'mode': 'document_based'
-                }
-                logger.info(f"Question processed successfully. Confidence: {confidence}")
-                return response
+            with timed('condense'):
+                rewrite = self.question_generator.run(
+                    question=question,
+                    chat_history=chat_history
+                ).strip() or question
+        except Exception as e:
+            logger.error(f"Error condensing question: {str(e)}")
+            return question
+        
+        self.session_store.save_rewrite(session_id, cache_key, rewrite)
+        logger.debug("Condensed follow-up question for session %s: %s", session_id, rewrite)
+        return rewrite
+
+    @timed('ask_project')
+    def ask_project(self, question: str, session_id: str, retrieved: Optional[List[tuple]] = None,
+                    history_session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Process a question and return answer with sources
+
+        retrieved: hasil hybrid search untuk pertanyaan ini yang sudah dihitung (batch)
+        history_session_id: riwayat percakapan sementara (tidak disimpan) sebagai ganti riwayat session_id;
+            dokumen tetap dicari di session_id
+        """
+        try:
+            # Lock per session: request paralel dari session lain tidak saling menulis history
+            with self.session_store.session(history_session_id or session_id,
+                                            persist=history_session_id is None) as memory:
+                response = self._answer_project(question, session_id, memory, retrieved)
+            ANSWERS.inc(mode=response.get('mode'))
+            return response
             
         except Exception as e:
             logger.error(f"Error processing question: {str(e)}")
             logger.error(traceback.format_exc())
+            ANSWERS.inc(mode='error')
             return {
                 'answer': 'Maaf, terjadi kesalahan saat memproses pertanyaan Anda.',
                 'sources': [],
@@ -287,20 +317,210 @@ class ActuarialChatService:
                 'mode': 'error'
             }
     
-    def ask_question(self, question: str, session_id: str) -> Dict[str, Any]:
-        """Process a question and return answer with sources (untuk diskusi aktuaria umum)"""
+    @timed('retrieval')
+    def _retrieve_project_documents(self, question: str, session_id: str, memory: BaseChatMemory,
+                                    retrieved: Optional[List[tuple]] = None) -> List[tuple]:
+        """Satu pencarian hybrid (BM25 + vector) per session"""
+        search_query = self._condense_question(question, session_id, memory)
+        if retrieved is not None and search_query == question:
+            # Hasil pencarian batch hanya berlaku jika pertanyaan tidak ditulis ulang
+            return retrieved
+        return self.vector_store_manager.hybrid_search(
+            search_query,
+            session_id,
+            k=config.TOP_K_RESULTS
+        )
+    
+    @timed('local_answer')
+    def _answer_locally(self, question: str, session_id: str, memory: BaseChatMemory,
+                        use_tables: bool) -> Optional[Dict[str, Any]]:
+        """Jawaban tanpa LLM: mesin perhitungan, lalu table store; disimpan ke memory"""
+        response = self._answer_from_engine(question, session_id, use_tables)
+        if response is None and use_tables:
+            response = self._answer_from_tables(question, session_id)
+        if response is None:
+            return None
+        
+        memory.save_context({"input": question}, {"output": response['answer']})
+        return response
+    
+    def _answer_from_engine(self, question: str, session_id: str, use_documents: bool = False) -> Optional[Dict[str, Any]]:
+        """Jawaban pertanyaan perhitungan dari ActuarialEngine, atau None
+        
+        use_documents: perhitungan bermortalitas diserahkan ke dokumen session jika memuat tabel qx sendiri,
+        bukan dihitung dengan asumsi Makeham bawaan engine
+        """
+        if self.actuarial_engine is None:
+            return None
+        
+        try:
+            parameters = self.actuarial_engine.parse_question(question)
+            if parameters is None:
+                return None
+            if (use_documents and parameters['type'] in ActuarialEngine.MORTALITY_TYPES
+                    and self.table_store is not None and self.table_store.has_mortality_table(session_id)):
+                logger.info("Session %s has its own mortality table, skipping calculation engine", session_id)
+                return None
+            result = self.actuarial_engine.answer(question, parameters)
+        except Exception as e:
+            logger.error(f"Error computing calculation answer: {str(e)}")
+            return None
+        if result is None:
+            return None
+        
+        return {
+            'answer': result['answer'],
+            'sources': [],
+            'confidence': 1.0,
+            'session_id': session_id,
+            'relevant_chunks': 0,
+            'mode': 'calculation',
+            'calculation': {
+                'type': result['type'],
+                'parameters': result['parameters'],
+                'value': result['value']
+            }
+        }
+    
+    def _answer_from_tables(self, question: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """Jawaban langsung dari table store (lookup / agregasi), atau None"""
+        if self.table_qa is None:
+            return None
+        
         try:
-            logger.info(f"Processing general actuarial question for session {session_id}")
-            
-            # Ensure session memory is set up
-            self._ensure_session_memory(session_id)
+            result = self.table_qa.answer(question, session_id)
+        except Exception as e:
+            logger.error(f"Error answering from tables: {str(e)}")
+            return None
+        if result is None:
+            return None
+        
+        table = result['table']
+        return {
+            'answer': result['answer'],
+            'sources': [{
+                'filename': table['filename'],
+                'doc_type': 'table',
+                'chunk_id': 0,
+                'headers': {'section': table['section']},
+                'preview': ' | '.join(table['headers']),
+                'session_id': session_id
+            }],
+            'confidence': 1.0,
+            'session_id': session_id,
+            'relevant_chunks': 0,
+            'mode': 'table_lookup',
+            'table_result': {
+                'operation': result['operation'],
+                'column': result['column'],
+                'value': result['value'],
+                'rows': result['rows']
+            }
+        }
+    
+    def _build_document_context(self, relevant_docs: List[tuple], memory: BaseChatMemory) -> tuple:
+        """Chunk dan riwayat untuk prompt dokumen, total paling banyak MAX_CONTEXT_LENGTH token"""
+        chat_history, history_tokens = self._history_for_prompt(memory)
+        packed_docs = self.context_builder.pack_documents(
+            relevant_docs,
+            self.context_builder.max_tokens - history_tokens,
+            separator=self.qa_chain.document_separator
+        )
+        
+        context_tokens = history_tokens + sum(
+            self.context_builder.token_counter.count(doc.page_content) for doc, _ in packed_docs
+        )
+        CONTEXT_TOKENS.observe(context_tokens)
+        logger.debug("Packed %d/%d chunks, %d context tokens", len(packed_docs), len(relevant_docs), context_tokens)
+        return packed_docs, chat_history or "Tidak ada riwayat percakapan sebelumnya."
+    
+    def _build_document_response(self, answer: str, relevant_docs: List[tuple], session_id: str) -> Dict[str, Any]:
+        """Response untuk jawaban berbasis dokumen session"""
+        source_documents = [doc for doc, _ in relevant_docs]
+        
+        # Extract source information
+        sources = self._extract_source_info(source_documents, session_id)
+        
+        # Calculate confidence based on similarity scores
+        confidence = self._calculate_confidence(relevant_docs)
+        
+        return {
+            'answer': answer,
+            'sources': sources,
+            'confidence': confidence,
+            'session_id': session_id,
+            'relevant_chunks': len(relevant_docs),
+            'mode': 'document_based'
+        }
+    
+    def _answer_project(self, question: str, session_id: str, memory: BaseChatMemory,
+                        retrieved: Optional[List[tuple]] = None) -> Dict[str, Any]:
+        """Retrieve session documents once and answer from them"""
+        local_response = self._answer_locally(question, session_id, memory, use_tables=True)
+        if local_response:
+            return local_response
+        
+        relevant_docs = self._retrieve_project_documents(question, session_id, memory, retrieved)
+        
+        if not relevant_docs:
+            logger.info("No relevant documents found for session %s", session_id)
+            return self._handle_external_question(question, session_id, memory)
+        
+        # Dokumen hasil retrieval langsung dipakai untuk menjawab, dalam anggaran token
+        relevant_docs, chat_history = self._build_document_context(relevant_docs, memory)
+        with timed('llm_answer', chain='documents'):
+            answer = self.qa_chain.run(
+                input_documents=[doc for doc, _ in relevant_docs],
+                question=question,
+                chat_history=chat_history
+            )
+        
+        memory.save_context(
+            {"input": question},
+            {"output": answer}
+        )
+        
+        response = self._build_document_response(answer, relevant_docs, session_id)
+        logger.info("Question processed successfully. Confidence: %s", response['confidence'])
+        return response
+    
+    @timed('ask_question')
+    def ask_question(self, question: str, session_id: str, query_embedding: Optional[List[float]] = None,
+                     history_session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Process a question and return answer with sources (untuk diskusi aktuaria umum)
+
+        history_session_id: lihat ask_project
+        """
+        try:
+            logger.info("Processing general actuarial question for session %s", session_id)
             
-            # Langsung gunakan external handling untuk diskusi aktuaria
-            return self._handle_external_question(question, session_id)
+            with self.session_store.session(history_session_id or session_id,
+                                            persist=history_session_id is None) as memory:
+                local_response = self._answer_locally(question, session_id, memory, use_tables=False)
+                if local_response:
+                    ANSWERS.inc(mode=local_response['mode'])
+                    return local_response
+                
+                query_embedding = self._get_answer_cache_embedding(question, memory, query_embedding)
+                if query_embedding is not None:
+                    cached = self.answer_cache.lookup(query_embedding)
+                    if cached:
+                        ANSWERS.inc(mode='cached')
+                        return self._serve_cached_answer(question, session_id, memory, cached)
+                
+                # Langsung gunakan external handling untuk diskusi aktuaria
+                result = self._handle_external_question(question, session_id, memory)
+                
+                if query_embedding is not None and result.get('mode') != 'error':
+                    self.answer_cache.store(query_embedding, question, result)
+                result['cached'] = False
+                ANSWERS.inc(mode=result.get('mode'))
+                return result
             
         except Exception as e:
             logger.error(f"Error processing question: {str(e)}")
             logger.error(traceback.format_exc())
+            ANSWERS.inc(mode='error')
             return {
                 'answer': 'Maaf, terjadi kesalahan saat memproses pertanyaan Anda.',
                 'sources': [],
@@ -310,6 +530,157 @@ class ActuarialChatService:
                 'mode': 'error'
             }
         
+    def stream_project(self, question: str, session_id: str) -> Iterator[Dict[str, Any]]:
+        """Streaming variant of ask_project: yields token events, then a final 'done' event"""
+        start_time = time.perf_counter()
+        try:
+            with self.session_store.session(session_id) as memory:
+                local_response = self._answer_locally(question, session_id, memory, use_tables=True)
+                if local_response:
+                    yield {'event': 'token', 'data': {'token': local_response['answer']}}
+                    yield {'event': 'done', 'data': local_response}
+                    return
+                
+                relevant_docs = self._retrieve_project_documents(question, session_id, memory)
+                
+                if not relevant_docs:
+                    logger.info("No relevant documents found for session %s", session_id)
+                    yield from self._stream_external_question(question, session_id, memory, start_time)
+                    return
+                
+                relevant_docs, chat_history = self._build_document_context(relevant_docs, memory)
+                prompt = self.qa_chain.llm_chain.prompt.format(
+                    context=self._combine_documents([doc for doc, _ in relevant_docs]),
+                    question=question,
+                    chat_history=chat_history
+                )
+                
+                answer, first_token_latency = yield from self._stream_llm(prompt, start_time)
+                memory.save_context(
+                    {"input": question},
+                    {"output": answer}
+                )
+                
+                response = self._build_document_response(answer, relevant_docs, session_id)
+                response['time_to_first_token'] = first_token_latency
+                yield {'event': 'done', 'data': response}
+            
+        except Exception as e:
+            logger.error(f"Error streaming question: {str(e)}")
+            logger.error(traceback.format_exc())
+            yield {'event': 'error', 'data': self._build_error_response(e, session_id)}
+    
+    def stream_question(self, question: str, session_id: str) -> Iterator[Dict[str, Any]]:
+        """Streaming variant of ask_question: yields token events, then a final 'done' event"""
+        start_time = time.perf_counter()
+        try:
+            with self.session_store.session(session_id) as memory:
+                local_response = self._answer_locally(question, session_id, memory, use_tables=False)
+                if local_response:
+                    yield {'event': 'token', 'data': {'token': local_response['answer']}}
+                    yield {'event': 'done', 'data': local_response}
+                    return
+                
+                query_embedding = self._get_answer_cache_embedding(question, memory)
+                if query_embedding is not None:
+                    cached = self.answer_cache.lookup(query_embedding)
+                    if cached:
+                        response = self._serve_cached_answer(question, session_id, memory, cached)
+                        yield {'event': 'token', 'data': {'token': response['answer']}}
+                        yield {'event': 'done', 'data': response}
+                        return
+                
+                for event in self._stream_external_question(question, session_id, memory, start_time):
+                    if event['event'] == 'done':
+                        if query_embedding is not None:
+                            self.answer_cache.store(query_embedding, question, event['data'])
+                        event['data']['cached'] = False
+                    yield event
+            
+        except Exception as e:
+            logger.error(f"Error streaming question: {str(e)}")
+            logger.error(traceback.format_exc())
+            yield {'event': 'error', 'data': self._build_error_response(e, session_id)}
+    
+    def _get_answer_cache_embedding(self, question: str, memory: BaseChatMemory,
+                                    query_embedding: Optional[List[float]] = None) -> Optional[List[float]]:
+        """Embedding untuk answer cache, atau None jika cache tidak boleh dipakai
+
+        Cache hanya dipakai jika session belum punya riwayat atau pertanyaan
+        bukan pertanyaan lanjutan yang bergantung pada riwayat.
+        """
+        if self.answer_cache is None:
+            return None
+        if memory.chat_memory.messages and self._is_conversational_question(question):
+            return None
+        if query_embedding is not None:
+            return query_embedding
+        return self.vector_store_manager.embed_query(question)
+    
+    def _serve_cached_answer(self, question: str, session_id: str, memory: BaseChatMemory,
+                             cached: Dict[str, Any]) -> Dict[str, Any]:
+        """Kembalikan jawaban dari cache dan tetap catat di memory session"""
+        memory.save_context(
+            {"input": question},
+            {"output": cached['answer']}
+        )
+        cached.pop('time_to_first_token', None)
+        cached['session_id'] = session_id
+        cached['cached'] = True
+        return cached
+    
+    def _stream_external_question(self, question: str, session_id: str, memory: BaseChatMemory,
+                                  start_time: float) -> Iterator[Dict[str, Any]]:
+        """Stream jawaban aktuaria umum tanpa dokumen"""
+        prompt = self.external_qa_chain.prompt.format(
+            question=question,
+            chat_history=self._format_chat_history(memory)
+        )
+        
+        answer, first_token_latency = yield from self._stream_llm(prompt, start_time)
+        memory.save_context(
+            {"input": question},
+            {"output": answer}
+        )
+        
+        response = self._build_external_response(answer, session_id)
+        response['time_to_first_token'] = first_token_latency
+        yield {'event': 'done', 'data': response}
+    
+    def _stream_llm(self, prompt: str, start_time: float):
+        """Yield token events from the LLM; returns (full answer, time to first token)"""
+        tokens = []
+        first_token_latency = None
+        
+        with timed('llm_stream'):
+            for chunk in self.llm.stream(prompt):
+                if not chunk.content:
+                    continue
+                if first_token_latency is None:
+                    first_token_latency = round(time.perf_counter() - start_time, 3)
+                    FIRST_TOKEN_LATENCY.observe(first_token_latency)
+                    logger.info("Time to first token: %ss", first_token_latency)
+                tokens.append(chunk.content)
+                yield {'event': 'token', 'data': {'token': chunk.content}}
+        
+        return "".join(tokens), first_token_latency
+    
+    def _combine_documents(self, documents: List[Document]) -> str:
+        """Gabungkan dokumen persis seperti StuffDocumentsChain"""
+        return self.qa_chain.document_separator.join(
+            format_document(doc, self.qa_chain.document_prompt) for doc in documents
+        )
+    
+    def _build_error_response(self, error: Exception, session_id: str) -> Dict[str, Any]:
+        return {
+            'answer': 'Maaf, terjadi kesalahan saat memproses pertanyaan Anda.',
+            'sources': [],
+            'confidence': 0.0,
+            'session_id': session_id,
+            'error': str(error),
+            'mode': 'error'
+        }
+        
     def _extract_source_info(self, source_documents: List[Document], session_id: str) -> List[Dict[str, Any]]:
         """Extract source information from documents with session_id filtering"""
         sources = []
@@ -324,7 +695,7 @@ class ActuarialChatService:
         else:
             filtered_docs = source_documents
         
-        logger.info(f"Source documents: {len(source_documents)} -> After session filter: {len(filtered_docs)}")
+        logger.debug("Source documents: %d -> After session filter: %d", len(source_documents), len(filtered_docs))
         
         for doc in filtered_docs:
             metadata = doc.metadata
@@ -358,12 +729,11 @@ class ActuarialChatService:
     def clear_memory(self, session_id: str = None) -> bool:
         """Clear conversation memory"""
         try:
-            if session_id and hasattr(self, 'session_memories') and session_id in self.session_memories:
-                self.session_memories[session_id].clear()
+            session_id = session_id or 'default'
+            if self.session_store.clear(session_id):
                 logger.info(f"Memory cleared for session: {session_id}")
             else:
-                self.memory.clear()
-                logger.info("Default memory cleared")
+                logger.info(f"No memory to clear for session: {session_id}")
             return True
         except Exception as e:
             logger.error(f"Error clearing memory: {str(e)}")
@@ -373,10 +743,12 @@ class ActuarialChatService:
         """Get conversation history"""
         try:
             # Ambil memory yang sesuai dengan session
-            if session_id and hasattr(self, 'session_memories') and session_id in self.session_memories:
-                messages = self.session_memories[session_id].chat_memory.messages
-            else:
-                messages = self.memory.chat_memory.messages
+            state = self.session_store.get(session_id or 'default', create=False)
+            if state is None:
+                return []
+            
+            with state.lock:
+                messages = list(state.memory.chat_memory.messages)
                 
             history = []
             
@@ -404,13 +776,17 @@ class ActuarialChatService:
                 'collection_name': collection_info.get('name', ''),
                 'model_info': {
                     'llm': config.OPENAI_MODEL,
+                    'condense': config.CONDENSE_MODEL,
                     'embedding': config.EMBEDDING_MODEL
                 },
                 'configuration': {
                     'chunk_size': config.CHUNK_SIZE,
                     'top_k_results': config.TOP_K_RESULTS,
                     'similarity_threshold': config.SIMILARITY_THRESHOLD
-                }
+                },
+                'embedding_cache': self.vector_store_manager.get_cache_stats(),
+                'sessions': self.session_store.get_stats(),
+                'answer_cache': self.answer_cache.get_stats() if self.answer_cache else {'enabled': False}
             }
             
         except Exception as e:
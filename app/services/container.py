@@ -0,0 +1,135 @@
+from typing import Any, Callable
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+import logging
+import os
+import threading
+
+import httpx
+
+from app.config import config
+from app.models.embeddings import VectorStoreManager
+from app.models.table_store import TableStore
+from app.services.batch_service import BatchQuestionRunner
+from app.services.chat_service import ActuarialChatService
+from app.services.document_processor import DocumentProcessor
+from app.services.ingestion import IngestionEngine
+from app.services.job_queue import IngestionJobQueue
+from app.utils.metrics import TokenUsageCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+class ServiceContainer:
+    """Pemilik tunggal client dan service per proses; setiap objek dibuat saat pertama dipakai"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._instances = {}
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = factory()
+                logger.info(f"Initialized shared {name}")
+            return self._instances[name]
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """Pooled HTTP client shared by every OpenAI client in the process"""
+        return self._get('http_client', lambda: httpx.Client(
+            limits=httpx.Limits(
+                max_connections=config.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=config.OPENAI_MAX_CONNECTIONS
+            ),
+            timeout=config.OPENAI_TIMEOUT
+        ))
+
+    @property
+    def chroma_client(self):
+        return self._get('chroma_client', VectorStoreManager._create_chroma_client)
+
+    @property
+    def embeddings(self) -> OpenAIEmbeddings:
+        return self._get('embeddings', lambda: OpenAIEmbeddings(
+            model=config.EMBEDDING_MODEL,
+            openai_api_key=config.OPENAI_API_KEY,
+            http_client=self.http_client
+        ))
+
+    @property
+    def llm(self) -> ChatOpenAI:
+        return self._get('llm', lambda: ChatOpenAI(
+            model=config.OPENAI_MODEL,
+            temperature=0.1,
+            api_key=config.OPENAI_API_KEY,
+            http_client=self.http_client,
+            stream_usage=True,
+            callbacks=[TokenUsageCallbackHandler()]
+        ))
+
+    @property
+    def condense_llm(self) -> ChatOpenAI:
+        return self._get('condense_llm', lambda: ChatOpenAI(
+            model=config.CONDENSE_MODEL,
+            temperature=0,
+            api_key=config.OPENAI_API_KEY,
+            http_client=self.http_client,
+            callbacks=[TokenUsageCallbackHandler()]
+        ))
+
+    @property
+    def vector_store_manager(self) -> VectorStoreManager:
+        return self._get('vector_store_manager', lambda: VectorStoreManager(
+            embeddings=self.embeddings,
+            chroma_client=self.chroma_client
+        ))
+
+    @property
+    def table_store(self) -> TableStore:
+        return self._get('table_store', lambda: TableStore(
+            os.path.join(config.CHROMA_DB_PATH, config.TABLE_STORE_DIRNAME)
+        ))
+
+    @property
+    def document_processor(self) -> DocumentProcessor:
+        return self._get('document_processor', DocumentProcessor)
+
+    @property
+    def chat_service(self) -> ActuarialChatService:
+        return self._get('chat_service', lambda: ActuarialChatService(
+            vector_store_manager=self.vector_store_manager,
+            llm=self.llm,
+            condense_llm=self.condense_llm,
+            table_store=self.table_store
+        ))
+
+    @property
+    def batch_runner(self) -> BatchQuestionRunner:
+        return self._get('batch_runner', lambda: BatchQuestionRunner(self.chat_service))
+
+    @property
+    def ingestion_engine(self) -> IngestionEngine:
+        return self._get('ingestion_engine', lambda: IngestionEngine(self.vector_store_manager))
+
+    @property
+    def ingestion_jobs(self) -> IngestionJobQueue:
+        return self._get('ingestion_jobs', lambda: IngestionJobQueue(
+            self.document_processor,
+            self.ingestion_engine,
+            table_store=self.table_store
+        ))
+
+_container = None
+_container_lock = threading.Lock()
+
+def get_container() -> ServiceContainer:
+    """Get the process-wide service container"""
+    global _container
+    if _container is None:
+        with _container_lock:
+            if _container is None:
+                _container = ServiceContainer()
+    return _container
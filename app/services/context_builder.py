@@ -0,0 +1,180 @@
+from typing import List, Optional, Tuple
+from langchain.schema import Document
+from langchain_core.messages import BaseMessage
+import logging
+import math
+import re
+import threading
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+# Panjang minimum (karakter) agar dua chunk dianggap tumpang-tindih, bukan kebetulan sama
+MIN_OVERLAP_CHARS = 16
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+class TokenCounter:
+    """Hitung token dengan tiktoken; fallback len/4 jika encoding tidak tersedia (mis. offline)"""
+
+    def __init__(self, model: str = None):
+        self.model = model or config.OPENAI_MODEL
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _get_encoding(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        import tiktoken
+                        try:
+                            self._encoding = tiktoken.encoding_for_model(self.model)
+                        except KeyError:
+                            self._encoding = tiktoken.get_encoding('o200k_base')
+                    except Exception as e:
+                        logger.warning(f"tiktoken unavailable, estimating tokens as len/4: {str(e)}")
+                    self._loaded = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        encoding = self._get_encoding()
+        if encoding is None:
+            return math.ceil(len(text) / 4)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Potong teks menjadi paling banyak max_tokens token"""
+        if max_tokens <= 0:
+            return ''
+        encoding = self._get_encoding()
+        if encoding is None:
+            return text[:max_tokens * 4]
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+
+class ContextBuilder:
+    """Susun konteks prompt (chunk dokumen + riwayat) dalam anggaran token tetap
+
+    Riwayat terbaru diisi lebih dulu sampai HISTORY_TOKEN_BUDGET; sisa MAX_CONTEXT_LENGTH
+    dipakai untuk chunk sesuai urutan peringkat retrieval, setelah duplikat dibuang dan
+    bagian yang tumpang-tindih karena CHUNK_OVERLAP dipangkas.
+    """
+
+    def __init__(self, token_counter: Optional[TokenCounter] = None, max_tokens: int = None,
+                 history_tokens: int = None, history_messages: int = None):
+        self.token_counter = token_counter or TokenCounter()
+        self.max_tokens = max_tokens or config.MAX_CONTEXT_LENGTH
+        self.history_tokens = config.HISTORY_TOKEN_BUDGET if history_tokens is None else history_tokens
+        self.history_messages = history_messages or config.HISTORY_MAX_MESSAGES
+
+    def format_history(self, messages: List[BaseMessage], max_tokens: int = None,
+                       summary: str = "") -> Tuple[str, int]:
+        """Ringkasan + pesan terbaru yang muat dalam anggaran, urut kronologis; mengembalikan (teks, jumlah token)"""
+        max_tokens = self.history_tokens if max_tokens is None else max_tokens
+        lines, used = [], 0
+
+        summary_line = ""
+        if summary:
+            # Ringkasan dibatasi setengah anggaran agar giliran terbaru tetap muat
+            summary_line = self.token_counter.truncate(
+                f"Ringkasan percakapan sebelumnya: {summary}", max_tokens // 2
+            )
+            used = self.token_counter.count(summary_line) + 1
+
+        for message in reversed(messages[-self.history_messages:]):
+            if message.type == "human":
+                line = f"Pengguna: {message.content}"
+            elif message.type == "ai":
+                line = f"Asisten: {message.content}"
+            else:
+                continue
+
+            tokens = self.token_counter.count(line) + 1
+            if used + tokens > max_tokens:
+                # Pesan terbaru yang panjang dipotong, bukan dibuang seluruhnya
+                if max_tokens - used >= config.CONTEXT_MIN_CHUNK_TOKENS:
+                    line = self.token_counter.truncate(line, max_tokens - used - 1)
+                    lines.append(line)
+                    used = max_tokens
+                break
+            lines.append(line)
+            used += tokens
+
+        if summary_line:
+            lines.append(summary_line)
+        lines.reverse()
+        return "\n".join(lines), used
+
+    def pack_documents(self, relevant_docs: List[tuple], max_tokens: int,
+                       separator: str = "\n\n") -> List[tuple]:
+        """Chunk (doc, score) yang muat dalam max_tokens, tanpa duplikat dan tumpang-tindih"""
+        packed, selected = [], []
+        remaining = max_tokens
+        separator_tokens = self.token_counter.count(separator)
+
+        for doc, score in relevant_docs:
+            content = self._trim_overlap(doc, selected)
+            if content is None:
+                continue
+
+            cost = self.token_counter.count(content) + (separator_tokens if packed else 0)
+            if cost > remaining:
+                # Chunk yang terlalu besar dipotong jika sisa anggaran masih berarti
+                if remaining < config.CONTEXT_MIN_CHUNK_TOKENS:
+                    continue
+                content = self.token_counter.truncate(content, remaining - (separator_tokens if packed else 0))
+                cost = remaining
+
+            trimmed = Document(page_content=content, metadata=dict(doc.metadata))
+            packed.append((trimmed, score))
+            selected.append((doc, content))
+            remaining -= cost
+            if remaining <= 0:
+                break
+
+        return packed
+
+    def _trim_overlap(self, doc: Document, selected: List[tuple]) -> Optional[str]:
+        """Isi chunk tanpa bagian yang sudah ada di chunk terpilih; None jika seluruhnya duplikat"""
+        content = doc.page_content
+        normalized = _normalize(content)
+        if not normalized:
+            return None
+
+        for other, other_content in selected:
+            if normalized in _normalize(other_content):
+                return None
+            if other.metadata.get('source') != doc.metadata.get('source'):
+                continue
+
+            # Awal chunk ini = akhir chunk lain (chunk berikutnya), atau sebaliknya
+            content = content[self._overlap_length(other_content, content):]
+            tail = self._overlap_length(content, other_content)
+            if tail:
+                content = content[:-tail]
+
+        return content.strip() or None
+
+    @staticmethod
+    def _overlap_length(left: str, right: str) -> int:
+        """Panjang akhiran left yang sama dengan awalan right (maksimal CHUNK_OVERLAP + toleransi)"""
+        window = min(len(left), len(right), config.CHUNK_OVERLAP * 2)
+        if window < MIN_OVERLAP_CHARS:
+            return 0
+
+        probe = right[:MIN_OVERLAP_CHARS]
+        start = left.find(probe, len(left) - window)
+        while start != -1:
+            length = len(left) - start
+            if right.startswith(left[start:]):
+                return length
+            start = left.find(probe, start + 1)
+        return 0
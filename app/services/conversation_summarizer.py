@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable
+from langchain_core.messages import BaseMessage
+from langchain.prompts import PromptTemplate
+import logging
+import threading
+
+from app.config import config
+from app.services.context_builder import TokenCounter
+from app.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = PromptTemplate(
+    input_variables=["summary", "new_lines", "max_words"],
+    template="""Perbarui ringkasan percakapan antara pengguna dan asisten aktuaria berikut.
+Pertahankan angka, parameter (usia, suku bunga, masa asuransi), istilah, dan nama dokumen yang disebut,
+karena pertanyaan lanjutan dapat merujuk ke sana. Tulis dalam bahasa Indonesia, maksimal {max_words} kata.
+
+RINGKASAN SAAT INI:
+{summary}
+
+PERCAKAPAN BARU:
+{new_lines}
+
+RINGKASAN BARU:"""
+)
+
+class ConversationSummarizer:
+    """Ringkas giliran percakapan lama di thread latar belakang, di luar jalur request
+
+    Pesan yang sudah diringkas tetap tersimpan untuk /history, tetapi prompt hanya memakai
+    ringkasan ditambah pesan yang belum diringkas. Peringkasan dipicu dengan histeresis: baru
+    berjalan jika pesan yang belum diringkas melebihi keep_messages + batch_messages, lalu hanya
+    pesan yang baru keluar dari jendela yang dilipat ke ringkasan.
+    """
+
+    def __init__(self, llm, keep_messages: int = None, max_tokens: int = None, batch_messages: int = None):
+        self.llm = llm
+        self.keep_messages = keep_messages or config.SUMMARY_KEEP_MESSAGES
+        self.batch_messages = config.SUMMARY_BATCH_MESSAGES if batch_messages is None else batch_messages
+        self.max_tokens = max_tokens or config.SUMMARY_MAX_TOKENS
+        self.token_counter = TokenCounter()
+
+        self._executor = ThreadPoolExecutor(max_workers=config.SUMMARY_WORKERS, thread_name_prefix='summarizer')
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            'summaries_created': 0,
+            'summaries_discarded': 0,
+            'failures': 0
+        }
+
+    def schedule(self, state, on_update: Optional[Callable] = None):
+        """Jadwalkan peringkasan jika ada pesan lama yang belum diringkas (tidak menunggu)
+
+        on_update(state) dipanggil setelah ringkasan baru tersimpan di memory.
+        """
+        memory = state.memory
+        if len(memory.chat_memory.messages) - memory.summarized_until <= self.keep_messages + self.batch_messages:
+            return
+
+        with self._lock:
+            if state.session_id in self._pending:
+                return
+            self._pending.add(state.session_id)
+
+        self._executor.submit(self._summarize, state, on_update)
+
+    def _summarize(self, state, on_update: Optional[Callable] = None):
+        success = False
+        try:
+            memory = state.memory
+            with state.lock:
+                messages = memory.chat_memory.messages
+                start = memory.summarized_until
+                end = len(messages) - self.keep_messages
+                if end <= start:
+                    return
+                batch = list(messages[start:end])
+                summary = memory.summary
+
+            # Panggilan LLM tanpa memegang lock session, request berikutnya tidak tertahan
+            with timed('summarize'):
+                new_summary = self._run(summary, batch)
+
+            with state.lock:
+                messages = memory.chat_memory.messages
+                # Session dikosongkan atau sudah diringkas thread lain selama LLM berjalan
+                if (memory.summarized_until != start or memory.summary != summary
+                        or len(messages) < end or messages[start] is not batch[0]):
+                    self._count('summaries_discarded')
+                    return
+                memory.summary = new_summary
+                memory.summarized_until = end
+
+            self._count('summaries_created')
+            success = True
+            logger.debug("Summarized %d messages for session %s", len(batch), state.session_id)
+
+        except Exception as e:
+            self._count('failures')
+            logger.error(f"Error summarizing conversation for session {state.session_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(state.session_id)
+
+        if success:
+            if on_update is not None:
+                on_update(state)
+            # Pesan baru masuk selama peringkasan: lanjutkan jika ambangnya terlampaui lagi
+            self.schedule(state, on_update)
+
+    def _run(self, summary: str, messages: List[BaseMessage]) -> str:
+        lines = []
+        for message in messages:
+            if message.type == "human":
+                lines.append(f"Pengguna: {message.content}")
+            elif message.type == "ai":
+                lines.append(f"Asisten: {message.content}")
+
+        prompt = SUMMARY_PROMPT.format(
+            summary=summary or "(belum ada)",
+            new_lines="\n".join(lines),
+            max_words=int(self.max_tokens * 0.6)
+        )
+        result = self.llm.invoke(prompt)
+        content = getattr(result, 'content', result).strip()
+        return self.token_counter.truncate(content, self.max_tokens)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending), keep_messages=self.keep_messages,
+                        batch_messages=self.batch_messages)
@@ -1,17 +1,39 @@
 import os
 import markdown
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from langchain.text_splitter import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
 from langchain.schema import Document
+import itertools
 import logging
+import multiprocessing
 import re
+import threading
 
 from app.config import config
+from app.services.markdown_chunker import MarkdownChunker
 
 logger = logging.getLogger(__name__)
 
+_worker_processor = None
+
+def _preprocess_file(task: tuple) -> Dict[str, Any]:
+    """Entry point process pool: satu DocumentProcessor per proses worker"""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DocumentProcessor(max_workers=1)
+    result = _worker_processor.preprocess_file(*task)
+    if 'documents' in result:
+        # Hasil dikirim balik lewat pickle, generator harus dijadikan list di sini
+        result['documents'] = list(result['documents'])
+    return result
+
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or config.PREPROCESS_WORKERS
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        
         self.markdown_splitter = MarkdownHeaderTextSplitter(
             headers_to_split_on=[
                 ("#", "Header 1"),
@@ -27,50 +49,99 @@ class DocumentProcessor:
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
+        
+        # Chunker satu lintasan (default); dua splitter di atas dipakai jika TEXT_SPLITTER=langchain
+        self.chunker = MarkdownChunker(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
     
-    def process_markdown_file(self, file_path: str, session_id: str) -> List[Document]:
-        """Process a single markdown file into documents"""
+    @staticmethod
+    def build_document_id(session_id: str, filename: str) -> str:
+        """Identitas dokumen: session + nama file asli, sama untuk setiap upload ulang"""
+        return f"{session_id or 'default'}:{filename}"
+    
+    def read_file(self, file_path: str) -> Optional[str]:
+        """Validasi dan baca file sekali; None jika file tidak bisa diproses"""
         try:
+            if not os.path.exists(file_path):
+                logger.error(f"File does not exist: {file_path}")
+                return None
+            
+            if not file_path.endswith('.md'):
+                logger.error(f"File is not a markdown file: {file_path}")
+                return None
+            
             with open(file_path, 'r', encoding='utf-8') as file:
                 content = file.read()
+            if len(content.strip()) == 0:
+                logger.error(f"File is empty: {file_path}")
+                return None
+            
+            return content
+            
+        except Exception as e:
+            logger.error(f"Error reading file {file_path}: {str(e)}")
+            return None
+    
+    def iter_chunks(self, content: str, file_path: str, session_id: str, filename: str) -> Iterator[Document]:
+        """Split isi markdown menjadi chunk satu per satu (generator)"""
+        metadata = {
+            'source': file_path,
+            'filename': filename,
+            'doc_type': self._extract_document_type(filename, content),
+            'session_id': session_id,  # BARU: Simpan session_id
+            'document_id': self.build_document_id(session_id, filename)
+        }
+        
+        if config.TEXT_SPLITTER == 'langchain':
+            yield from self._iter_langchain_chunks(content, metadata)
+            return
+        
+        # Satu lintasan: header + ukuran chunk sekaligus; isi chunk = slice teks asli
+        for headers, spans in self.chunker.split(content):
+            for j, (start, end) in enumerate(spans):
+                doc_metadata = dict(metadata, **headers)
+                doc_metadata['start_index'] = start
+                doc_metadata['end_index'] = end
+                if len(spans) > 1:
+                    doc_metadata['sub_chunk_id'] = j
+                yield Document(
+                    page_content=content[start:end],
+                    metadata=doc_metadata
+                )
+    
+    def _iter_langchain_chunks(self, content: str, base_metadata: Dict[str, Any]) -> Iterator[Document]:
+        """Split dua tahap lama: MarkdownHeaderTextSplitter lalu RecursiveCharacterTextSplitter"""
+        # Split by markdown headers first
+        for split in self.markdown_splitter.split_text(content):
+            metadata = base_metadata.copy()
             
-            # Extract metadata from filename and content
-            filename = os.path.basename(file_path)
-            doc_type = self._extract_document_type(filename, content)
+            # Add header context to metadata
+            if hasattr(split, 'metadata'):
+                metadata.update(split.metadata)
             
-            # Split by markdown headers first
-            header_splits = self.markdown_splitter.split_text(content)
+            # Split further if chunk is too large
+            if len(split.page_content) > config.CHUNK_SIZE:
+                for j, sub_chunk in enumerate(self.text_splitter.split_text(split.page_content)):
+                    doc_metadata = metadata.copy()
+                    doc_metadata['sub_chunk_id'] = j
+                    yield Document(
+                        page_content=sub_chunk,
+                        metadata=doc_metadata
+                    )
+            else:
+                yield Document(
+                    page_content=split.page_content,
+                    metadata=metadata
+                )
+    
+    def process_markdown_file(self, file_path: str, session_id: str, original_filename: str = None) -> List[Document]:
+        """Process a single markdown file into documents"""
+        try:
+            content = self.read_file(file_path)
+            if content is None:
+                return []
             
-            # Further split large chunks
-            documents = []
-            for i, split in enumerate(header_splits):
-                # Create metadata
-                metadata = {
-                    'source': file_path,
-                    'filename': filename,
-                    'doc_type': doc_type,
-                    'session_id': session_id  # BARU: Simpan session_id
-                }
-                
-                # Add header context to metadata
-                if hasattr(split, 'metadata'):
-                    metadata.update(split.metadata)
-                
-                # Split further if chunk is too large
-                if len(split.page_content) > config.CHUNK_SIZE:
-                    sub_chunks = self.text_splitter.split_text(split.page_content)
-                    for j, sub_chunk in enumerate(sub_chunks):
-                        doc_metadata = metadata.copy()
-                        doc_metadata['sub_chunk_id'] = j
-                        documents.append(Document(
-                            page_content=sub_chunk,
-                            metadata=doc_metadata
-                        ))
-                else:
-                    documents.append(Document(
-                        page_content=split.page_content,
-                        metadata=metadata
-                    ))
+            filename = original_filename or os.path.basename(file_path)
+            documents = list(self.iter_chunks(content, file_path, session_id, filename))
             
             logger.info(f"Processed {filename} into {len(documents)} chunks")
             return documents
@@ -79,24 +150,93 @@ class DocumentProcessor:
             logger.error(f"Error processing file {file_path}: {str(e)}")
             return []
     
-    def process_multiple_files(self, file_paths: List[str]) -> List[Document]:
-        """Process multiple markdown files"""
-        all_documents = []
+    def preprocess_file(self, file_path: str, session_id: str, filename: str = None,
+                        extract_tables: bool = True) -> Dict[str, Any]:
+        """Baca file sekali lalu hasilkan chunk dan tabelnya
+
+        status: 'split', 'invalid_file' atau 'failed_to_process'. 'documents' adalah iterator
+        chunk yang di-split sambil dikonsumsi (list jika lewat process pool).
+        """
+        filename = filename or os.path.basename(file_path)
+        content = self.read_file(file_path)
+        if content is None:
+            return {'status': 'invalid_file', 'filename': filename}
+        
+        try:
+            chunks = self.iter_chunks(content, file_path, session_id, filename)
+            first_chunk = next(chunks, None)
+            tables = self.extract_tables_from_markdown(content) if extract_tables else []
+        except Exception as e:
+            logger.error(f"Error processing file {file_path}: {str(e)}")
+            return {'status': 'failed_to_process', 'filename': filename, 'error': str(e)}
+        
+        if first_chunk is None:
+            return {'status': 'failed_to_process', 'filename': filename}
+        
+        return {
+            'status': 'split',
+            'filename': filename,
+            'documents': itertools.chain([first_chunk], chunks),
+            'tables': tables
+        }
+    
+    def process_files(self, files: List[Tuple[str, str]], session_id: str,
+                      extract_tables: bool = True) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Preprocess (path, filename) secara paralel di process pool; hasil di-yield sesuai urutan file"""
+        tasks = [(path, session_id, filename, extract_tables) for path, filename in files]
+        done = 0
+        
+        if len(tasks) > 1 and self.max_workers > 1:
+            try:
+                for result in self._get_pool().map(_preprocess_file, tasks):
+                    yield done, result
+                    done += 1
+                return
+            except Exception as e:
+                logger.error(f"Preprocessing pool failed, processing remaining files inline: {str(e)}")
+                with self._pool_lock:
+                    if self._pool is not None:
+                        # Hentikan worker yang tersisa sebelum referensinya dilepas
+                        self._pool.shutdown(wait=False, cancel_futures=True)
+                        self._pool = None
         
+        # Satu file, satu worker, atau pool rusak; file yang sudah di-yield tidak diulang
+        for index in range(done, len(tasks)):
+            yield index, self.preprocess_file(*tasks[index])
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn, bukan fork: proses server punya thread (logging, job, flush) yang
+                    # lock-nya bisa ikut tersalin dalam keadaan terkunci
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._pool
+    
+    def process_multiple_files(self, file_paths: List[str], session_id: str = 'default') -> List[Document]:
+        """Process multiple markdown files"""
+        files = []
         for file_path in file_paths:
             if file_path.endswith('.md'):
-                documents = self.process_markdown_file(file_path)
-                all_documents.extend(documents)
+                files.append((file_path, os.path.basename(file_path)))
             else:
                 logger.warning(f"Skipping non-markdown file: {file_path}")
         
+        all_documents = []
+        for _, result in self.process_files(files, session_id, extract_tables=False):
+            all_documents.extend(result.get('documents', []))
+        
         logger.info(f"Processed {len(file_paths)} files into {len(all_documents)} total chunks")
         return all_documents
     
     def _extract_document_type(self, filename: str, content: str) -> str:
         """Extract document type from filename and content"""
         filename_lower = filename.lower()
-        content_lower = content.lower()
+        # Kata kunci jenis dokumen muncul di judul/bagian awal; tidak perlu lowercase seluruh isi
+        content_lower = content[:config.DOC_TYPE_PREFIX_CHARS].lower()
         
         # Check filename patterns
         if 'panduan' in filename_lower or 'manual' in filename_lower:
@@ -118,11 +258,34 @@ class DocumentProcessor:
         
         return 'general'
     
+    def extract_tables_from_file(self, file_path: str) -> List[Dict[str, Any]]:
+        """Extract tables from a markdown file"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                return self.extract_tables_from_markdown(file.read())
+        except Exception as e:
+            logger.error(f"Error extracting tables from {file_path}: {str(e)}")
+            return []
+    
+    def _section_at(self, content: str, position: int) -> str:
+        """Header path (mis. '3. Neraca > Aset') yang berlaku di posisi tertentu"""
+        headers = {}
+        for match in re.finditer(r'^(#{1,4})\s+(.+?)\s*$', content[:position], re.MULTILINE):
+            level = len(match.group(1))
+            headers[level] = match.group(2)
+            for deeper in [key for key in headers if key > level]:
+                del headers[deeper]
+        return ' > '.join(headers[level] for level in sorted(headers))
+    
     def extract_tables_from_markdown(self, content: str) -> List[Dict[str, Any]]:
         """Extract tables from markdown content"""
         tables = []
         table_pattern = r'\|(.+)\|\n\|(.+)\|\n(\|(.+)\|\n)+'
         
+        # Tabel di akhir file tanpa newline penutup tetap terdeteksi
+        if not content.endswith('\n'):
+            content += '\n'
+        
         matches = re.finditer(table_pattern, content, re.MULTILINE)
         
         for match in matches:
@@ -143,31 +306,12 @@ class DocumentProcessor:
                     tables.append({
                         'headers': headers,
                         'rows': rows,
-                        'raw_text': table_text
+                        'raw_text': table_text,
+                        'section': self._section_at(content, match.start())
                     })
         
         return tables
     
     def validate_file(self, file_path: str) -> bool:
         """Validate if file can be processed"""
-        try:
-            if not os.path.exists(file_path):
-                logger.error(f"File does not exist: {file_path}")
-                return False
-            
-            if not file_path.endswith('.md'):
-                logger.error(f"File is not a markdown file: {file_path}")
-                return False
-            
-            # Check if file is readable
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-                if len(content.strip()) == 0:
-                    logger.error(f"File is empty: {file_path}")
-                    return False
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error validating file {file_path}: {str(e)}")
-            return False
\ No newline at end of file
+        return self.read_file(file_path) is not None
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable, Optional
+from langchain.schema import Document
+import logging
+import random
+import threading
+import time
+
+import openai
+
+from app.config import config
+from app.models.embeddings import VectorStoreManager
+from app.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+class IngestionEngine:
+    """Embed chunks dari banyak file sekaligus dalam batch paralel lalu simpan ke ChromaDB"""
+
+    def __init__(self, vector_store_manager: VectorStoreManager,
+                 batch_size: int = None, max_concurrency: int = None, max_retries: int = None):
+        self.vector_store_manager = vector_store_manager
+        self.batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+        self.max_concurrency = max_concurrency or config.EMBEDDING_MAX_CONCURRENCY
+        self.max_retries = config.EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+
+    @timed('ingest')
+    def ingest(self, documents: Iterable[Document],
+               progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Ingest all chunks of a request and report throughput
+
+        documents may be a generator (chunks streamed from preprocessing).
+        progress_callback receives the number of chunks embedded so far.
+        """
+        start_time = time.perf_counter()
+
+        # index_documents memanggil embed per batch; progress dijumlahkan lintas batch
+        embedded = {'done': 0}
+
+        def embed_documents(texts: List[str]) -> List[List[float]]:
+            offset = embedded['done']
+            callback = (lambda done: progress_callback(offset + done)) if progress_callback else None
+            vectors = self.embed_documents(texts, callback)
+            embedded['done'] += len(texts)
+            return vectors
+
+        stats = self.vector_store_manager.index_documents(documents, embed_documents=embed_documents)
+
+        elapsed = time.perf_counter() - start_time
+        stats['elapsed_seconds'] = round(elapsed, 3)
+        stats['chunks_per_second'] = round(stats['total'] / elapsed, 1) if elapsed > 0 else 0.0
+
+        logger.info(f"Ingested {stats['total']} chunks in {elapsed:.2f}s "
+                    f"({stats['chunks_per_second']} chunks/s, added={stats['added']}, "
+                    f"reused={stats['reused']}, deleted={stats['deleted']}, embedded={stats['embedded']})")
+        return stats
+
+    def embed_documents(self, texts: List[str],
+                        progress_callback: Optional[Callable[[int], None]] = None) -> List[List[float]]:
+        """Embed texts in fixed-size batches with bounded parallelism"""
+        if not texts:
+            return []
+
+        batches = [
+            texts[start:start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        workers = min(self.max_concurrency, len(batches))
+
+        progress = {'done': 0}
+        progress_lock = threading.Lock()
+
+        def embed_batch(batch: List[str]) -> List[List[float]]:
+            vectors = self._embed_batch_with_retry(batch)
+            if progress_callback:
+                with progress_lock:
+                    progress['done'] += len(batch)
+                    progress_callback(progress['done'])
+            return vectors
+
+        if workers <= 1:
+            results = [embed_batch(batch) for batch in batches]
+        else:
+            # pool.map menjaga urutan hasil sesuai urutan batch
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='embed') as pool:
+                results = list(pool.map(embed_batch, batches))
+
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    @timed('embed_documents')
+    def _embed_batch_with_retry(self, batch: List[str]) -> List[List[float]]:
+        """Embed one batch, retrying with exponential backoff on rate limits (429)"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.vector_store_manager.embeddings.embed_documents(batch)
+            except Exception as e:
+                if not self._is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+
+                delay = min(config.EMBEDDING_RETRY_BASE_DELAY * (2 ** attempt), config.EMBEDDING_RETRY_MAX_DELAY)
+                delay += random.uniform(0, delay / 2)
+                logger.warning(f"Embedding rate limited (attempt {attempt + 1}/{self.max_retries}), "
+                               f"retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    @staticmethod
+    def _is_rate_limit_error(error: Exception) -> bool:
+        return isinstance(error, openai.RateLimitError) or getattr(error, 'status_code', None) == 429
@@ -0,0 +1,213 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Iterator, Optional
+from langchain.schema import Document
+import copy
+import itertools
+import logging
+import threading
+import traceback
+import uuid
+
+from app.config import config
+from app.models.table_store import TableStore
+from app.services.document_processor import DocumentProcessor
+from app.services.ingestion import IngestionEngine
+from app.utils.helpers import get_file_size
+
+logger = logging.getLogger(__name__)
+
+class IngestionJobQueue:
+    """Antrian job ingestion: /input-docs langsung mengembalikan job id, worker memproses di background"""
+
+    FINISHED_STATUSES = ('completed', 'failed')
+
+    def __init__(self, document_processor: DocumentProcessor, ingestion_engine: IngestionEngine,
+                 max_workers: int = None, max_tracked_jobs: int = None, table_store: TableStore = None):
+        self.document_processor = document_processor
+        self.ingestion_engine = ingestion_engine
+        self.table_store = table_store
+        self.max_tracked_jobs = max_tracked_jobs or config.MAX_TRACKED_JOBS
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.INGESTION_WORKERS,
+            thread_name_prefix='ingestion-job'
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, session_id: str, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Register a job for saved files and schedule it on the worker pool
+
+        Each file entry needs 'filename'; files to process also carry 'path'.
+        Entries without a path are recorded with their given 'status' only.
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'session_id': session_id,
+            'status': 'queued',
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'files': [
+                {
+                    'filename': file['filename'],
+                    'status': file.get('status', 'queued'),
+                    'chunks': 0,
+                    'path': file.get('path')
+                }
+                for file in files
+            ],
+            'total_chunks': 0,
+            'embedded_chunks': 0,
+            'ingestion': {},
+            'error': None
+        }
+
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune_jobs()
+
+        self._executor.submit(self._run_job, job_id)
+        logger.info(f"Queued ingestion job {job_id} with {len(files)} files for session {session_id}")
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a snapshot of job status and per-file progress"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = copy.deepcopy(job)
+
+        for file in snapshot['files']:
+            file.pop('path', None)
+        snapshot['files_total'] = len(snapshot['files'])
+        snapshot['files_done'] = sum(
+            1 for file in snapshot['files']
+            if file['status'] not in ('queued', 'processing', 'split')
+        )
+        return snapshot
+
+    def _update_job(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _update_file(self, job_id: str, index: int, **fields):
+        with self._lock:
+            self._jobs[job_id]['files'][index].update(fields)
+
+    def _iter_documents(self, job_id: str, session_id: str, files: List[tuple], pending_files: Dict[int, str],
+                        pending_tables: Dict[int, tuple], counts: Dict[str, int]) -> Iterator[Document]:
+        """Preprocess file yang masih queued (paralel) dan yield chunk-nya per file
+
+        Setiap file dibaca sekali: chunk dan tabel berasal dari isi yang sama.
+        """
+        queued = [(index, path, filename) for index, (path, filename, status) in enumerate(files) if status == 'queued']
+        for index, _, _ in queued:
+            self._update_file(job_id, index, status='processing')
+        
+        results = self.document_processor.process_files(
+            [(path, filename) for _, path, filename in queued],
+            session_id,
+            extract_tables=self.table_store is not None
+        )
+        for position, result in results:
+            index, path, filename = queued[position]
+            if result['status'] != 'split':
+                self._update_file(job_id, index, status=result['status'],
+                                  **({'error': result['error']} if result.get('error') else {}))
+                continue
+            
+            pending_files[index] = self.document_processor.build_document_id(session_id, filename)
+            if self.table_store is not None:
+                pending_tables[index] = (filename, result['tables'])
+            
+            # Chunk di-split sambil dikonsumsi; jumlahnya baru diketahui setelah file habis
+            chunks = 0
+            for document in result['documents']:
+                chunks += 1
+                yield document
+            
+            logger.info("Processed %s into %d chunks", filename, chunks)
+            self._update_file(job_id, index, status='split', chunks=chunks, size=get_file_size(path))
+            counts['chunks'] += chunks
+            self._update_job(job_id, total_chunks=counts['chunks'])
+    
+    def _prune_jobs(self):
+        """Buang job lama yang sudah selesai jika jumlah job melebihi batas"""
+        overflow = len(self._jobs) - self.max_tracked_jobs
+        if overflow <= 0:
+            return
+
+        for job_id in list(self._jobs.keys()):
+            if overflow <= 0:
+                break
+            if self._jobs[job_id]['status'] in self.FINISHED_STATUSES:
+                del self._jobs[job_id]
+                overflow -= 1
+
+    def _run_job(self, job_id: str):
+        """Validate, split, embed and store all files of a job"""
+        try:
+            self._update_job(job_id, status='processing', started_at=datetime.now().isoformat())
+            with self._lock:
+                session_id = self._jobs[job_id]['session_id']
+                files = [
+                    (file['path'], file['filename'], file['status'])
+                    for file in self._jobs[job_id]['files']
+                ]
+
+            pending_files = {}
+            pending_tables = {}
+            counts = {'chunks': 0}
+            
+            # Chunk mengalir dari preprocessing (process pool) langsung ke tahap embedding
+            documents = self._iter_documents(job_id, session_id, files, pending_files, pending_tables, counts)
+            first_document = next(documents, None)
+            
+            if first_document is not None:
+                try:
+                    stats = self.ingestion_engine.ingest(
+                        itertools.chain([first_document], documents),
+                        progress_callback=lambda done: self._update_job(job_id, embedded_chunks=done)
+                    )
+                    document_stats = stats.pop('documents', {})
+                    self._update_job(job_id, ingestion=stats)
+                    store_status, store_error = 'success', None
+                except Exception as e:
+                    logger.error(f"Error storing documents for job {job_id}: {str(e)}")
+                    logger.error(traceback.format_exc())
+                    store_status, store_error = 'failed_to_store', str(e)
+
+                for index, document_id in pending_files.items():
+                    if store_error:
+                        self._update_file(job_id, index, status=store_status, error=store_error)
+                    else:
+                        # Hasil diff per dokumen: chunk dipakai ulang, ditambah, dihapus
+                        self._update_file(job_id, index, status=store_status,
+                                          **document_stats.get(document_id, {}))
+
+                if store_error:
+                    self._update_job(job_id, status='failed', error=store_error,
+                                     finished_at=datetime.now().isoformat())
+                    return
+                
+                # Tabel disimpan setelah chunk berhasil masuk vector store
+                for index, (filename, tables) in pending_tables.items():
+                    try:
+                        self._update_file(job_id, index,
+                                          tables=self.table_store.index_document(session_id, filename, tables))
+                    except Exception as e:
+                        logger.error(f"Error storing tables of {filename} in job {job_id}: {str(e)}")
+
+            self._update_job(job_id, status='completed', finished_at=datetime.now().isoformat())
+            logger.info(f"Ingestion job {job_id} completed with {counts['chunks']} chunks")
+
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            self._update_job(job_id, status='failed', error=str(e),
+                             finished_at=datetime.now().isoformat())
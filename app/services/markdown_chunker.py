@@ -0,0 +1,142 @@
+from typing import Dict, Iterator, List, Tuple
+import re
+
+from app.config import config
+
+DEFAULT_HEADERS = [
+    ("#", "Header 1"),
+    ("##", "Header 2"),
+    ("###", "Header 3"),
+    ("####", "Header 4"),
+]
+
+_HEADER_PATTERN = re.compile(r'(#{1,6})[ \t]+(.+?)[ \t]*$', re.MULTILINE)
+_INDENT_PATTERN = re.compile(r'[ \t]*')
+
+class MarkdownChunker:
+    """Chunker markdown satu lintasan, pengganti MarkdownHeaderTextSplitter + RecursiveCharacterTextSplitter
+
+    Header stack dilacak per baris; tabel, blok rumus $$...$$ dan code fence tidak pernah dipotong.
+    Chunk adalah rentang offset (start, end) di teks asli, sehingga isinya cukup satu slice
+    dan posisinya bisa dicatat di metadata.
+    """
+
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None, headers: List[Tuple[str, str]] = None):
+        self.chunk_size = chunk_size or config.CHUNK_SIZE
+        self.chunk_overlap = config.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        self.header_names = {len(marker): name for marker, name in (headers or DEFAULT_HEADERS)}
+
+    def split(self, text: str) -> Iterator[Tuple[Dict[str, str], List[Tuple[int, int]]]]:
+        """Yield (header metadata, [(start, end), ...]) per section, urut sesuai dokumen"""
+        stack = {}  # level -> judul header yang sedang berlaku
+        segments = []
+        position, length = 0, len(text)
+        atomic_start, closing = None, None
+
+        while position < length:
+            line_end = text.find('\n', position)
+            if line_end == -1:
+                line_end = length
+            first = _INDENT_PATTERN.match(text, position, line_end).end()
+
+            if atomic_start is not None:
+                # Di dalam blok atomik: cari penutupnya
+                if closing == '|':
+                    if first < line_end and text[first] == '|':
+                        position = line_end + 1
+                        continue
+                    segments.append((atomic_start, position - 1, True))
+                    atomic_start = None
+                elif text.find(closing, first, line_end) != -1:
+                    segments.append((atomic_start, line_end, True))
+                    atomic_start = None
+                    position = line_end + 1
+                    continue
+                else:
+                    position = line_end + 1
+                    continue
+
+            if first == line_end:
+                position = line_end + 1
+                continue
+
+            marker = text[first]
+            if marker == '#':
+                match = _HEADER_PATTERN.match(text, first, line_end)
+                level = len(match.group(1)) if match else 0
+                if level in self.header_names:
+                    if segments:
+                        yield self._header_metadata(stack), self._pack(text, segments)
+                        segments = []
+                    stack = {key: value for key, value in stack.items() if key < level}
+                    stack[level] = match.group(2)
+                    position = line_end + 1
+                    continue
+
+            if marker == '|':
+                atomic_start, closing = position, '|'
+            elif text.startswith('$$', first):
+                if text.find('$$', first + 2, line_end) != -1:
+                    segments.append((position, line_end, True))
+                else:
+                    atomic_start, closing = position, '$$'
+            elif text.startswith('```', first) or text.startswith('~~~', first):
+                atomic_start, closing = position, text[first:first + 3]
+            else:
+                self._add_text_segments(text, position, line_end, segments)
+            position = line_end + 1
+
+        if atomic_start is not None:
+            # Blok atomik sampai akhir file (tabel terakhir, atau $$/``` yang tidak ditutup)
+            segments.append((atomic_start, min(position - 1, length), True))
+        if segments:
+            yield self._header_metadata(stack), self._pack(text, segments)
+
+    def _header_metadata(self, stack: Dict[int, str]) -> Dict[str, str]:
+        return {self.header_names[level]: stack[level] for level in sorted(stack)}
+
+    def _add_text_segments(self, text: str, start: int, end: int, segments: List[tuple]):
+        """Satu baris teks; baris panjang dipotong di batas kata
+
+        Potongan maksimal chunk_size - chunk_overlap agar masih muat bersama overlap dari chunk sebelumnya.
+        """
+        limit = self.chunk_size - self.chunk_overlap if self.chunk_size > self.chunk_overlap else self.chunk_size
+        if end - start > self.chunk_size:
+            while end - start > limit:
+                cut = text.rfind(' ', start + 1, start + limit)
+                if cut == -1:
+                    cut = start + limit
+                segments.append((start, cut, False))
+                start = cut + 1 if text[cut] == ' ' else cut
+        if end > start:
+            segments.append((start, end, False))
+
+    def _pack(self, text: str, segments: List[tuple]) -> List[Tuple[int, int]]:
+        """Gabungkan segmen menjadi chunk <= chunk_size dengan overlap dari segmen teks di akhir chunk"""
+        chunks = []
+        current = []
+        for segment in segments:
+            if current and segment[1] - current[0][0] > self.chunk_size:
+                chunks.append((current[0][0], current[-1][1]))
+
+                # Overlap hanya dari teks biasa; tabel/rumus tidak diulang di chunk berikutnya
+                end = current[-1][1]
+                kept = []
+                for previous in reversed(current):
+                    if previous[2] or end - previous[0] > self.chunk_overlap:
+                        break
+                    kept.append(previous)
+                kept.reverse()
+                if not kept and not current[-1][2] and self.chunk_overlap:
+                    # Segmen terakhir lebih panjang dari overlap: ulang ekornya mulai dari batas kata
+                    boundary = text.find(' ', end - self.chunk_overlap, end)
+                    if boundary != -1 and boundary + 1 < end:
+                        kept = [(boundary + 1, end, False)]
+                while kept and segment[1] - kept[0][0] > self.chunk_size:
+                    kept.pop(0)
+                current = kept
+            current.append(segment)
+
+        if current:
+            chunks.append((current[0][0], current[-1][1]))
+        return chunks
@@ -0,0 +1,435 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+from langchain.memory import ConversationBufferWindowMemory
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+import atexit
+import json
+import logging
+import threading
+import time
+import zlib
+
+from app.config import config
+from app.models.session_backend import SessionBackend
+
+logger = logging.getLogger(__name__)
+
+# Percobaan tulis per flush; konflik digabung dengan versi backend lalu dicoba lagi
+MAX_FLUSH_ATTEMPTS = 3
+
+class SummaryBufferMemory(ConversationBufferWindowMemory):
+    """Window memory plus ringkasan berjalan untuk pesan lama
+
+    summarized_until: jumlah pesan di awal chat_memory yang sudah masuk ke summary.
+    """
+
+    summary: str = ""
+    summarized_until: int = 0
+
+    @property
+    def recent_messages(self) -> List[BaseMessage]:
+        """Pesan yang belum diringkas, dipakai verbatim di prompt"""
+        return self.chat_memory.messages[self.summarized_until:]
+
+    def clear(self) -> None:
+        super().clear()
+        self.summary = ""
+        self.summarized_until = 0
+
+    def dumps(self) -> bytes:
+        """Serialisasi ringkas: pesan sebagai [tipe, isi], ringkasan, lalu dikompresi zlib"""
+        payload = {
+            'm': [['h' if message.type == 'human' else 'a', message.content]
+                  for message in self.chat_memory.messages if message.type in ('human', 'ai')],
+            's': self.summary,
+            'u': self.summarized_until
+        }
+        return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def loads(self, data: bytes):
+        """Ganti isi memory dengan hasil dumps()"""
+        payload = json.loads(zlib.decompress(data).decode('utf-8'))
+        self.chat_memory.messages = [
+            HumanMessage(content=content) if kind == 'h' else AIMessage(content=content)
+            for kind, content in payload.get('m', [])
+        ]
+        self.summary = payload.get('s', '')
+        self.summarized_until = min(payload.get('u', 0), len(self.chat_memory.messages))
+
+class SessionState:
+    """Memory percakapan satu session beserta lock-nya"""
+
+    def __init__(self, session_id: str, memory: SummaryBufferMemory, version: int = 0):
+        self.session_id = session_id
+        self.memory = memory
+        self.lock = threading.RLock()
+        self.last_access = time.monotonic()
+        # Kapan versi backend terakhir dicek (_refresh_if_stale)
+        self.last_refresh = self.last_access
+        # Versi backend yang menjadi dasar isi memory ini (compare-and-set saat flush)
+        self.version = version
+        # Jumlah pesan awal yang sama dengan salinan di backend; None setelah clear (versi lokal menang)
+        self.synced_messages = len(memory.chat_memory.messages)
+        # Hasil penulisan ulang pertanyaan lanjutan: (pertanyaan, riwayat) -> pertanyaan mandiri
+        self.rewrites = OrderedDict()
+
+class SessionMemoryStore:
+    """Bounded per-session memory store with LRU + TTL eviction
+
+    Dengan backend persisten, session dimuat saat pertama diakses (lazy) dan perubahan
+    ditulis ke backend secara berkelompok oleh thread latar belakang (write-behind).
+    Session yang tergusur dari memory tetap tersimpan di backend.
+    """
+
+    def __init__(self, max_sessions: int = None, ttl_seconds: int = None, window_size: int = None,
+                 summarizer=None, backend: Optional[SessionBackend] = None):
+        self.max_sessions = max_sessions or config.MAX_SESSIONS
+        self.ttl_seconds = config.SESSION_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.window_size = window_size or config.MEMORY_WINDOW_SIZE
+        # ConversationSummarizer opsional; dijadwalkan setelah setiap request selesai
+        self.summarizer = summarizer
+        self.backend = backend
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'sessions_created': 0,
+            'sessions_loaded': 0,
+            'sessions_reloaded': 0,
+            'evictions_lru': 0,
+            'evictions_ttl': 0,
+            'flushes': 0,
+            'flush_errors': 0,
+            'write_conflicts': 0
+        }
+
+        # Antrean write-behind: session_id -> SessionState, diserialisasi saat flush
+        self._dirty = {}
+        self._dirty_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._flush_thread = None
+        if self.backend is not None:
+            self._flush_thread = threading.Thread(target=self._flush_loop, name='session-flush', daemon=True)
+            self._flush_thread.start()
+            atexit.register(self.close)
+
+    def _create_memory(self) -> SummaryBufferMemory:
+        return SummaryBufferMemory(
+            k=self.window_size,
+            return_messages=True
+        )
+
+    def _load_state(self, session_id: str) -> Optional[SessionState]:
+        """Muat session dari backend; None jika belum pernah disimpan"""
+        if self.backend is None:
+            return None
+
+        try:
+            record = self.backend.load(session_id)
+        except Exception as e:
+            logger.error(f"Error loading session {session_id}: {str(e)}")
+            return None
+        if record is None:
+            return None
+
+        version, data = record
+        memory = self._create_memory()
+        memory.loads(data)
+        return SessionState(session_id, memory, version)
+
+    def get(self, session_id: str, create: bool = True) -> Optional[SessionState]:
+        """Get (and optionally create) the state for a session, refreshing its LRU position"""
+        with self._lock:
+            state = self._touch(session_id)
+        if state is not None:
+            return state
+
+        # I/O backend dilakukan di luar lock global agar session lain tidak tertahan
+        loaded = self._load_state(session_id)
+        if loaded is None and not create:
+            return None
+
+        with self._lock:
+            state = self._touch(session_id)
+            if state is not None:
+                return state
+
+            if loaded is not None:
+                state = loaded
+                self._stats['sessions_loaded'] += 1
+            else:
+                state = SessionState(session_id, self._create_memory())
+                self._stats['sessions_created'] += 1
+                logger.info("Created new memory for session %s", session_id)
+
+            self._sessions[session_id] = state
+            self._evict_overflow()
+            return state
+
+    def _touch(self, session_id: str) -> Optional[SessionState]:
+        now = time.monotonic()
+        self._evict_expired(now)
+
+        state = self._sessions.get(session_id)
+        if state is not None:
+            state.last_access = now
+            self._sessions.move_to_end(session_id)
+        return state
+
+    @contextmanager
+    def session(self, session_id: str, persist: bool = True):
+        """Hold the session lock for the duration of one request
+
+        persist=False: session sementara (mis. batch evaluasi), tidak ditulis ke backend dan tidak diringkas.
+        """
+        state = self.get(session_id)
+        with state.lock:
+            if persist:
+                self._refresh_if_stale(state)
+            yield state.memory
+
+        if not persist:
+            return
+        self.mark_dirty(state)
+        if self.summarizer is not None:
+            self.summarizer.schedule(state, on_update=self.mark_dirty)
+
+    def _refresh_if_stale(self, state: SessionState):
+        """Muat ulang session yang sudah diubah worker lain (versi backend lebih baru)"""
+        if self.backend is None:
+            return
+
+        now = time.monotonic()
+        if now - state.last_refresh < config.SESSION_REFRESH_INTERVAL:
+            return
+        state.last_refresh = now
+
+        try:
+            if self.backend.version(state.session_id) <= state.version:
+                return
+            record = self.backend.load(state.session_id)
+            if record is None:
+                return
+        except Exception as e:
+            logger.error(f"Error refreshing session {state.session_id}: {str(e)}")
+            return
+
+        if self._merge(state, record):
+            self.mark_dirty(state)
+        with self._lock:
+            self._stats['sessions_reloaded'] += 1
+
+    @staticmethod
+    def _merge(state: SessionState, record: tuple) -> bool:
+        """Gabungkan versi backend dengan pesan lokal yang belum tersimpan (dipanggil dengan state.lock)
+
+        Returns True jika hasil gabungan masih harus ditulis ke backend.
+        """
+        version, data = record
+        memory = state.memory
+        if state.synced_messages is None:
+            # Session dikosongkan di worker ini setelah terakhir dibaca: versi lokal menang
+            state.version = version
+            return True
+
+        unsynced = memory.chat_memory.messages[state.synced_messages:]
+        memory.loads(data)
+        stored = memory.chat_memory.messages
+
+        # Pesan lokal yang ternyata sudah ada di backend (misalnya hasil flush sendiri) tidak diulang
+        already_stored = stored[state.synced_messages:]
+        skip = 0
+        while (skip < min(len(unsynced), len(already_stored))
+               and unsynced[skip].type == already_stored[skip].type
+               and unsynced[skip].content == already_stored[skip].content):
+            skip += 1
+        unsynced = unsynced[skip:]
+
+        state.synced_messages = len(stored)
+        stored.extend(unsynced)
+        state.version = version
+        state.rewrites.clear()
+        return bool(unsynced)
+
+    def mark_dirty(self, state: SessionState):
+        """Catat perubahan session untuk ditulis ke backend oleh thread flush"""
+        if self.backend is None:
+            return
+
+        with self._dirty_lock:
+            self._dirty[state.session_id] = state
+            pending = len(self._dirty)
+        if pending >= config.SESSION_FLUSH_BATCH_SIZE:
+            self._flush_event.set()
+
+    def flush(self):
+        """Tulis semua perubahan yang tertunda ke backend dalam batch (compare-and-set)"""
+        if self.backend is None:
+            return
+
+        # Konflik yang masih tersisa setelah MAX_FLUSH_ATTEMPTS dicoba lagi pada flush berikutnya
+        for _ in range(MAX_FLUSH_ATTEMPTS):
+            if not self._flush_once():
+                return
+
+    def _flush_once(self) -> bool:
+        """Satu batch penulisan; returns True jika ada konflik yang sudah digabung dan perlu ditulis ulang"""
+        with self._dirty_lock:
+            states, self._dirty = self._dirty, {}
+        if not states:
+            return False
+
+        records, message_counts = {}, {}
+        for session_id, state in states.items():
+            with state.lock:
+                records[session_id] = (state.version, state.memory.dumps())
+                message_counts[session_id] = len(state.memory.chat_memory.messages)
+
+        try:
+            saved = self.backend.save_many(records)
+        except Exception as e:
+            logger.error(f"Error flushing {len(records)} sessions: {str(e)}")
+            with self._lock:
+                self._stats['flush_errors'] += 1
+            self._requeue(states.values())
+            return False
+
+        conflicts = []
+        for session_id, state in states.items():
+            if session_id not in saved:
+                conflicts.append(state)
+                continue
+            with state.lock:
+                if state.version == records[session_id][0]:
+                    state.version = saved[session_id]
+                    state.synced_messages = message_counts[session_id]
+
+        for state in conflicts:
+            # Worker lain menulis lebih dulu: ambil versinya lalu tambahkan pesan lokal di atasnya
+            try:
+                record = self.backend.load(state.session_id)
+            except Exception as e:
+                logger.error(f"Error reloading session {state.session_id} after write conflict: {str(e)}")
+                continue
+            with state.lock:
+                if record is None:
+                    # Baris backend kedaluwarsa; tulis ulang sebagai session baru
+                    state.version = 0
+                else:
+                    self._merge(state, record)
+            logger.info("Merged concurrent update of session %s", state.session_id)
+
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['write_conflicts'] += len(conflicts)
+        self._requeue(conflicts)
+        return bool(conflicts)
+
+    def _requeue(self, states):
+        with self._dirty_lock:
+            for state in states:
+                self._dirty.setdefault(state.session_id, state)
+
+    def _flush_loop(self):
+        while not self._stop_event.is_set():
+            self._flush_event.wait(config.SESSION_FLUSH_INTERVAL)
+            self._flush_event.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                # Thread flush tidak boleh mati karena satu batch yang gagal
+                logger.error(f"Error in session flush loop: {str(e)}")
+                with self._lock:
+                    self._stats['flush_errors'] += 1
+
+    def close(self):
+        """Hentikan thread flush lalu tulis sisa perubahan (dipanggil saat shutdown)"""
+        self._stop_event.set()
+        self._flush_event.set()
+        if self._flush_thread is not None and self._flush_thread is not threading.current_thread():
+            self._flush_thread.join(timeout=config.SESSION_FLUSH_INTERVAL + 5)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing sessions on shutdown: {str(e)}")
+
+    def clear(self, session_id: str) -> bool:
+        """Clear a session's messages; returns False if the session is unknown"""
+        state = self.get(session_id, create=False)
+        if state is None:
+            return False
+
+        with state.lock:
+            state.memory.clear()
+            state.rewrites.clear()
+            state.synced_messages = None
+        self.mark_dirty(state)
+        return True
+
+    def discard(self, session_id: str):
+        """Buang session dari memory tanpa menyentuh backend (untuk session sementara)"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def get_rewrite(self, session_id: str, key: Any) -> Optional[str]:
+        """Pertanyaan mandiri yang sudah pernah dihasilkan untuk key ini di session tersebut"""
+        state = self.get(session_id, create=False)
+        if state is None:
+            return None
+
+        with state.lock:
+            rewrite = state.rewrites.get(key)
+            if rewrite is not None:
+                state.rewrites.move_to_end(key)
+            return rewrite
+
+    def save_rewrite(self, session_id: str, key: Any, rewrite: str):
+        """Simpan pertanyaan mandiri; cache per session dibatasi CONDENSE_CACHE_SIZE entri"""
+        state = self.get(session_id, create=False)
+        if state is None:
+            return
+
+        with state.lock:
+            state.rewrites[key] = rewrite
+            state.rewrites.move_to_end(key)
+            while len(state.rewrites) > config.CONDENSE_CACHE_SIZE:
+                state.rewrites.popitem(last=False)
+
+    def _evict_expired(self, now: float):
+        if not self.ttl_seconds:
+            return
+
+        # OrderedDict terurut dari yang paling lama diakses
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state.last_access < self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+            self._stats['evictions_ttl'] += 1
+            logger.info("Evicted expired session %s", session_id)
+
+    def _evict_overflow(self):
+        while len(self._sessions) > self.max_sessions:
+            session_id, _ = self._sessions.popitem(last=False)
+            self._stats['evictions_lru'] += 1
+            logger.info("Evicted least recently used session %s", session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get resident session count and eviction counters"""
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            stats = dict(self._stats)
+            stats['resident_sessions'] = len(self._sessions)
+
+        with self._dirty_lock:
+            stats['pending_writes'] = len(self._dirty)
+        stats['backend'] = self.backend.name if self.backend is not None else 'memory'
+        stats['max_sessions'] = self.max_sessions
+        stats['ttl_seconds'] = self.ttl_seconds
+        if self.summarizer is not None:
+            stats['summarizer'] = self.summarizer.get_stats()
+        return stats
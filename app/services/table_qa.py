@@ -0,0 +1,222 @@
+from typing import List, Dict, Any, Optional
+import logging
+import re
+
+import numpy as np
+
+from app.models.lexical_index import tokenize
+from app.models.table_store import TableStore, parse_number
+from app.utils.helpers import format_number
+
+logger = logging.getLogger(__name__)
+
+# Pertanyaan harus meminta nilai, bukan penjelasan, agar dijawab langsung dari tabel
+VALUE_CUES = re.compile(r'\b(berapa|nilai|besarnya|angka|how much|what is the value)\b', re.IGNORECASE)
+
+# Pertanyaan yang juga meminta alasan/penjelasan selalu diteruskan ke LLM
+EXPLANATION_CUES = re.compile(r'\b(mengapa|kenapa|jelaskan|bagaimana|why|explain)\b', re.IGNORECASE)
+
+# 'total'/'jumlah' bersama filter rentang (mis. jumlah qx di atas 30) berarti penjumlahan, bukan lookup
+TOTAL_CUES = re.compile(r'\b(total|jumlah)\b', re.IGNORECASE)
+
+AGGREGATES = [
+    ('mean', re.compile(r'\b(rata-rata|rerata|average|mean)\b', re.IGNORECASE), 'Rata-rata'),
+    ('max', re.compile(r'\b(tertinggi|terbesar|maksimum|maximum|max)\b', re.IGNORECASE), 'Nilai tertinggi'),
+    ('min', re.compile(r'\b(terendah|terkecil|minimum|min)\b', re.IGNORECASE), 'Nilai terendah'),
+    ('sum', re.compile(r'\b(jumlahkan|total keseluruhan|sum)\b', re.IGNORECASE), 'Jumlah'),
+]
+
+FILTERS = [
+    ('gt', re.compile(r'(?:di atas|lebih dari|>=?)\s*(\d+(?:[.,]\d+)?)', re.IGNORECASE)),
+    ('lt', re.compile(r'(?:di bawah|kurang dari|<=?)\s*(\d+(?:[.,]\d+)?)', re.IGNORECASE)),
+    ('between', re.compile(r'antara\s*(\d+(?:[.,]\d+)?)\s*(?:dan|-|sampai|hingga)\s*(\d+(?:[.,]\d+)?)', re.IGNORECASE)),
+]
+
+class TableQuestionAnswerer:
+    """Jawab pertanyaan berbentuk tabel (lookup / agregasi) langsung dari TableStore"""
+
+    def __init__(self, table_store: TableStore):
+        self.table_store = table_store
+
+    def answer(self, question: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return a table answer, or None when the question is not clearly table-shaped"""
+        tables = self.table_store.get_tables(session_id)
+        if not tables:
+            return None
+
+        question_tokens = set(tokenize(question))
+        question_numbers = {
+            value for value in (parse_number(token) for token in re.findall(r'\d[\d.,]*', question))
+            if value is not None
+        }
+
+        if EXPLANATION_CUES.search(question):
+            return None
+
+        aggregate = next(((name, label) for name, pattern, label in AGGREGATES if pattern.search(question)), None)
+        filtered = any(pattern.search(question) for _, pattern in FILTERS)
+        if aggregate is None and filtered and TOTAL_CUES.search(question):
+            aggregate = ('sum', 'Jumlah')
+        if aggregate is None and not VALUE_CUES.search(question):
+            return None
+
+        # Agregasi dicek sebelum lookup: batas filter ("di atas 30") bisa sama dengan kunci baris
+        if aggregate is not None:
+            result = self._aggregate(tables, question, question_tokens, aggregate)
+            if result is None and not filtered:
+                result = self._lookup(tables, question_tokens, question_numbers)
+        elif filtered:
+            # Rentang tanpa agregasi yang jelas: jangan dijawab sebagai satu baris
+            return None
+        else:
+            result = self._lookup(tables, question_tokens, question_numbers)
+        if result is not None:
+            logger.info("Answered from table store (%s) for session %s", result['operation'], session_id)
+        return result
+
+    @staticmethod
+    def _overlap(text: str, question_tokens: set) -> int:
+        return len(set(tokenize(text)) & question_tokens)
+
+    def _pick_column(self, table: Dict[str, Any], question_tokens: set, exclude: int = None) -> tuple:
+        """Numeric column best matching the question: (index, score), or (None, 0) if ambiguous"""
+        candidates = [
+            (index, self._overlap(column['header'], question_tokens))
+            for index, column in enumerate(table['columns'])
+            if column['kind'] == 'number' and index != exclude
+        ]
+        if not candidates:
+            return None, 0
+        if len(candidates) == 1:
+            return candidates[0]
+
+        candidates.sort(key=lambda item: item[1], reverse=True)
+        if candidates[0][1] == 0 or candidates[0][1] == candidates[1][1]:
+            return None, 0
+        return candidates[0]
+
+    def _match_row(self, table: Dict[str, Any], question_tokens: set, question_numbers: set) -> tuple:
+        """Row whose label is fully named in the question: (index, score)"""
+        key_column = table['columns'][0]
+        if key_column['kind'] == 'number':
+            # Kolom kunci numerik (mis. Usia): cocokkan dengan angka di pertanyaan
+            matches = [index for index, value in enumerate(key_column['values']) if value in question_numbers]
+            return (matches[0], 1) if len(matches) == 1 else (None, 0)
+
+        best, best_score, tie = None, 0, False
+        for index, label in enumerate(key_column['values']):
+            label_tokens = set(tokenize(label))
+            if not label_tokens or not label_tokens <= question_tokens:
+                continue
+            if len(label_tokens) > best_score:
+                best, best_score, tie = index, len(label_tokens), False
+            elif len(label_tokens) == best_score:
+                tie = True
+        return (None, 0) if tie else (best, best_score)
+
+    def _lookup(self, tables: List[Dict[str, Any]], question_tokens: set, question_numbers: set) -> Optional[Dict[str, Any]]:
+        candidates = []
+        for table in tables:
+            row, row_score = self._match_row(table, question_tokens, question_numbers)
+            if row is None:
+                continue
+            column, column_score = self._pick_column(table, question_tokens, exclude=0)
+            if column is None:
+                continue
+
+            value = table['columns'][column]['values'][row]
+            if np.isnan(value):
+                continue
+            score = row_score + column_score + self._overlap(table['section'], question_tokens)
+            candidates.append((score, table, row, column, float(value)))
+
+        if not candidates:
+            return None
+
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        score, table, row, column, value = candidates[0]
+        # Dua tabel sama kuat dengan nilai berbeda: biarkan LLM yang menjawab
+        if any(other[0] == score and other[4] != value for other in candidates[1:]):
+            return None
+
+        key_column = table['columns'][0]
+        row_label = (f"{key_column['header']} {format_number(key_column['values'][row], 0)}"
+                     if key_column['kind'] == 'number' else key_column['values'][row])
+        column_info = table['columns'][column]
+        return {
+            'operation': 'lookup',
+            'answer': f"{row_label} — {column_info['header']}: {self._format_value(value, column_info['unit'])}",
+            'value': value,
+            'table': table,
+            'column': column_info['header'],
+            'rows': [row]
+        }
+
+    def _aggregate(self, tables: List[Dict[str, Any]], question: str, question_tokens: set,
+                   aggregate: tuple) -> Optional[Dict[str, Any]]:
+        operation, label = aggregate
+
+        candidates = []
+        for table in tables:
+            column, column_score = self._pick_column(table, question_tokens, exclude=0)
+            if column is None or column_score == 0:
+                continue
+            score = column_score + self._overlap(table['section'], question_tokens)
+            candidates.append((score, table, column))
+
+        if not candidates:
+            return None
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        score, table, column = candidates[0]
+        if any(other[0] == score and other[1]['headers'] != table['headers'] for other in candidates[1:]):
+            return None
+
+        values = table['columns'][column]['values']
+        mask = ~np.isnan(values) & ~np.array(table['summary_rows'], dtype=bool)
+
+        # Filter pada kolom kunci numerik (mis. usia di atas 30), jika ada
+        key_column = table['columns'][0]
+        filter_text = ''
+        name, match = next(((name, match) for name, pattern in FILTERS
+                            for match in [pattern.search(question)] if match), (None, None))
+        if match is not None:
+            # Filter yang tidak bisa diterapkan ke kunci tabel jangan diabaikan diam-diam
+            if key_column['kind'] != 'number':
+                return None
+            keys = key_column['values']
+            bounds = [parse_number(group) for group in match.groups()]
+            low, high = np.nanmin(keys), np.nanmax(keys)
+            if any(bound is None or not low <= bound <= high for bound in bounds):
+                return None
+            if name == 'gt':
+                mask &= keys > bounds[0]
+            elif name == 'lt':
+                mask &= keys < bounds[0]
+            else:
+                mask &= (keys >= bounds[0]) & (keys <= bounds[1])
+            filter_text = f", {match.group(0).strip()}"
+
+        selected = values[mask]
+        if selected.size == 0:
+            return None
+
+        value = float({'mean': np.mean, 'max': np.max, 'min': np.min, 'sum': np.sum}[operation](selected))
+        column_info = table['columns'][column]
+        return {
+            'operation': operation,
+            'answer': (f"{label} {column_info['header']} ({selected.size} baris{filter_text}): "
+                       f"{self._format_value(value, column_info['unit'])}"),
+            'value': value,
+            'table': table,
+            'column': column_info['header'],
+            'rows': np.flatnonzero(mask).tolist()
+        }
+
+    @staticmethod
+    def _format_value(value: float, unit: str) -> str:
+        if float(value).is_integer():
+            decimals = 0
+        else:
+            fraction = f"{abs(value):.6f}".split('.')[1].rstrip('0')
+            decimals = max(2, len(fraction))
+        return f"{format_number(value, decimals)}{unit}"
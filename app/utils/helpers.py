@@ -1,20 +1,55 @@
+import atexit
 import os
 import logging
 import json
+import queue
+from logging.handlers import QueueListener, RotatingFileHandler
 from typing import List, Dict, Any
 from datetime import datetime
 
+_log_listener = None
+
 def setup_logging(log_level: str = 'INFO'):
-    """Setup logging configuration"""
-    logging.basicConfig(
-        level=getattr(logging, log_level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('app.log'),
-            logging.StreamHandler()
-        ]
+    """Setup logging: request thread hanya memasukkan record ke antrean,
+    thread listener menulis JSON ke file berotasi (jika LOG_TO_FILE) dan ke console"""
+    global _log_listener
+    from app.config import config
+    from app.utils.logging_utils import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+
+    if _log_listener is not None:
+        _log_listener.stop()
+
+    handlers = []
+    if config.LOG_TO_FILE:
+        file_handler = RotatingFileHandler(
+            config.LOG_FILE,
+            maxBytes=config.LOG_MAX_BYTES,
+            backupCount=config.LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(
+        JsonFormatter() if config.LOG_FORMAT == 'json'
+        else logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     )
 
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=config.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(SamplingFilter(config.LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, log_level.upper()))
+
+    handlers.append(console_handler)
+    _log_listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
 def validate_openai_key(api_key: str) -> bool:
     """Validate OpenAI API key format"""
     return api_key and api_key.startswith('sk-') and len(api_key) > 20
@@ -44,6 +79,10 @@ def create_response(success: bool, message: str, data: Any = None) -> Dict[str,
     
     return response
 
+def format_sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename for safe storage"""
     import re
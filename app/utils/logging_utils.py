@@ -0,0 +1,90 @@
+from logging.handlers import QueueHandler
+from typing import Any, Dict
+import copy
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+
+from app.utils.metrics import metrics
+
+LOG_RECORDS_DROPPED = metrics.counter('log_records_dropped_total', 'Record log dibuang karena antrean logging penuh')
+
+# Atribut bawaan LogRecord; sisanya (dari extra=...) ikut ditulis ke JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+# Tandai record per-chunk/per-hasil: logger.debug("...", x, extra=SAMPLED)
+SAMPLED = {'sampled': True}
+
+class JsonFormatter(logging.Formatter):
+    """Satu record log per baris JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno,
+            'process': record.process,
+            'thread': record.threadName
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                payload[key] = value
+
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exception'] = record.exc_text
+        if record.stack_info:
+            payload['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Loloskan 1 dari setiap N record bertanda 'sampled' per lokasi log; record lain selalu lolos"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False):
+            return True
+        if not self.every:
+            return False
+
+        key = (record.name, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        record.sample_rate = 1 / self.every
+        return True
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler yang tidak pernah menunggu: record dibuang jika antrean penuh"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Antrean in-process: cukup bekukan pesan; format JSON dikerjakan thread listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
@@ -0,0 +1,196 @@
+from contextlib import contextmanager, ExitStack
+from typing import Dict, Any, List, Tuple
+import bisect
+import logging
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+# Bucket latensi (detik): dari lookup cache (ms) sampai jawaban GPT-4o yang panjang
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+def _format_labels(labels: Tuple[Tuple[str, Any], ...], extra: Tuple[Tuple[str, Any], ...] = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+class Counter:
+    """Counter monoton per kombinasi label"""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Histogram:
+    """Histogram kumulatif ala Prometheus per kombinasi label"""
+
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def snapshot(self) -> Dict[Tuple, Dict[str, Any]]:
+        with self._lock:
+            return {key: {'counts': list(series['counts']), 'sum': series['sum'], 'count': series['count']}
+                    for key, series in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series['counts']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+class MetricsRegistry:
+    """Kumpulan metrik per proses, dirender dalam format teks Prometheus"""
+
+    def __init__(self, prefix: str = 'chatbot'):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, description: str, **kwargs):
+        full_name = f"{self.prefix}_{name}"
+        metric = self._metrics.get(full_name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(full_name, cls(full_name, description, **kwargs))
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._get(Counter, name, description)
+
+    def histogram(self, name: str, description: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, description, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for _, metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+
+STAGE_DURATION = metrics.histogram('stage_duration_seconds', 'Durasi setiap tahap pemrosesan pertanyaan')
+STAGE_ERRORS = metrics.counter('stage_errors_total', 'Tahap yang berakhir dengan exception')
+HTTP_DURATION = metrics.histogram('http_request_duration_seconds', 'Durasi request HTTP per endpoint')
+LLM_TOKENS = metrics.counter('llm_tokens_total', 'Token LLM per model dan jenis (prompt/completion)')
+CACHE_REQUESTS = metrics.counter('cache_requests_total', 'Lookup cache per cache dan hasil (hit/miss)')
+ANSWERS = metrics.counter('answers_total', 'Jawaban per mode (document_based, calculation, ...)')
+CONTEXT_TOKENS = metrics.histogram('context_tokens', 'Token konteks (chunk + riwayat) per prompt dokumen',
+                                   buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000))
+FIRST_TOKEN_LATENCY = metrics.histogram('llm_time_to_first_token_seconds', 'Waktu sampai token pertama jawaban streaming')
+
+_tracer = None
+
+def setup_tracing():
+    """Aktifkan export span OpenTelemetry (OTLP gRPC) jika OTEL_ENABLED"""
+    global _tracer
+    if not config.OTEL_ENABLED or _tracer is not None:
+        return
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        logger.warning(f"OpenTelemetry packages not available, tracing disabled: {str(e)}")
+        return
+
+    # Endpoint dan header exporter mengikuti env standar OTEL_EXPORTER_OTLP_*
+    provider = TracerProvider(resource=Resource.create({'service.name': config.OTEL_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer(__name__)
+    logger.info(f"OpenTelemetry tracing enabled for service {config.OTEL_SERVICE_NAME}")
+
+@contextmanager
+def timed(stage: str, **attributes):
+    """Ukur durasi satu tahap ke histogram (dan span OpenTelemetry jika aktif)"""
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        span = None
+        if _tracer is not None:
+            span = stack.enter_context(_tracer.start_as_current_span(stage, attributes=attributes))
+        try:
+            yield span
+        except Exception:
+            STAGE_ERRORS.inc(stage=stage)
+            raise
+        finally:
+            STAGE_DURATION.observe(time.perf_counter() - start, stage=stage)
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    if count:
+        CACHE_REQUESTS.inc(count, cache=cache, result='hit' if hit else 'miss')
+
+class TokenUsageCallbackHandler(BaseCallbackHandler):
+    """Hitung token prompt/completion dari setiap panggilan LLM (termasuk streaming)"""
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        llm_output = response.llm_output or {}
+        model = llm_output.get('model_name') or config.OPENAI_MODEL
+
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+                if usage:
+                    prompt_tokens += usage.get('input_tokens', 0)
+                    completion_tokens += usage.get('output_tokens', 0)
+
+        if not prompt_tokens and not completion_tokens:
+            token_usage = llm_output.get('token_usage') or {}
+            prompt_tokens = token_usage.get('prompt_tokens', 0)
+            completion_tokens = token_usage.get('completion_tokens', 0)
+
+        if prompt_tokens:
+            LLM_TOKENS.inc(prompt_tokens, model=model, type='prompt')
+        if completion_tokens:
+            LLM_TOKENS.inc(completion_tokens, model=model, type='completion')
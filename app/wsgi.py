@@ -0,0 +1,7 @@
+"""WSGI entry point untuk production server
+
+Jalankan dengan: gunicorn -c gunicorn.conf.py app.wsgi:app
+"""
+from app.main import app
+
+application = app
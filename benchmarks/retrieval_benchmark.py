@@ -0,0 +1,390 @@
+"""Benchmark retrieval tanpa OpenAI: ingest sample_docs (diperbesar sintetis), ukur throughput, latensi, memori dan recall@k
+
+Embedding memakai hashing trick deterministik dan LLM memakai FakeListChatModel,
+sehingga hasil bisa dibandingkan antar commit tanpa biaya API. Contoh:
+
+    python -m benchmarks.retrieval_benchmark --chunks 100000 --output bench.json
+    python -m benchmarks.retrieval_benchmark --chunk-size 500 --baseline bench.json
+"""
+from typing import List, Dict, Any, Optional
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# Config dibaca saat import: pastikan tidak ada yang menyentuh OpenAI / direktori data asli
+os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark-0000000000000000000000')
+os.environ.setdefault('ANONYMIZED_TELEMETRY', 'False')
+os.environ['EMBEDDING_CACHE_ENABLED'] = os.getenv('BENCHMARK_EMBEDDING_CACHE', 'False')
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from app.config import config
+from app.models.lexical_index import tokenize
+
+# Metrik yang dibandingkan dengan --baseline: (path, True jika lebih besar lebih baik)
+COMPARED_METRICS = [
+    ('ingestion.chunks_per_second', True),
+    ('query.p50_ms', False),
+    ('query.p95_ms', False),
+    ('query.p99_ms', False),
+    ('memory.peak_rss_mb', False),
+    ('quality.mrr', True),
+]
+
+SYNTHETIC_CHUNKS_PER_DOCUMENT = 2000
+
+class HashingEmbeddings(Embeddings):
+    """Embedding lokal deterministik: unigram + bigram token di-hash ke vektor bertanda"""
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.calls = 0
+        self._buckets = {}
+
+    def _bucket(self, feature: str) -> tuple:
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+            bucket = (digest % self.dimensions, 1.0 if (digest >> 63) else -1.0)
+            self._buckets[feature] = bucket
+        return bucket
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions)
+        tokens = tokenize(text)
+        features = [(token, 1.0) for token in tokens]
+        features += [(f"{first} {second}", 0.5) for first, second in zip(tokens, tokens[1:])]
+        for feature, weight in features:
+            index, sign = self._bucket(feature)
+            vector[index] += sign * weight
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return self._embed(text)
+
+def current_rss_mb() -> Optional[float]:
+    """RSS proses saat ini (Linux), termasuk memori native ChromaDB/hnswlib"""
+    try:
+        with open('/proc/self/statm') as file:
+            pages = int(file.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss dalam KB di Linux, byte di macOS
+    return round(peak / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+def percentile_ms(samples: List[float], q: float) -> float:
+    return round(float(np.percentile(samples, q)) * 1000, 3) if samples else 0.0
+
+def load_corpus(processor, docs_dir: str, session_id: str) -> tuple:
+    """Split setiap file markdown unik (file duplikat isi dilewati)"""
+    documents, files, seen = [], [], set()
+    for name in sorted(os.listdir(docs_dir)):
+        path = os.path.join(docs_dir, name)
+        if not name.endswith('.md') or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        files.append(name)
+        documents.extend(processor.process_markdown_file(path, session_id, original_filename=name))
+    return documents, files
+
+def synthesize_chunks(real_documents: List[Document], target: int, session_id: str, seed: int) -> List[Document]:
+    """Chunk pengganggu dari kosakata korpus asli, panjangnya mengikuti distribusi chunk asli"""
+    count = target - len(real_documents)
+    if count <= 0:
+        return []
+
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(sorted({word for doc in real_documents for word in doc.page_content.split()}))
+    lengths = np.array([len(doc.page_content.split()) for doc in real_documents])
+
+    synthetic = []
+    for index in range(count):
+        words = vocabulary[rng.integers(0, len(vocabulary), size=int(rng.choice(lengths)))]
+        filename = f"synthetic_{index // SYNTHETIC_CHUNKS_PER_DOCUMENT:05d}.md"
+        synthetic.append(Document(
+            page_content=' '.join(words),
+            metadata={
+                'source': filename,
+                'filename': filename,
+                'doc_type': 'synthetic',
+                'session_id': session_id,
+                'document_id': f"{session_id}:{filename}",
+                'Header 2': f"Sintetis {index}"
+            }
+        ))
+    return synthetic
+
+def is_relevant(doc: Document, label: Dict[str, Any]) -> bool:
+    if label.get('filename') and doc.metadata.get('filename') != label['filename']:
+        return False
+    return any(
+        value == label['section'] for key, value in doc.metadata.items() if key.startswith('Header')
+    )
+
+def run_queries(manager, questions: List[Dict[str, Any]], session_id: str, top_k: int,
+                repeat: int, recall_ks: List[int]) -> Dict[str, Any]:
+    latencies = []
+    hits = {k: 0 for k in recall_ks}
+    reciprocal_ranks = []
+    misses = []
+
+    for label in questions:
+        results = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = manager.hybrid_search(label['question'], session_id, k=top_k)
+            latencies.append(time.perf_counter() - start)
+
+        rank = next((position for position, (doc, _) in enumerate(results, 1) if is_relevant(doc, label)), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        for k in recall_ks:
+            hits[k] += 1 if rank and rank <= k else 0
+        if rank is None:
+            misses.append({
+                'question': label['question'],
+                'expected': label['section'],
+                'retrieved': [
+                    next((value for key, value in sorted(doc.metadata.items(), reverse=True)
+                          if key.startswith('Header')), doc.metadata.get('filename'))
+                    for doc, _ in results
+                ]
+            })
+
+    total_time = sum(latencies)
+    return {
+        'query': {
+            'mode': 'hybrid' if config.HYBRID_SEARCH_ENABLED else 'vector',
+            'queries': len(latencies),
+            'mean_ms': round(total_time / len(latencies) * 1000, 3) if latencies else 0.0,
+            'p50_ms': percentile_ms(latencies, 50),
+            'p95_ms': percentile_ms(latencies, 95),
+            'p99_ms': percentile_ms(latencies, 99),
+            'queries_per_second': round(len(latencies) / total_time, 1) if total_time else 0.0
+        },
+        'quality': {
+            'questions': len(questions),
+            **{f"recall@{k}": round(hits[k] / len(questions), 4) for k in recall_ks},
+            'mrr': round(float(np.mean(reciprocal_ranks)), 4) if reciprocal_ranks else 0.0,
+            'misses': misses
+        }
+    }
+
+def run_chat(manager, questions: List[Dict[str, Any]], session_id: str) -> Dict[str, Any]:
+    """Latensi ask_project end-to-end dengan LLM palsu (tanpa jaringan)"""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from app.services.chat_service import ActuarialChatService
+
+    llm = FakeListChatModel(responses=['Jawaban benchmark.'])
+    service = ActuarialChatService(vector_store_manager=manager, llm=llm, condense_llm=llm)
+
+    latencies, modes = [], {}
+    for label in questions:
+        # Memory dikosongkan agar setiap pertanyaan berdiri sendiri (tanpa condense)
+        service.clear_memory(session_id)
+        start = time.perf_counter()
+        result = service.ask_project(label['question'], session_id)
+        latencies.append(time.perf_counter() - start)
+        modes[result.get('mode')] = modes.get(result.get('mode'), 0) + 1
+
+    return {
+        'questions': len(latencies),
+        'p50_ms': percentile_ms(latencies, 50),
+        'p95_ms': percentile_ms(latencies, 95),
+        'p99_ms': percentile_ms(latencies, 99),
+        'modes': modes
+    }
+
+def get_metric(results: Dict[str, Any], path: str) -> Optional[float]:
+    value = results
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Bandingkan metrik utama; regresi jika lebih buruk dari toleransi relatif"""
+    comparison = []
+    recall_paths = [f"quality.{key}" for key in results['quality'] if key.startswith('recall@')]
+    for path, higher_is_better in COMPARED_METRICS + [(path, True) for path in recall_paths]:
+        current, previous = get_metric(results, path), get_metric(baseline, path)
+        if current is None or previous is None:
+            continue
+        change = (current - previous) / previous if previous else 0.0
+        worse = -change if higher_is_better else change
+        comparison.append({
+            'metric': path,
+            'baseline': previous,
+            'current': current,
+            'change': round(change, 4),
+            'regression': worse > tolerance
+        })
+    return comparison
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', default=os.path.join(ROOT_DIR, 'sample_docs'), help='Folder dokumen markdown')
+    parser.add_argument('--questions', default=os.path.join(ROOT_DIR, 'benchmarks', 'questions.json'),
+                        help='Pertanyaan berlabel (question, section, filename opsional)')
+    parser.add_argument('--chunks', type=int, default=10000, help='Total chunk setelah ditambah chunk sintetis')
+    parser.add_argument('--chunk-size', type=int, default=config.CHUNK_SIZE)
+    parser.add_argument('--chunk-overlap', type=int, default=config.CHUNK_OVERLAP)
+    parser.add_argument('--top-k', type=int, default=config.TOP_K_RESULTS)
+    parser.add_argument('--threshold', type=float, default=config.SIMILARITY_THRESHOLD)
+    parser.add_argument('--mode', choices=['hybrid', 'vector'], default='hybrid' if config.HYBRID_SEARCH_ENABLED else 'vector')
+    parser.add_argument('--dimensions', type=int, default=256, help='Dimensi embedding hashing')
+    parser.add_argument('--repeat', type=int, default=5, help='Pengulangan setiap pertanyaan untuk latensi')
+    parser.add_argument('--chat', action='store_true', help='Ukur juga ask_project end-to-end dengan LLM palsu')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db-path', help='Folder vector store (default: folder sementara yang dihapus)')
+    parser.add_argument('--output', help='Tulis hasil JSON ke file ini')
+    parser.add_argument('--baseline', help='Hasil JSON commit sebelumnya untuk dibandingkan')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Toleransi regresi relatif (default 10%%)')
+    return parser.parse_args(argv)
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    db_path = args.db_path or tempfile.mkdtemp(prefix='retrieval-bench-')
+
+    # Override konfigurasi yang sedang diuji sebelum service dibuat
+    config.CHROMA_DB_PATH = db_path
+    config.CHUNK_SIZE = args.chunk_size
+    config.CHUNK_OVERLAP = args.chunk_overlap
+    config.TOP_K_RESULTS = args.top_k
+    config.SIMILARITY_THRESHOLD = args.threshold
+    config.HYBRID_SEARCH_ENABLED = args.mode == 'hybrid'
+
+    import chromadb
+    from app.models.embeddings import VectorStoreManager
+    from app.services.document_processor import DocumentProcessor
+    from app.services.ingestion import IngestionEngine
+
+    with open(args.questions, 'r', encoding='utf-8') as file:
+        questions = json.load(file)
+
+    session_id = 'benchmark'
+    rss_start = current_rss_mb()
+    try:
+        embeddings = HashingEmbeddings(args.dimensions)
+        manager = VectorStoreManager(
+            embeddings=embeddings,
+            chroma_client=chromadb.PersistentClient(path=db_path)
+        )
+
+        start = time.perf_counter()
+        real_documents, files = load_corpus(DocumentProcessor(), args.docs, session_id)
+        split_seconds = time.perf_counter() - start
+        documents = real_documents + synthesize_chunks(real_documents, args.chunks, session_id, args.seed)
+
+        start = time.perf_counter()
+        stats = IngestionEngine(manager).ingest(documents)
+        ingest_seconds = time.perf_counter() - start
+        rss_after_ingest = current_rss_mb()
+
+        recall_ks = sorted({k for k in (1, 3, 5, 10) if k < args.top_k} | {args.top_k})
+        results = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'git_commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'parameters': {
+                    'chunks': args.chunks,
+                    'chunk_size': args.chunk_size,
+                    'chunk_overlap': args.chunk_overlap,
+                    'top_k': args.top_k,
+                    'similarity_threshold': args.threshold,
+                    'mode': args.mode,
+                    'dimensions': args.dimensions,
+                    'repeat': args.repeat,
+                    'seed': args.seed
+                }
+            },
+            'corpus': {
+                'files': files,
+                'real_chunks': len(real_documents),
+                'synthetic_chunks': len(documents) - len(real_documents),
+                'total_chunks': len(documents)
+            },
+            'ingestion': {
+                'split_seconds': round(split_seconds, 3),
+                'ingest_seconds': round(ingest_seconds, 3),
+                'chunks_per_second': round(len(documents) / ingest_seconds, 1) if ingest_seconds else 0.0,
+                'added': stats['added'],
+                'embedded': stats['embedded']
+            }
+        }
+
+        results.update(run_queries(manager, questions, session_id, args.top_k, args.repeat, recall_ks))
+        if args.chat:
+            results['chat'] = run_chat(manager, questions, session_id)
+
+        results['memory'] = {
+            'rss_start_mb': rss_start,
+            'rss_after_ingest_mb': rss_after_ingest,
+            'rss_end_mb': current_rss_mb(),
+            'peak_rss_mb': peak_rss_mb()
+        }
+        return results
+    finally:
+        if not args.db_path:
+            shutil.rmtree(db_path, ignore_errors=True)
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    results = run(args)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            results['comparison'] = compare_with_baseline(results, json.load(file), args.tolerance)
+        exit_code = 1 if any(item['regression'] for item in results['comparison']) else 0
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    print(output)
+    return exit_code
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Benchmark splitter: MarkdownChunker satu lintasan vs MarkdownHeaderTextSplitter + RecursiveCharacterTextSplitter
+
+Korpus sample_docs diperbesar dengan menggabungkan setiap file --copies kali (meniru dokumen
+regulasi yang panjang), lalu kedua jalur split di DocumentProcessor diukur: waktu, throughput,
+alokasi memori puncak, jumlah/ukuran chunk, serta keutuhan tabel dan blok rumus $$. Contoh:
+
+    python -m benchmarks.splitter_benchmark --copies 50 --output splitter.json
+"""
+from typing import List, Dict, Any, Tuple
+import argparse
+import hashlib
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark-0000000000000000000000')
+
+from app.config import config
+from benchmarks.retrieval_benchmark import git_commit
+
+SPLITTERS = ['langchain', 'markdown']
+
+FORMULA_PATTERN = re.compile(r'\$\$.+?\$\$', re.DOTALL)
+
+def load_files(docs_dir: str) -> List[Tuple[str, str]]:
+    """(nama, isi) setiap file markdown unik"""
+    files, seen = [], set()
+    for name in sorted(os.listdir(docs_dir)):
+        path = os.path.join(docs_dir, name)
+        if not name.endswith('.md') or not os.path.isfile(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as file:
+            content = file.read()
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        files.append((name, content))
+    return files
+
+def split_all(processor, files: List[Tuple[str, str]], splitter: str) -> List[List[Any]]:
+    config.TEXT_SPLITTER = splitter
+    return [list(processor.iter_chunks(content, name, 'benchmark', name)) for name, content in files]
+
+def measure_speed(processor, files: List[Tuple[str, str]], splitter: str, repeat: int) -> Dict[str, Any]:
+    """Waktu terbaik dari beberapa putaran, lalu satu putaran dengan tracemalloc untuk alokasi puncak"""
+    total_bytes = sum(len(content.encode('utf-8')) for _, content in files)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = split_all(processor, files, splitter)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    split_all(processor, files, splitter)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        'best_seconds': round(best, 4),
+        'median_seconds': round(statistics.median(timings), 4),
+        'mb_per_second': round(total_bytes / 1024 / 1024 / best, 2) if best else 0.0,
+        'peak_alloc_mb': round(peak / 1024 / 1024, 2),
+        'chunks': sum(len(file_chunks) for file_chunks in chunks)
+    }
+
+def is_intact(block: str, chunks: List[Any]) -> bool:
+    """Blok utuh jika semua barisnya ada di satu chunk yang sama"""
+    lines = [line.strip() for line in block.strip().split('\n') if line.strip()]
+    return any(all(line in chunk.page_content for line in lines) for chunk in chunks)
+
+def measure_quality(processor, files: List[Tuple[str, str]], splitter: str) -> Dict[str, Any]:
+    chunks_per_file = split_all(processor, files, splitter)
+    lengths = [len(chunk.page_content) for file_chunks in chunks_per_file for chunk in file_chunks]
+
+    tables = formulas = tables_intact = formulas_intact = 0
+    for (_, content), file_chunks in zip(files, chunks_per_file):
+        for table in processor.extract_tables_from_markdown(content):
+            tables += 1
+            tables_intact += is_intact(table['raw_text'], file_chunks)
+        for match in FORMULA_PATTERN.finditer(content):
+            formulas += 1
+            formulas_intact += is_intact(match.group(0), file_chunks)
+
+    return {
+        'chunks': len(lengths),
+        'mean_chunk_chars': round(statistics.mean(lengths), 1) if lengths else 0.0,
+        'max_chunk_chars': max(lengths, default=0),
+        'chunks_over_chunk_size': sum(1 for length in lengths if length > config.CHUNK_SIZE),
+        'tables': tables,
+        'tables_intact': tables_intact,
+        'formulas': formulas,
+        'formulas_intact': formulas_intact
+    }
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', default=os.path.join(ROOT_DIR, 'sample_docs'), help='Folder dokumen markdown')
+    parser.add_argument('--copies', type=int, default=50, help='Setiap file digabung sebanyak ini (file panjang)')
+    parser.add_argument('--repeat', type=int, default=5, help='Putaran pengukuran waktu per splitter')
+    parser.add_argument('--chunk-size', type=int, default=config.CHUNK_SIZE)
+    parser.add_argument('--chunk-overlap', type=int, default=config.CHUNK_OVERLAP)
+    parser.add_argument('--output', help='Tulis hasil JSON ke file ini')
+    return parser.parse_args(argv)
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    config.CHUNK_SIZE = args.chunk_size
+    config.CHUNK_OVERLAP = args.chunk_overlap
+
+    from app.services.document_processor import DocumentProcessor
+    processor = DocumentProcessor(max_workers=1)
+
+    files = load_files(args.docs)
+    large_files = [(name, '\n\n'.join([content] * args.copies)) for name, content in files]
+    total_bytes = sum(len(content.encode('utf-8')) for _, content in large_files)
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {
+                'copies': args.copies,
+                'repeat': args.repeat,
+                'chunk_size': args.chunk_size,
+                'chunk_overlap': args.chunk_overlap
+            }
+        },
+        'corpus': {
+            'files': [name for name, _ in files],
+            'total_mb': round(total_bytes / 1024 / 1024, 2)
+        },
+        'speed': {},
+        'quality': {}
+    }
+
+    original_splitter = config.TEXT_SPLITTER
+    try:
+        for splitter in SPLITTERS:
+            results['speed'][splitter] = measure_speed(processor, large_files, splitter, args.repeat)
+            results['quality'][splitter] = measure_quality(processor, files, splitter)
+    finally:
+        config.TEXT_SPLITTER = original_splitter
+
+    baseline, candidate = results['speed']['langchain'], results['speed']['markdown']
+    results['speedup'] = round(baseline['best_seconds'] / candidate['best_seconds'], 2) if candidate['best_seconds'] else None
+    return results
+
+def main(argv: List[str] = None) -> int:
+    args = parse_args(argv)
+    output = json.dumps(run(args), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
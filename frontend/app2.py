@@ -321,25 +321,66 @@ with st.sidebar:
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
+# Fungsi untuk membaca stream SSE dan menampilkan token secara bertahap
+def read_stream(response, placeholder):
+    response.encoding = 'utf-8'
+    answer = ""
+    event = None
+    
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            continue
+        if line.startswith('event:'):
+            event = line[len('event:'):].strip()
+            continue
+        if not line.startswith('data:'):
+            continue
+        
+        data = json.loads(line[len('data:'):].strip())
+        if event == 'token':
+            answer += data.get('token', '')
+            placeholder.markdown(f"""
+            <div class="assistant-message">
+                <strong>🤖 AI Aktuaria:</strong><br>
+                {process_latex(answer)}▌
+            </div>
+            """, unsafe_allow_html=True)
+        elif event == 'done':
+            placeholder.empty()
+            return {'success': True, 'data': data}, None
+        elif event == 'error':
+            placeholder.empty()
+            return None, f"❌ Error: {data.get('error', 'Terjadi kesalahan di server')}"
+    
+    placeholder.empty()
+    return None, "❌ Koneksi stream terputus sebelum jawaban selesai"
+
 # Fungsi API
-def call_api(question, session_id, api_url):
+def call_api(question, session_id, api_url, placeholder=None):
     try:
+        # Jika placeholder diberikan, jawaban di-stream token demi token
+        stream = placeholder is not None
         payload = {
             "question": question,
-            "session_id": session_id
+            "session_id": session_id,
+            "stream": stream
         }
         
         response = requests.post(
             api_url,
             json=payload,
             headers={'Content-Type': 'application/json'},
-            timeout=30
+            timeout=30,
+            stream=stream
         )
         
-        if response.status_code == 200:
-            return response.json(), None
-        else:
+        if response.status_code != 200:
             return None, f"Error {response.status_code}: {response.text}"
+        
+        if stream and response.headers.get('Content-Type', '').startswith('text/event-stream'):
+            return read_stream(response, placeholder)
+        
+        return response.json(), None
             
     except requests.exceptions.ConnectionError:
         return None, "❌ Tidak dapat terhubung ke API"
@@ -485,9 +526,10 @@ if 'is_thinking' in st.session_state and st.session_state.is_thinking:
             break
     
     if last_question:
-        # Call API
+        # Call API (token ditampilkan bertahap di placeholder)
+        stream_placeholder = st.empty()
         with st.spinner('🤔 AI sedang berpikir...'):
-            result, error = call_api(last_question, session_id, api_url)
+            result, error = call_api(last_question, session_id, api_url, stream_placeholder)
         
         # Remove thinking state
         st.session_state.is_thinking = False
@@ -0,0 +1,51 @@
+"""Konfigurasi gunicorn untuk production (nilai diambil dari app.config.Config)"""
+import os
+
+# RotatingFileHandler tidak aman jika beberapa proses menulis app.log yang sama (rotasi di satu
+# proses memindahkan file yang masih ditulis proses lain): di bawah gunicorn log hanya ke stdout
+# dan rotasi diserahkan ke platform. Harus di-set sebelum app.config di-import.
+os.environ.setdefault('LOG_TO_FILE', 'False')
+
+# Alias: nama 'config' dipakai gunicorn sebagai nama setting
+from app.config import config as app_config
+
+bind = f"0.0.0.0:{app_config.PORT}"
+
+# Satu worker gthread dengan WEB_THREADS thread, sehingga request LLM yang lama (termasuk
+# streaming SSE) tidak memblokir request lain. Lebih dari satu worker belum didukung: job
+# ingestion, ChromaDB PersistentClient dan cache-cache lain hanya terlihat di proses pembuatnya
+# (GET /jobs/<id> ke worker lain akan 404, upsert worker lain tidak terlihat).
+worker_class = 'gthread'
+workers = 1
+threads = app_config.WEB_THREADS
+timeout = app_config.WEB_TIMEOUT
+graceful_timeout = app_config.WEB_GRACEFUL_TIMEOUT
+
+# Jangan preload: Chroma client, HTTP client OpenAI dan thread pool ingestion
+# dibuat sekali per worker setelah fork, lalu dipakai bersama oleh semua thread worker.
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
+loglevel = app_config.LOG_LEVEL.lower()
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} started ({threads} threads)")
+
+def on_starting(server):
+    """Tolak konfigurasi multi worker, lalu siapkan collection Chroma di master sebelum satu-satunya worker dibuat"""
+    if app_config.WEB_WORKERS > 1:
+        raise RuntimeError(
+            f"WEB_WORKERS={app_config.WEB_WORKERS} tidak didukung: state aplikasi hanya hidup di satu proses. "
+            f"Gunakan WEB_WORKERS=1 dan atur concurrency lewat WEB_THREADS"
+        )
+
+    import chromadb
+    from chromadb.api.client import SharedSystemClient
+
+    os.makedirs(app_config.CHROMA_DB_PATH, exist_ok=True)
+    client = chromadb.PersistentClient(path=app_config.CHROMA_DB_PATH)
+    client.get_or_create_collection(app_config.COLLECTION_NAME)
+
+    # Koneksi SQLite milik master tidak boleh diwariskan ke worker
+    SharedSystemClient.clear_system_cache()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# app.config membaca OPENAI_API_KEY saat import; test tidak pernah memanggil OpenAI
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test-0000000000000000000000')
+os.environ.setdefault('ANONYMIZED_TELEMETRY', 'False')
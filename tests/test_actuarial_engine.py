@@ -0,0 +1,26 @@
+from app.services.actuarial_engine import ActuarialEngine
+
+def test_retirement_age_is_not_read_as_current_age():
+    question = ('Hitung dana pensiun untuk 10 karyawan yang pensiun pada usia 56, usia 30, gaji Rp 10 juta '
+                'per bulan, manfaat 2%, bunga 6%')
+
+    parameters = ActuarialEngine().parse_question(question)
+
+    assert parameters['type'] == 'pension_fund'
+    assert parameters['age'] == 30
+    assert parameters['retirement_age'] == 56
+
+def test_pension_question_past_retirement_age_is_declined():
+    question = 'Hitung dana pensiun karyawan usia 60, usia pensiun 56, gaji Rp 10 juta per bulan, manfaat 2%, bunga 6%'
+
+    assert ActuarialEngine().answer(question) is None
+
+def test_pension_liability_discounts_for_survival_to_retirement():
+    engine = ActuarialEngine()
+    functions = engine.commutation_functions(0.06)
+
+    result = engine.pension_liability([30], [10_000_000], [56], 0.06, 0.02)
+
+    survival = functions['lx'][56] / functions['lx'][30]
+    expected = float(result['monthly_benefit'][0]) * 12 * float(result['annuity_factor'][0]) * survival / 1.06 ** 26
+    assert abs(float(result['present_value'][0]) - expected) < 1e-6 * expected
@@ -0,0 +1,25 @@
+from app.services.answer_cache import SemanticAnswerCache
+
+def test_full_cache_reuses_oldest_slot():
+    cache = SemanticAnswerCache(similarity_threshold=0.99, ttl_seconds=3600, max_entries=2)
+    cache.store([1.0, 0.0, 0.0], 'q1', {'answer': 'a1'})
+    cache.store([0.0, 1.0, 0.0], 'q2', {'answer': 'a2'})
+    cache.store([0.0, 0.0, 1.0], 'q3', {'answer': 'a3'})
+
+    assert cache.lookup([1.0, 0.0, 0.0]) is None
+    assert cache.lookup([0.0, 1.0, 0.0]) == {'answer': 'a2'}
+    assert cache.lookup([0.0, 0.0, 1.0]) == {'answer': 'a3'}
+    assert cache.get_stats()['entries'] == 2
+    assert cache.get_stats()['evictions'] == 1
+
+def test_expired_entries_free_their_slots(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.services.answer_cache.time.time', lambda: now[0])
+    cache = SemanticAnswerCache(similarity_threshold=0.99, ttl_seconds=10, max_entries=2)
+    cache.store([1.0, 0.0], 'q1', {'answer': 'a1'})
+    now[0] += 20
+    cache.store([0.0, 1.0], 'q2', {'answer': 'a2'})
+
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.lookup([0.0, 1.0]) == {'answer': 'a2'}
+    assert cache.get_stats()['entries'] == 1
@@ -0,0 +1,35 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from app.models.embedding_cache import CachedEmbeddings
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+def test_disk_hits_are_flushed_before_eviction(tmp_path):
+    embeddings = CountingEmbeddings()
+    cache = CachedEmbeddings(embeddings, 'test-model', str(tmp_path / 'cache.sqlite3'),
+                             max_memory_entries=1, max_disk_entries=2)
+    cache.embed_query('premi tunggal')
+    cache.embed_query('anuitas')
+    # Memory cache hanya 1 entri: query pertama dibaca dari disk dan last_access-nya ditunda
+    cache.embed_query('premi tunggal')
+    assert cache._pending_touches
+
+    cache.embed_query('laba bersih')
+
+    calls = embeddings.calls
+    cache._memory_cache.clear()
+    cache.embed_query('premi tunggal')
+    assert embeddings.calls == calls
+    cache.embed_query('anuitas')
+    assert embeddings.calls == calls + 1
@@ -0,0 +1,88 @@
+from typing import List
+import math
+
+import chromadb
+import pytest
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from app.config import config
+from app.models.embeddings import VectorStoreManager
+
+class KeywordEmbeddings(Embeddings):
+    """Bag-of-words ternormalisasi atas kosakata kecil, deterministik dan tanpa API"""
+
+    VOCABULARY = ['premi', 'tunggal', 'anuitas', 'laporan', 'keuangan', 'laba', 'bersih']
+
+    def _embed(self, text: str) -> List[float]:
+        words = text.lower().split()
+        vector = [float(words.count(term)) for term in self.VOCABULARY]
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CHROMA_DB_PATH', str(tmp_path))
+    monkeypatch.setattr(config, 'EMBEDDING_CACHE_ENABLED', False)
+    monkeypatch.setattr(config, 'HYBRID_SEARCH_ENABLED', False)
+    monkeypatch.setattr(config, 'SIMILARITY_THRESHOLD', 0.7)
+    client = chromadb.PersistentClient(path=str(tmp_path / 'chroma'))
+    return VectorStoreManager(embeddings=KeywordEmbeddings(), chroma_client=client)
+
+def test_closest_chunk_survives_similarity_threshold(manager):
+    manager.index_documents([
+        Document(page_content='premi tunggal anuitas', metadata={'session_id': 's1'}),
+        Document(page_content='laporan keuangan laba bersih', metadata={'session_id': 's1'}),
+    ])
+
+    results = manager.hybrid_search('premi tunggal anuitas', 's1', k=5)
+
+    assert [doc.page_content for doc, _ in results] == ['premi tunggal anuitas']
+    assert results[0][1] == pytest.approx(1.0, abs=1e-3)
+
+def test_partition_scores_are_relevance_not_distance(manager):
+    manager.index_documents([
+        Document(page_content='laporan keuangan', metadata={'session_id': 's1'}),
+        Document(page_content='laporan keuangan laba bersih', metadata={'session_id': 's1'}),
+    ])
+    query_embedding = manager.embed_query('laporan keuangan laba')
+
+    results = manager.similarity_search_by_vector_with_score(query_embedding, 's1', k=5)
+
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    assert all(0.0 <= score <= 1.0 for score in scores)
+    assert results[0][0].page_content == 'laporan keuangan laba bersih'
+
+def test_index_documents_flushes_while_streaming(manager, monkeypatch):
+    monkeypatch.setattr(config, 'INDEX_FLUSH_CHUNKS', 2)
+    words = ['premi', 'tunggal', 'anuitas', 'laporan', 'keuangan']
+    consumed, embedded_at = [], []
+
+    def chunks(contents):
+        for content in contents:
+            consumed.append(content)
+            yield Document(page_content=content, metadata={'session_id': 's1', 'document_id': 'doc'})
+
+    def embed_documents(texts):
+        embedded_at.append(len(consumed))
+        return manager.embeddings.embed_documents(texts)
+
+    stats = manager.index_documents(chunks(words), embed_documents=embed_documents)
+
+    # Batch pertama di-embed sebelum generator habis
+    assert embedded_at == [2, 4, 5]
+    assert stats['documents']['doc'] == {'reused': 0, 'added': 5, 'deleted': 0}
+
+    consumed.clear()
+    stats = manager.index_documents(chunks(['premi', 'laba', 'anuitas']), embed_documents=embed_documents)
+
+    assert stats['documents']['doc'] == {'reused': 2, 'added': 1, 'deleted': 3}
+    stored = manager.get_session_collection('s1').get(include=['documents'])['documents']
+    assert sorted(stored) == ['anuitas', 'laba', 'premi']
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from app.models.table_store import TableStore
+from app.services.document_processor import DocumentProcessor
+from app.services.table_qa import TableQuestionAnswerer
+
+SAMPLE_DOCS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_docs')
+
+@pytest.fixture
+def answerer(tmp_path):
+    processor = DocumentProcessor(max_workers=1)
+    store = TableStore(str(tmp_path))
+    for filename in ('panduan_aktuaria.md', 'ebc58df8_laporan-keuangan.md'):
+        with open(os.path.join(SAMPLE_DOCS, filename), 'r', encoding='utf-8') as file:
+            store.index_document('s1', filename, processor.extract_tables_from_markdown(file.read()))
+    return TableQuestionAnswerer(store)
+
+def test_row_lookup(answerer):
+    result = answerer.answer('Berapa qx laki-laki usia 30?', 's1')
+
+    assert result['operation'] == 'lookup'
+    assert result['answer'].startswith('Usia 30')
+
+@pytest.mark.parametrize('bound', ['30', '32'])
+def test_filter_bound_is_not_read_as_row_key(answerer, bound):
+    result = answerer.answer(f'Berapa rata-rata qx laki-laki di atas {bound}?', 's1')
+
+    assert result['operation'] == 'mean'
+    assert f'di atas {bound}' in result['answer']
+
+@pytest.mark.parametrize('question', [
+    'Berapa beban klaim tahun 2023 dan kenapa naik?',
+    'Mengapa laba bersih turun dan berapa dampaknya?',
+    'Jelaskan berapa laba bersih perusahaan',
+])
+def test_explanation_questions_go_to_llm(answerer, question):
+    assert answerer.answer(question, 's1') is None
+
+def test_filter_on_text_key_is_not_ignored(tmp_path):
+    content = (
+        "## Premi Produk\n\n"
+        "| Produk | Premi |\n"
+        "|--------|-------|\n"
+        "| Dwiguna | 25 |\n"
+        "| Berjangka | 35 |\n"
+        "| Seumur Hidup | 45 |\n"
+    )
+    store = TableStore(str(tmp_path))
+    store.index_document('s1', 'premi.md', DocumentProcessor(max_workers=1).extract_tables_from_markdown(content))
+
+    assert TableQuestionAnswerer(store).answer('Berapa rata-rata premi di atas 30?', 's1') is None
+
+@pytest.mark.parametrize('question', [
+    'Berapa rata-rata qx laki-laki di atas 10?',
+    'Berapa rata-rata qx laki-laki di bawah 90?',
+])
+def test_filter_bound_outside_key_range(answerer, question):
+    assert answerer.answer(question, 's1') is None